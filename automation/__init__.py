@@ -0,0 +1,4 @@
+"""
+Cellular automaton and forest fire models. Importing a module only defines
+its classes; run one's demo with python -m automation.<module>.
+"""
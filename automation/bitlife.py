@@ -0,0 +1,205 @@
+import numpy as np
+from .rule_table import clipped_neighbor_counts
+
+WORD_BITS = 64
+ONE = np.uint64(1)
+
+
+def pack_rows(grid):
+    """
+    Packs a 0/1 grid into uint64 words, 64 cells per word
+    :param grid: 2D array of 0s and 1s
+    :return: (rows, ceil(cols/64)) uint64 array, cell j of a row in bit j%64
+             of word j//64; the padding bits of the last word are always 0
+    """
+    rows, cols = grid.shape
+    n_words = max(1, -(-cols // WORD_BITS))
+    bits = np.zeros((rows, n_words * WORD_BITS), dtype=np.uint8)
+    bits[:, :cols] = grid != 0
+    packed = np.packbits(bits, axis=1, bitorder='little')
+    return packed.view('<u8').astype(np.uint64)
+
+
+def unpack_rows(words, cols):
+    """
+    Unpacks uint64 words back into a 0/1 grid
+    :param words: Array returned by pack_rows
+    :param cols: Number of columns in the grid
+    :return: (rows, cols) uint8 array
+    """
+    as_bytes = words.astype('<u8').view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1, count=cols, bitorder='little')
+
+
+def get_columns(words, cols):
+    """
+    Reads a few columns without unpacking the whole grid
+    :param words: Packed grid
+    :param cols: Column indices to read
+    :return: (rows, len(cols)) uint8 array
+    """
+    out = np.empty((words.shape[0], len(cols)), dtype=np.uint8)
+    for k, c in enumerate(cols):
+        out[:, k] = (words[:, c // WORD_BITS] >> np.uint64(c % WORD_BITS)) & ONE
+    return out
+
+
+def set_column(words, col, values):
+    """
+    Overwrites one column of a packed grid in place
+    :param words: Packed grid
+    :param col: Column index
+    :param values: New 0/1 values for the column
+    """
+    shift = np.uint64(col % WORD_BITS)
+    w = col // WORD_BITS
+    bits = (np.asarray(values) != 0).astype(np.uint64) << shift
+    words[:, w] = (words[:, w] & ~(ONE << shift)) | bits
+
+
+def _full_add(a, b, c):
+    # Bitwise full adder over 64 cells at once
+    partial = a ^ b
+    return partial ^ c, (a & b) | (c & partial)
+
+
+def _padding_mask(cols, n_words):
+    # Mask keeping only the real cells of the last word
+    used = cols - (n_words - 1) * WORD_BITS
+    if used == WORD_BITS:
+        return ~np.uint64(0)
+    return (ONE << np.uint64(used)) - ONE
+
+
+def life_step(words, cols, wrap=False):
+    """
+    Computes one Game of Life generation on a packed grid
+    :param words: Packed grid
+    :param cols: Number of columns in the grid
+    :param wrap: True for a toroidal grid, False for dead cells beyond the edges
+    :return: The packed next generation
+    """
+    rows, n_words = words.shape
+    top = (cols - 1) // WORD_BITS
+    top_shift = np.uint64((cols - 1) % WORD_BITS)
+
+    # Neighbour to the west (column j-1) and east (column j+1) of every cell
+    west = words << ONE
+    west[:, 1:] |= words[:, :-1] >> np.uint64(WORD_BITS - 1)
+    east = words >> ONE
+    east[:, :-1] |= words[:, 1:] << np.uint64(WORD_BITS - 1)
+    if wrap:
+        west[:, 0] |= (words[:, top] >> top_shift) & ONE
+        east[:, top] |= (words[:, 0] & ONE) << top_shift
+
+    def shift_rows(a, down):
+        if wrap:
+            return np.roll(a, 1 if down else -1, axis=0)
+        out = np.zeros_like(a)
+        if down:
+            out[1:] = a[:-1]
+        else:
+            out[:-1] = a[1:]
+        return out
+
+    # Sum the eight neighbour bits with full adders: ones, twos and fours
+    s_a, c_a = _full_add(shift_rows(west, True), shift_rows(words, True), shift_rows(east, True))
+    s_b, c_b = _full_add(shift_rows(west, False), shift_rows(words, False), shift_rows(east, False))
+    s_c, c_c = west ^ east, west & east
+    ones, c_d = _full_add(s_a, s_b, s_c)
+    t, c_e = _full_add(c_a, c_b, c_c)
+    twos, c_f = t ^ c_d, t & c_d
+    fours = c_e ^ c_f
+
+    # Alive next if the count is 3, or it is 2 and the cell is alive
+    new = twos & ~fours & (ones | words)
+    new[:, -1] &= _padding_mask(cols, n_words)
+    return new
+
+
+def _life_rule(cells, counts):
+    return ((counts == 3) | ((cells == 1) & (counts == 2))).astype(np.uint8)
+
+
+def fix_clipped_border(old, new, rows, cols):
+    """
+    Rewrites the border cells of new so they match the per-cell loop in
+    upscaling.py, whose get_neighbors drops the middle element of the clipped
+    window rather than the cell itself on the border
+    :param old: Packed grid before the step
+    :param new: Packed grid after life_step, updated in place
+    :param rows: Number of rows in the grid
+    :param cols: Number of columns in the grid
+    """
+    if rows <= 3 or cols <= 3:
+        cells = unpack_rows(old, cols)
+        new[:] = pack_rows(_life_rule(cells, clipped_neighbor_counts(cells)))
+        return
+
+    # A strip three cells deep sees the same clipped windows along its outer
+    # edge as the full grid does, so each edge only needs its own strip.
+    for edge, strip in ((0, slice(0, 3)), (rows - 1, slice(rows - 3, rows))):
+        cells = unpack_rows(old[strip], cols)
+        nxt = _life_rule(cells, clipped_neighbor_counts(cells))
+        new[edge] = pack_rows(nxt[[0 if edge == 0 else -1]])[0]
+    for edge, strip in ((0, (0, 1, 2)), (cols - 1, (cols - 3, cols - 2, cols - 1))):
+        cells = get_columns(old, strip)
+        nxt = _life_rule(cells, clipped_neighbor_counts(cells))
+        set_column(new, edge, nxt[:, 0 if edge == 0 else -1])
+
+
+class BitPackedLife:
+    def __init__(self, rows, cols, initial_state=None, wrap=False, cmap='viridis'):
+        """
+        Game of Life stored as 64 cells per uint64 word
+        :param rows: Number of rows in the grid
+        :param cols: Number of columns in the grid
+        :param initial_state: Initial state of the grid (optional)
+        :param wrap: True for the toroidal edges of cellular iteration1.py,
+                     False for the clipped edges of upscaling.py
+        :param cmap: Color map for visualization
+        """
+        self.rows = rows
+        self.cols = cols
+        self.wrap = wrap
+        self.cmap = cmap
+        if initial_state is None:
+            self.grid = np.random.choice([0, 1], size=(rows, cols))
+        else:
+            self.grid = np.array(initial_state)
+
+    @property
+    def grid(self):
+        """
+        The grid unpacked to one cell per element; only built when read
+        """
+        return unpack_rows(self.words, self.cols).astype(self.dtype, copy=False)
+
+    @grid.setter
+    def grid(self, value):
+        value = np.asarray(value)
+        if value.shape != (self.rows, self.cols):
+            raise ValueError("grid must have shape (%d, %d)" % (self.rows, self.cols))
+        if not np.isin(value, (0, 1)).all():
+            raise ValueError("grid may only contain 0 and 1")
+        self.dtype = value.dtype
+        self.words = pack_rows(value)
+
+    def update(self):
+        """
+        Updates the grid by one generation
+        """
+        new_words = life_step(self.words, self.cols, self.wrap)
+        if not self.wrap:
+            fix_clipped_border(self.words, new_words, self.rows, self.cols)
+        self.words = new_words
+
+    def animate(self, steps, interval=100):
+        """
+        Animates the evolution of the cellular automaton, stepping it in a
+        background thread while the window shows the newest grid
+        :param steps: Number of steps to animate
+        :param interval: Time interval between frames in milliseconds
+        """
+        from render import watch
+        watch(self, interval, steps=steps, cmap=self.cmap, vmin=0, vmax=1)
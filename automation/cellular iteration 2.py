@@ -1,9 +1,11 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Slider
-from matplotlib.animation import FuncAnimation
+from .rule_table import compile_rule, table_applies, apply_table, clipped_neighbor_counts, CLIPPED_SIZES
+from .hooks import Hooks
+
+class CellularAutomaton(Hooks):
+    TRANSITIONS = {'births': (0, 1), 'deaths': (1, 0)}
+    TOTALS = {'alive': (1, 'births', 'deaths')}
 
-class CellularAutomaton:
     def __init__(self, rows, cols, rule_func, initial_state=None, cmap='viridis'):
         """
         Initializes the cellular automaton
@@ -17,16 +19,30 @@ class CellularAutomaton:
         self.cols = cols
         self.grid = np.random.choice([0, 1], size=(rows, cols)) if initial_state is None else np.array(initial_state)
         self.rule_func = rule_func
+        self.rule_table = compile_rule(rule_func, neighborhood_sizes=CLIPPED_SIZES)
         self.cmap = cmap
 
     def update(self):
-        new_grid = np.copy(self.grid)
-        for i in range(self.rows):
-            for j in range(self.cols):
-                state = self.grid[i, j]
-                neighbors = self.get_neighbors(i, j)
-                new_grid[i, j] = self.rule_func(state, neighbors)
-        self.grid = new_grid
+        self.profiler.begin()
+        old_grid, moves = self.grid, None
+        if table_applies(self.rule_table, self.grid):
+            # Totalistic rule: one neighbour count plus one table lookup
+            counts = clipped_neighbor_counts(self.grid)
+            self.profiler.lap('neighbours')
+            moves = self.new_moves(len(self.rule_table))
+            self.grid = apply_table(self.rule_table, self.grid, counts, moves)
+            self.profiler.lap('rule')
+        else:
+            new_grid = np.copy(self.grid)
+            for i in range(self.rows):
+                for j in range(self.cols):
+                    state = self.grid[i, j]
+                    neighbors = self.get_neighbors(i, j)
+                    new_grid[i, j] = self.rule_func(state, neighbors)
+            self.grid = new_grid
+            self.profiler.lap('cells')
+        self.report_grids(old_grid, self.grid, moves)
+        self.finish_step()
 
     def get_neighbors(self, row, col):
         neighbors = self.grid[max(row-1, 0):min(row+2, self.rows),
@@ -34,28 +50,28 @@ class CellularAutomaton:
         return np.delete(neighbors, len(neighbors)//2)
 
     def animate(self, steps, interval=100):
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Slider
+        from render import attach
         fig, ax = plt.subplots()
         plt.subplots_adjust(left=0.1, bottom=0.25)
-        img = ax.imshow(self.grid, interpolation='nearest', cmap=self.cmap)
 
         axcolor = 'lightgoldenrodyellow'
         ax_scale = plt.axes([0.1, 0.1, 0.65, 0.03], facecolor=axcolor)
         scale_slider = Slider(ax_scale, 'Scale', 1, 10, valinit=1, valstep=1)
 
-        def update_frame(*args):
-            self.update()
-            img.set_data(self.grid)
-            img.set_cmap(self.cmap)
-            return img,
-
         def update(val):
+            # Zoom in by narrowing the view rather than enlarging the grid
             scale_factor = scale_slider.val
-            img.set_data(np.kron(self.grid, np.ones((scale_factor, scale_factor))))
+            ax.set_xlim(-0.5, self.cols / scale_factor - 0.5)
+            ax.set_ylim(self.rows / scale_factor - 0.5, -0.5)
             fig.canvas.draw_idle()
 
         scale_slider.on_changed(update)
-        ani = FuncAnimation(fig, update_frame, frames=steps, interval=interval, blit=True)
+        # Stepped in a background thread; the window shows the newest grid
+        ani, worker = attach(self, fig, ax, steps, interval, cmap=self.cmap, vmin=0, vmax=1)
         plt.show()
+        worker.stop()
 
 # Example rule function for Conway's Game of Life
 def conways_rule(state, neighbors):
@@ -70,5 +86,6 @@ def conways_rule(state, neighbors):
         return state
 
 # Initialize and run the cellular automaton
-automaton = CellularAutomaton(50, 50, conways_rule, cmap='plasma')
-automaton.animate(100)
+if __name__ == '__main__':
+    automaton = CellularAutomaton(50, 50, conways_rule, cmap='plasma')
+    automaton.animate(100)
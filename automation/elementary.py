@@ -0,0 +1,250 @@
+import struct
+
+import numpy as np
+from .bitlife import pack_rows, unpack_rows, WORD_BITS, ONE
+
+BOUNDARIES = ('wrap', 'zero', 'keep')
+MAGIC = b'CA1DROWS'
+HEADER = struct.Struct('<8sQ')
+
+
+def rule_table(rule):
+    """
+    Builds the lookup table of an elementary rule
+    :param rule: Wolfram rule number (0-255), or a rule_func(state, neighbors)
+                 taking a cell and its [left, right] neighbours as in the
+                 simpleversion scripts
+    :return: uint8 array of the 8 new states, indexed by 4*left + 2*centre + right
+    """
+    if callable(rule):
+        table = np.array([rule(c, [l, r]) for l in (0, 1) for c in (0, 1) for r in (0, 1)])
+        if not np.isin(table, (0, 1)).all():
+            raise ValueError("rule_func must return 0 or 1")
+        return table.astype(np.uint8)
+    if not 0 <= rule <= 255:
+        raise ValueError("Wolfram rule numbers run from 0 to 255, not %d" % rule)
+    return np.array([(rule >> i) & 1 for i in range(8)], dtype=np.uint8)
+
+
+def rule_number(table):
+    """
+    Returns the Wolfram number of a lookup table from rule_table
+    """
+    return int(sum(int(v) << i for i, v in enumerate(table)))
+
+
+def row_step(row, table, boundary, out, idx, tmp):
+    """
+    Computes one generation of a 0/1 row with whole-row shifts and a single
+    table lookup
+    :param row: uint8 row of 0s and 1s
+    :param table: Lookup table from rule_table
+    :param boundary: 'wrap' (periodic), 'zero' (cells beyond the ends are 0)
+                     or 'keep' (the end cells never change, as in the
+                     simpleversion scripts)
+    :param out: uint8 array for the new row (must not be row)
+    :param idx, tmp: uint8 scratch arrays the size of row
+    """
+    # idx = 4*left + 2*centre + right, built in place
+    np.left_shift(row, 1, out=idx)
+    np.left_shift(row[:-1], 2, out=tmp[1:])
+    idx[1:] |= tmp[1:]
+    idx[:-1] |= row[1:]
+    if boundary == 'wrap':
+        idx[0] |= row[-1] << 2
+        idx[-1] |= row[0]
+    np.take(table, idx, out=out)
+    if boundary == 'keep':
+        out[0], out[-1] = row[0], row[-1]
+    return out
+
+
+def packed_step(words, size, table, boundary):
+    """
+    Computes one generation of a row packed 64 cells per uint64 word (as
+    bitlife.pack_rows lays out a single row), as a sum of the rule's minterms
+    :param words: 1D uint64 array
+    :param size: Number of cells in the row
+    :param table: Lookup table from rule_table
+    :param boundary: See row_step
+    :return: New packed row
+    """
+    last, bit = divmod(size - 1, WORD_BITS)
+    top = np.uint64(WORD_BITS - 1)
+    # Bit i of left holds cell i-1 and bit i of right holds cell i+1
+    left = words << ONE
+    left[1:] |= words[:-1] >> top
+    right = words >> ONE
+    right[:-1] |= words[1:] << top
+    if boundary == 'wrap':
+        left[0] |= (words[last] >> np.uint64(bit)) & ONE
+        right[last] |= (words[0] & ONE) << np.uint64(bit)
+
+    # OR together the patterns that give 1, or complement the OR of those that
+    # give 0 when there are fewer of them
+    wanted = 0 if table.sum() > 4 else 1
+    new = np.zeros_like(words)
+    for i in range(8):
+        if table[i] == wanted:
+            new |= ((left if i & 4 else ~left) & (words if i & 2 else ~words) &
+                    (right if i & 1 else ~right))
+    if not wanted:
+        new = ~new
+    used = size - last * WORD_BITS
+    if used < WORD_BITS:
+        new[last] &= (ONE << np.uint64(used)) - ONE
+    if boundary == 'keep':
+        for w, end in ((0, ONE), (last, ONE << np.uint64(bit))):
+            new[w] = (new[w] & ~end) | (words[w] & end)
+    return new
+
+
+class PackedRowWriter:
+    def __init__(self, path, size):
+        """
+        Streams the rows of a 1D run to disk at one bit per cell, so runs too
+        long to hold in memory can still be kept; read back with load_spacetime
+        :param path: Output file
+        :param size: Number of cells in a row
+        """
+        self.size = size
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, size))
+
+    def write(self, row):
+        self.write_words(pack_rows(np.asarray(row).reshape(1, -1))[0])
+
+    def write_words(self, words):
+        """
+        Appends a row that is already packed
+        """
+        self._file.write(words.astype('<u8').tobytes())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_spacetime(path, start=0, stop=None):
+    """
+    Reads rows start..stop-1 of a file written by PackedRowWriter
+    :return: (rows, size) uint8 array
+    """
+    with open(path, 'rb') as fh:
+        magic, size = HEADER.unpack(fh.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("%s is not a 1D spacetime file" % path)
+    n_words = max(1, -(-size // WORD_BITS))
+    words = np.memmap(path, dtype='<u8', mode='r', offset=HEADER.size)
+    words = words[:len(words) // n_words * n_words].reshape(-1, n_words)
+    return unpack_rows(np.asarray(words[start:stop]), size)
+
+
+class ElementaryCA:
+    def __init__(self, size, rule, initial_state=None, boundary='wrap', packed=False, cmap='binary'):
+        """
+        Initializes a 1D cellular automaton with two states and nearest
+        neighbours
+        :param size: Number of cells
+        :param rule: Wolfram rule number or rule_func(state, neighbors)
+        :param initial_state: Initial row (random if None)
+        :param boundary: 'wrap', 'zero' or 'keep' (see row_step)
+        :param packed: Keep the row bit-packed, 64 cells per word, which is
+                       faster and 8x smaller for very wide rows
+        :param cmap: Color map for visualization
+        """
+        if boundary not in BOUNDARIES:
+            raise ValueError("boundary must be one of %s" % (BOUNDARIES,))
+        self.size = size
+        self.table = rule_table(rule)
+        self.boundary = boundary
+        self.packed = packed
+        self.cmap = cmap
+        self.generation = 0
+        self._idx = np.empty(size, dtype=np.uint8)
+        self._tmp = np.empty(size, dtype=np.uint8)
+        self._spare = np.empty(size, dtype=np.uint8)
+        self.grid = np.random.choice([0, 1], size=size) if initial_state is None else initial_state
+
+    @property
+    def grid(self):
+        if self.packed:
+            return unpack_rows(self._words.reshape(1, -1), self.size)[0]
+        return self._row
+
+    @grid.setter
+    def grid(self, row):
+        row = (np.asarray(row) != 0).astype(np.uint8)
+        if row.shape != (self.size,):
+            raise ValueError("a row must have %d cells" % self.size)
+        if self.packed:
+            self._words = pack_rows(row.reshape(1, -1))[0]
+        else:
+            self._row = row
+
+    def update(self):
+        if self.packed:
+            self._words = packed_step(self._words, self.size, self.table, self.boundary)
+        else:
+            new = row_step(self._row, self.table, self.boundary, self._spare, self._idx, self._tmp)
+            self._spare, self._row = self._row, new
+        self.generation += 1
+
+    def run(self, steps, out=None, writer=None):
+        """
+        Runs steps generations, filling a spacetime array in one pass
+        :param steps: Number of generations
+        :param out: Preallocated (steps + 1, size) array (for example an
+                    np.memmap) for the current row and every later one; one
+                    is allocated if neither out nor writer is given
+        :param writer: Optional object with write(row), such as
+                       PackedRowWriter, given every row as it is produced
+        :return: out (None if only a writer was given)
+        """
+        if out is None and writer is None:
+            out = np.empty((steps + 1, self.size), dtype=np.uint8)
+        if out is not None and out.shape != (steps + 1, self.size):
+            raise ValueError("out must have shape %s" % ((steps + 1, self.size),))
+        packed_writer = self.packed and hasattr(writer, 'write_words')
+
+        for t in range(steps + 1):
+            if t > 0:
+                if out is not None and not self.packed:
+                    # Step straight into the spacetime row, no copy
+                    self._row = row_step(self._row, self.table, self.boundary, out[t], self._idx, self._tmp)
+                    self.generation += 1
+                else:
+                    self.update()
+            elif out is not None and not self.packed:
+                out[0] = self._row
+            if out is not None and self.packed:
+                out[t] = self.grid
+            if writer is not None:
+                if packed_writer:
+                    writer.write_words(self._words)
+                else:
+                    writer.write(self._row if not self.packed else self.grid)
+        if out is not None and not self.packed:
+            # Keep working in our own buffer rather than in out's last row
+            self._row = out[steps].copy()
+        return out
+
+    def render(self, spacetime, title="Elementary Cellular Automaton"):
+        """
+        Shows a whole run as a single image, time running down the page
+        """
+        import matplotlib.pyplot as plt
+        plt.figure()
+        plt.imshow(spacetime, cmap=self.cmap, aspect='auto', interpolation='nearest')
+        plt.xlabel("Cell Index")
+        plt.ylabel("Time Step")
+        plt.title("%s (rule %d)" % (title, rule_number(self.table)))
+        plt.show()
+
+    def animate(self, steps):
+        self.render(self.run(steps))
@@ -1,37 +1,125 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from .frontier import sample_cells, neighbor_cells
+from .hooks import Hooks
 
-class ForestSimulation:
+class ForestSimulation(Hooks):
     EMPTY, TREE, BURNING = 0, 1, 2  # States
+    TRANSITIONS = {'growth': (EMPTY, TREE), 'ignitions': (TREE, BURNING), 'burn_outs': (BURNING, EMPTY)}
+    TOTALS = {'trees': (TREE, 'growth', 'ignitions'), 'fires': (BURNING, 'ignitions', 'burn_outs')}
 
-    def __init__(self, rows, cols, growth_prob, fire_prob):
+    def __init__(self, rows, cols, growth_prob, fire_prob, sparse=False, rng=None):
         self.rows = rows
         self.cols = cols
-        self.grid = np.random.choice([self.EMPTY, self.TREE], 
+        self.rng = np.random if rng is None else rng  # Source of every random draw
+        self.grid = self.rng.choice([self.EMPTY, self.TREE], 
                                      size=(rows, cols), 
-                                     p=[1-growth_prob, growth_prob])
+                                     p=[1-growth_prob, growth_prob]).astype(np.uint8)
+        self._spare = np.empty_like(self.grid)  # Swapped with grid on each update
         self.growth_prob = growth_prob
         self.fire_prob = fire_prob
+        self.sparse = sparse  # Only visit the fire front on each update
+        self.burning = None  # Flat indices of burning cells in sparse mode
+        self._tracked_grid = None
+        self.tracker = None  # Optional clusters.FireTracker, following each fire
+        self.landscape = None  # Optional landscape.Landscape, setting the chance of spread
+        self.generation = 0
 
     def update(self):
-        new_grid = np.copy(self.grid)
+        self.profiler.begin()
+        if self.sparse:
+            self.sparse_update()
+        else:
+            self.dense_update()
+        self.generation += 1
+        self.finish_step()
+
+    def set_grid(self, grid):
+        # Replaces the grid, e.g. with an edited copy or from a checkpoint,
+        # of any size
+        if grid.shape != self.grid.shape:
+            self.rows, self.cols = grid.shape
+            self._spare = np.empty_like(grid)
+        self.grid = grid
+        self.invalidate()
+
+    def invalidate(self):
+        # Drops the sparse active set, so the next sparse step rebuilds it;
+        # call after editing grid in place
+        self.burning = None
+
+    def dense_update(self):
+        if self._spare.shape != self.grid.shape or self._spare.dtype != self.grid.dtype:
+            self._spare = np.empty_like(self.grid)
+        new_grid = self._spare
+        np.copyto(new_grid, self.grid)
+        spread_prob = None if self.landscape is None else self.landscape.ignition_probability(self.grid == self.BURNING)
         for i in range(self.rows):
             for j in range(self.cols):
                 if self.grid[i, j] == self.TREE:
-                    if self.is_burning_neighbor(i, j):
+                    if self.catches_fire(i, j, spread_prob):
                         new_grid[i, j] = self.BURNING
                 elif self.grid[i, j] == self.BURNING:
                     new_grid[i, j] = self.EMPTY
                 elif self.grid[i, j] == self.EMPTY:
-                    if np.random.rand() < self.growth_prob:
+                    if self.rng.random() < self.growth_prob:
                         new_grid[i, j] = self.TREE
                 
                 # Randomly start fires
-                if self.grid[i, j] == self.TREE and np.random.rand() < self.fire_prob:
+                if self.grid[i, j] == self.TREE and self.rng.random() < self.fire_prob:
                     new_grid[i, j] = self.BURNING
 
-        self.grid = new_grid
+        self._spare, self.grid = self.grid, new_grid
+        self.profiler.lap('cells')
+        self.report_grids(self._spare, new_grid)
+        if self.tracker is not None:
+            old = self._spare
+            self.tracker.update(np.flatnonzero((old == self.TREE) & (new_grid == self.BURNING)),
+                                np.flatnonzero((old == self.BURNING) & (new_grid == self.EMPTY)))
+        # The swap can hand back the grid the active set was built on, so a
+        # later sparse step must not trust it
+        self.invalidate()
+
+    def sparse_update(self):
+        # Rebuild the active set after a dense step, an invalidate() or if the
+        # grid was replaced since the last step
+        if self.burning is None or self._tracked_grid is not self.grid:
+            self.grid = np.ascontiguousarray(self.grid)
+            self._tracked_grid = self.grid
+            self.burning = np.flatnonzero(self.grid == self.BURNING)
+        cells = self.grid.reshape(-1)
+        self.profiler.lap('active set')
+
+        # Fire only spreads to trees next to the burning cells
+        spread = neighbor_cells(self.burning, self.rows, self.cols)
+        spread = spread[cells[spread] == self.TREE]
+        if self.landscape is not None:
+            spread = np.unique(spread)
+            spread_prob = self.landscape.ignition_probability_at(self.grid, spread, self.BURNING)
+            spread = spread[self.rng.random(len(spread)) < spread_prob]
+        self.profiler.lap('spread')
+        # Growth and lightning are sampled as events, then kept only where
+        # the cell is in the right state
+        strikes = sample_cells(cells.size, self.fire_prob, self.rng)
+        strikes = strikes[cells[strikes] == self.TREE]
+        growth = sample_cells(cells.size, self.growth_prob, self.rng)
+        growth = growth[cells[growth] == self.EMPTY]
+        ignited = np.union1d(spread, strikes)
+        self.profiler.lap('sampling')
+        self.report(self.grid, growth=len(growth), ignitions=len(ignited), burn_outs=len(self.burning))
+        if self.tracker is not None:
+            self.tracker.update(ignited, self.burning)
+
+        cells[self.burning] = self.EMPTY
+        cells[growth] = self.TREE
+        self.burning = ignited
+        cells[self.burning] = self.BURNING
+        self.profiler.lap('apply')
+
+    def catches_fire(self, row, col, spread_prob):
+        # Without a landscape any burning neighbour sets a tree alight
+        if spread_prob is None:
+            return self.is_burning_neighbor(row, col)
+        return spread_prob[row, col] > 0 and self.rng.random() < spread_prob[row, col]
 
     def is_burning_neighbor(self, row, col):
         for i in range(max(row-1, 0), min(row+2, self.rows)):
@@ -41,17 +129,11 @@ class ForestSimulation:
         return False
 
     def animate(self, steps, interval=100):
-        fig, ax = plt.subplots()
-        img = ax.imshow(self.grid, cmap='Greens', interpolation='nearest')
-
-        def update_frame(*args):
-            self.update()
-            img.set_data(self.grid)
-            return img,
-
-        ani = FuncAnimation(fig, update_frame, frames=steps, interval=interval, blit=True)
-        plt.show()
+        # Steps in a background thread while the window shows the newest grid
+        from render import watch
+        watch(self, interval, steps=steps, cmap='Greens', vmin=self.EMPTY, vmax=self.BURNING)
 
 # Initialize and run the forest simulation
-forest_sim = ForestSimulation(50, 50, growth_prob=0.01, fire_prob=0.001)
-forest_sim.animate(200)
+if __name__ == '__main__':
+    forest_sim = ForestSimulation(50, 50, growth_prob=0.01, fire_prob=0.001)
+    forest_sim.animate(200)
@@ -0,0 +1,58 @@
+import numpy as np
+
+# Displacements from a cell to its eight nearest neighbours
+NEIGHBOURHOOD = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def sample_cells(n_cells, prob, rng=np.random):
+    """
+    Picks every cell independently with probability prob, without drawing a
+    random number per cell: the number of picks is drawn from a binomial and
+    that many distinct cells are chosen uniformly
+    :param n_cells: Number of cells in the grid
+    :param prob: Probability of picking each cell
+    :param rng: np.random, a RandomState or a Generator
+    :return: Sorted flat indices of the picked cells
+    """
+    k = rng.binomial(n_cells, prob) if prob > 0 else 0
+    picked = np.unique((rng.random(k) * n_cells).astype(np.int64))
+    while len(picked) < k:
+        extra = (rng.random(k - len(picked)) * n_cells).astype(np.int64)
+        picked = np.union1d(picked, extra)
+    return picked
+
+
+def neighbor_cells(cells, rows, cols):
+    """
+    Returns the in-bounds neighbours of the given cells
+    :param cells: Flat indices of the cells
+    :param rows: Number of rows in the grid
+    :param cols: Number of columns in the grid
+    :return: Flat indices of all their neighbours (may contain repeats)
+    """
+    r, c = np.divmod(np.asarray(cells), cols)
+    found = []
+    for dr, dc in NEIGHBOURHOOD:
+        nr, nc = r + dr, c + dc
+        ok = (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+        found.append(nr[ok] * cols + nc[ok])
+    return np.concatenate(found) if found else np.empty(0, dtype=int)
+
+
+def count_neighbors(flat_grid, cells, rows, cols, state):
+    """
+    Counts, for each given cell, how many of its neighbours are in state
+    :param flat_grid: The grid flattened to 1D
+    :param cells: Flat indices of the cells
+    :param rows: Number of rows in the grid
+    :param cols: Number of columns in the grid
+    :param state: The state to count
+    :return: Neighbour count for every cell
+    """
+    r, c = np.divmod(np.asarray(cells), cols)
+    counts = np.zeros(len(r), dtype=int)
+    for dr, dc in NEIGHBOURHOOD:
+        nr, nc = r + dr, c + dc
+        ok = (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+        counts[ok] += flat_grid[nr[ok] * cols + nc[ok]] == state
+    return counts
@@ -0,0 +1,246 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class Node:
+    """
+    A square quadtree node of side 2**level. Nodes are canonical: two nodes
+    with the same children are always the same object, so they can be
+    compared and hashed by identity.
+    """
+    __slots__ = ('level', 'nw', 'ne', 'sw', 'se', 'population')
+
+    def __init__(self, level, nw, ne, sw, se, population):
+        self.level = level
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        self.population = population
+
+
+# The two leaf cells, shared by every universe
+OFF = Node(0, None, None, None, None, 0)
+ON = Node(0, None, None, None, None, 1)
+
+
+class HashLife:
+    def __init__(self, initial_state, cache_size=1000000, max_nodes=4000000):
+        """
+        Game of Life on an unbounded plane using memoized quadtrees
+        :param initial_state: 2D array of 0s and 1s; cell (r, c) of the array
+                              is placed at row r, column c of the plane
+        :param cache_size: Maximum number of memoized results kept (LRU)
+        :param max_nodes: Node table size that triggers a garbage collection
+        """
+        self.cache_size = cache_size
+        self.max_nodes = max_nodes
+        self._nodes = {}
+        self._results = OrderedDict()
+        self._empty = [OFF]
+        self.generation = 0
+
+        grid = np.asarray(initial_state) != 0
+        self.rows, self.cols = grid.shape
+        level = 2
+        while (1 << level) < max(self.rows, self.cols):
+            level += 1
+        square = np.zeros((1 << level, 1 << level), dtype=bool)
+        square[:self.rows, :self.cols] = grid
+        self.root = self._build(square, level)
+        # World coordinates of the root's top-left corner
+        self.top = 0
+        self.left = 0
+
+    def join(self, nw, ne, sw, se):
+        """
+        Returns the canonical node with the given four children
+        """
+        key = (nw, ne, sw, se)
+        node = self._nodes.get(key)
+        if node is None:
+            node = Node(nw.level + 1, nw, ne, sw, se,
+                        nw.population + ne.population + sw.population + se.population)
+            self._nodes[key] = node
+        return node
+
+    def empty(self, level):
+        """
+        Returns the canonical all-dead node of the given level
+        """
+        while len(self._empty) <= level:
+            e = self._empty[-1]
+            self._empty.append(self.join(e, e, e, e))
+        return self._empty[level]
+
+    def _build(self, square, level):
+        if not square.any():
+            return self.empty(level)
+        if level == 0:
+            return ON
+        h = 1 << (level - 1)
+        return self.join(self._build(square[:h, :h], level - 1),
+                         self._build(square[:h, h:], level - 1),
+                         self._build(square[h:, :h], level - 1),
+                         self._build(square[h:, h:], level - 1))
+
+    def _centre(self, node):
+        # The middle half of a node, one level down
+        return self.join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    def _expand(self, node):
+        # The same pattern centred in a node twice the size
+        e = self.empty(node.level - 1)
+        return self.join(self.join(e, e, e, node.nw), self.join(e, e, node.ne, e),
+                         self.join(e, node.sw, e, e), self.join(node.se, e, e, e))
+
+    def _life_4x4(self, node):
+        # Brute-force one generation of the centre 2x2 of a level-2 node
+        cells = [[0] * 4 for _ in range(4)]
+        for qr, qc, quad in ((0, 0, node.nw), (0, 2, node.ne), (2, 0, node.sw), (2, 2, node.se)):
+            cells[qr][qc] = quad.nw.population
+            cells[qr][qc + 1] = quad.ne.population
+            cells[qr + 1][qc] = quad.sw.population
+            cells[qr + 1][qc + 1] = quad.se.population
+        out = []
+        for r in (1, 2):
+            for c in (1, 2):
+                alive = sum(cells[i][j] for i in (r - 1, r, r + 1) for j in (c - 1, c, c + 1)) - cells[r][c]
+                out.append(ON if alive == 3 or (alive == 2 and cells[r][c]) else OFF)
+        return self.join(*out)
+
+    def _next(self, node, j):
+        """
+        Returns the centre of node (one level down) advanced 2**j generations
+        :param node: Node of level k >= 2
+        :param j: Step exponent, at most k - 2
+        """
+        if node.population == 0:
+            return self.empty(node.level - 1)
+        key = (node, j)
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return result
+
+        k = node.level
+        if k == 2:
+            result = self._life_4x4(node)
+        else:
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            subs = (nw, self.join(nw.ne, ne.nw, nw.se, ne.sw), ne,
+                    self.join(nw.sw, nw.se, sw.nw, sw.ne), self._centre(node),
+                    self.join(ne.sw, ne.se, se.nw, se.ne),
+                    sw, self.join(sw.ne, se.nw, sw.se, se.sw), se)
+            if j == k - 2:
+                # Full speed: both halves of the jump go through _next
+                r = [self._next(s, j - 1) for s in subs]
+                inner = j - 1
+            else:
+                r = [self._centre(s) for s in subs]
+                inner = j
+            result = self.join(self._next(self.join(r[0], r[1], r[3], r[4]), inner),
+                               self._next(self.join(r[1], r[2], r[4], r[5]), inner),
+                               self._next(self.join(r[3], r[4], r[6], r[7]), inner),
+                               self._next(self.join(r[4], r[5], r[7], r[8]), inner))
+
+        self._results[key] = result
+        if len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+        return result
+
+    def _is_padded(self, node):
+        # True if every live cell sits in the middle quarter of the node
+        return (node.level >= 3 and
+                node.population == node.nw.se.se.population + node.ne.sw.sw.population +
+                node.sw.ne.ne.population + node.se.nw.nw.population)
+
+    def jump(self, k):
+        """
+        Advances the universe 2**k generations in one call
+        :param k: Step exponent (0 for a single generation)
+        """
+        # Pad until the pattern cannot outrun the centre during the jump
+        while self.root.level < k + 2 or not self._is_padded(self.root):
+            half = 1 << (self.root.level - 1)
+            self.root = self._expand(self.root)
+            self.top -= half
+            self.left -= half
+        self.root = self._next(self._expand(self.root), k)
+        self.generation += 1 << k
+        if len(self._nodes) > self.max_nodes:
+            self.collect()
+
+    def advance(self, generations):
+        """
+        Advances the universe by any number of generations
+        :param generations: Number of generations to advance
+        """
+        k = 0
+        while generations:
+            if generations & 1:
+                self.jump(k)
+            generations >>= 1
+            k += 1
+
+    def update(self):
+        """
+        Advances the universe by one generation
+        """
+        self.jump(0)
+
+    def collect(self):
+        """
+        Drops memoized results and every node not reachable from the root
+        """
+        self._results.clear()
+        self._nodes = {}
+        stack = [self.root] + self._empty[1:]
+        seen = set()
+        while stack:
+            node = stack.pop()
+            if node.level == 0 or id(node) in seen:
+                continue
+            seen.add(id(node))
+            self._nodes[(node.nw, node.ne, node.sw, node.se)] = node
+            stack.extend((node.nw, node.ne, node.sw, node.se))
+
+    @property
+    def population(self):
+        """
+        Number of live cells in the universe
+        """
+        return self.root.population
+
+    def get_region(self, top, left, rows, cols):
+        """
+        Returns part of the plane as a NumPy grid
+        :param top: Row of the region's top-left corner
+        :param left: Column of the region's top-left corner
+        :param rows: Number of rows in the region
+        :param cols: Number of columns in the region
+        :return: (rows, cols) array of 0s and 1s
+        """
+        out = np.zeros((rows, cols), dtype=int)
+        stack = [(self.root, self.top, self.left)]
+        while stack:
+            node, y, x = stack.pop()
+            size = 1 << node.level
+            if (node.population == 0 or y >= top + rows or x >= left + cols or
+                    y + size <= top or x + size <= left):
+                continue
+            if node.level == 0:
+                out[y - top, x - left] = 1
+                continue
+            h = size >> 1
+            stack.extend(((node.nw, y, x), (node.ne, y, x + h),
+                          (node.sw, y + h, x), (node.se, y + h, x + h)))
+        return out
+
+    @property
+    def grid(self):
+        """
+        The region covered by the initial state
+        """
+        return self.get_region(0, 0, self.rows, self.cols)
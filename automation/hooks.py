@@ -0,0 +1,69 @@
+import numpy as np
+
+from profiling import NULL_PROFILER
+
+
+class Hooks:
+    """
+    What the automata and forest simulations share for their optional
+    attachments: a trajectory recorder, a profiler and a convergence
+    detector. A subclass describes its counters with TRANSITIONS and TOTALS,
+    calls report() or report_grids() once per step and finish_step() at the
+    end of update(). Updates should count their events from what they
+    already compute; comparing whole grids is the fallback.
+    """
+    recorder = None  # Optional trajectory writer, given every new grid
+    profiler = NULL_PROFILER  # profiling.Profiler timing each update, or the null one
+    detector = None  # Optional convergence.ConvergenceDetector, ending animate once settled
+
+    # Event name: (state before, state after) of the cells it counts
+    TRANSITIONS = {}
+    # Running total name: (state it counts, event adding to it, event taking from it)
+    TOTALS = {}
+
+    def report(self, old_grid, **events):
+        """
+        Hands a step's event counts to the profiler and keeps its running
+        totals up to date; old_grid is only scanned on the first step
+        """
+        self.profiler.count(**events)
+        for name, (state, added, removed) in self.TOTALS.items():
+            self.profiler.change(name, events[added] - events[removed],
+                                 lambda state=state: np.count_nonzero(old_grid == state))
+        self.profiler.lap('counters')
+
+    def new_moves(self, num_states):
+        """
+        A zeroed moves[before, after] array for an update to count its cells
+        into, or None when the profiler is not counting
+        """
+        return np.zeros((num_states, num_states), dtype=np.int64) if self.profiler.enabled else None
+
+    def report_grids(self, old_grid, new_grid, moves=None):
+        """
+        report() from moves[before, after], the number of cells an update saw
+        go from one state to another. Updates that cannot count their own
+        leave moves out, and the changed cells are found by comparing the
+        grids instead. Does nothing when the profiler is not counting.
+        """
+        if not self.profiler.enabled:
+            return
+        if moves is None:
+            changed = np.flatnonzero(old_grid != new_grid)
+            before, after = old_grid.reshape(-1)[changed], new_grid.reshape(-1)[changed]
+            events = {name: np.count_nonzero((before == a) & (after == b))
+                      for name, (a, b) in self.TRANSITIONS.items()}
+        else:
+            events = {name: int(moves[a, b]) for name, (a, b) in self.TRANSITIONS.items()}
+        self.report(old_grid, **events)
+
+    def finish_step(self):
+        # Hands the new grid to the recorder and closes the profiler's step
+        if self.recorder is not None:
+            self.recorder.write(self.grid)
+        self.profiler.lap('record')
+        self.profiler.end()
+
+    def settled(self):
+        # Whether the detector has seen the run settle, ending animate
+        return self.detector is not None and self.detector.observe(self.grid) is not None
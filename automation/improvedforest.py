@@ -1,32 +1,74 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from .frontier import sample_cells, neighbor_cells, count_neighbors
+from .hooks import Hooks
 
-class ForestSimulation:
+class ForestSimulation(Hooks):
     EMPTY, TREE, BURNING = 0, 1, 2  # States
+    TRANSITIONS = {'growth': (EMPTY, TREE), 'ignitions': (TREE, BURNING), 'burn_outs': (BURNING, EMPTY)}
+    TOTALS = {'trees': (TREE, 'growth', 'ignitions'), 'fires': (BURNING, 'ignitions', 'burn_outs')}
     BURN_DURATION = 3  # Number of steps a tree remains burning
 
-    def __init__(self, rows, cols, growth_prob, fire_prob, fire_jump_prob):
+    def __init__(self, rows, cols, growth_prob, fire_prob, fire_jump_prob, sparse=False, rng=None):
         self.rows = rows
         self.cols = cols
-        self.grid = np.zeros((rows, cols), dtype=int)
-        self.burn_timer = np.zeros((rows, cols), dtype=int)  # Timer for burning trees
+        self.rng = np.random if rng is None else rng  # Source of every random draw
+        self.grid = np.zeros((rows, cols), dtype=np.uint8)
+        self.burn_timer = np.zeros((rows, cols), dtype=np.uint8)  # Timer for burning trees
+        self._spare = np.empty_like(self.grid)  # Swapped with grid on each update
         self.growth_prob = growth_prob
         self.fire_prob = fire_prob
         self.fire_jump_prob = fire_jump_prob
+        self.sparse = sparse  # Only visit the fire front on each update
+        self.burning = None  # Flat indices of burning cells in sparse mode
+        self._tracked_grid = None
+        self.tracker = None  # Optional clusters.FireTracker, following each fire
+        self.landscape = None  # Optional landscape.Landscape, setting the chance of spread
+        self.generation = 0
         self.initialize_forest()
 
     def initialize_forest(self):
         for i in range(self.rows):
             for j in range(self.cols):
-                self.grid[i, j] = np.random.choice([self.EMPTY, self.TREE], p=[1-self.growth_prob, self.growth_prob])
+                self.grid[i, j] = self.rng.choice([self.EMPTY, self.TREE], p=[1-self.growth_prob, self.growth_prob])
 
     def update(self):
-        new_grid = np.copy(self.grid)
+        self.profiler.begin()
+        if self.sparse:
+            self.sparse_update()
+        else:
+            self.dense_update()
+        self.generation += 1
+        self.finish_step()
+
+    def set_grid(self, grid, burn_timer=None):
+        # Replaces the grid, e.g. with an edited copy or from a checkpoint,
+        # of any size. The burn timers are reset if the size changes and none
+        # are given.
+        if grid.shape != self.grid.shape:
+            self.rows, self.cols = grid.shape
+            self._spare = np.empty_like(grid)
+            if burn_timer is None:
+                burn_timer = np.zeros(grid.shape, dtype=np.uint8)
+        self.grid = grid
+        if burn_timer is not None:
+            self.burn_timer = burn_timer
+        self.invalidate()
+
+    def invalidate(self):
+        # Drops the sparse active set, so the next sparse step rebuilds it;
+        # call after editing grid and burn_timer in place
+        self.burning = None
+
+    def dense_update(self):
+        if self._spare.shape != self.grid.shape or self._spare.dtype != self.grid.dtype:
+            self._spare = np.empty_like(self.grid)
+        new_grid = self._spare
+        np.copyto(new_grid, self.grid)
+        spread_prob = None if self.landscape is None else self.landscape.ignition_probability(self.grid == self.BURNING)
         for i in range(self.rows):
             for j in range(self.cols):
                 if self.grid[i, j] == self.TREE:
-                    if self.is_burning_neighbor(i, j) or (np.random.rand() < self.fire_jump_prob and self.has_tree_neighbor(i, j)):
+                    if self.catches_fire(i, j, spread_prob) or (self.rng.random() < self.fire_jump_prob and self.has_tree_neighbor(i, j)):
                         new_grid[i, j] = self.BURNING
                         self.burn_timer[i, j] = self.BURN_DURATION
                 elif self.grid[i, j] == self.BURNING:
@@ -35,15 +77,71 @@ class ForestSimulation:
                     else:
                         new_grid[i, j] = self.EMPTY
                 elif self.grid[i, j] == self.EMPTY:
-                    if np.random.rand() < self.growth_prob * self.tree_neighbor_count(i, j) / 8:
+                    if self.rng.random() < self.growth_prob * self.tree_neighbor_count(i, j) / 8:
                         new_grid[i, j] = self.TREE
                 
                 # Randomly start fires
-                if self.grid[i, j] == self.TREE and np.random.rand() < self.fire_prob:
+                if self.grid[i, j] == self.TREE and self.rng.random() < self.fire_prob:
                     new_grid[i, j] = self.BURNING
                     self.burn_timer[i, j] = self.BURN_DURATION
 
-        self.grid = new_grid
+        self._spare, self.grid = self.grid, new_grid
+        self.profiler.lap('cells')
+        self.report_grids(self._spare, new_grid)
+        if self.tracker is not None:
+            old = self._spare
+            self.tracker.update(np.flatnonzero((old == self.TREE) & (new_grid == self.BURNING)),
+                                np.flatnonzero((old == self.BURNING) & (new_grid == self.EMPTY)))
+        # The swap can hand back the grid the active set was built on, so a
+        # later sparse step must not trust it
+        self.invalidate()
+
+    def sparse_update(self):
+        # Rebuild the active set after a dense step, an invalidate() or if the
+        # grid was replaced since the last step
+        if self.burning is None or self._tracked_grid is not self.grid:
+            self.grid = np.ascontiguousarray(self.grid)
+            self.burn_timer = np.ascontiguousarray(self.burn_timer)
+            self._tracked_grid = self.grid
+            self.burning = np.flatnonzero(self.grid == self.BURNING)
+        cells = self.grid.reshape(-1)
+        timer = self.burn_timer.reshape(-1)
+        self.profiler.lap('active set')
+
+        # Fire only spreads to trees next to the burning cells. A tree always
+        # counts itself in has_tree_neighbor, so a fire jump is just another
+        # per-tree event like lightning.
+        spread = neighbor_cells(self.burning, self.rows, self.cols)
+        spread = spread[cells[spread] == self.TREE]
+        if self.landscape is not None:
+            spread = np.unique(spread)
+            spread_prob = self.landscape.ignition_probability_at(self.grid, spread, self.BURNING)
+            spread = spread[self.rng.random(len(spread)) < spread_prob]
+        self.profiler.lap('spread')
+        strikes = np.union1d(sample_cells(cells.size, self.fire_jump_prob, self.rng),
+                             sample_cells(cells.size, self.fire_prob, self.rng))
+        strikes = strikes[cells[strikes] == self.TREE]
+        # Growth depends on the tree neighbours, so sample at the highest
+        # rate (8 tree neighbours) and thin each candidate down to its own
+        candidates = sample_cells(cells.size, self.growth_prob, self.rng)
+        candidates = candidates[cells[candidates] == self.EMPTY]
+        trees = count_neighbors(cells, candidates, self.rows, self.cols, self.TREE)
+        growth = candidates[self.rng.random(len(candidates)) < trees / 8]
+        ignited = np.union1d(spread, strikes)
+        burnt_out = timer[self.burning] == 0
+        self.profiler.lap('sampling')
+        self.report(self.grid, growth=len(growth), ignitions=len(ignited), burn_outs=np.count_nonzero(burnt_out))
+        if self.tracker is not None:
+            self.tracker.update(ignited, self.burning[burnt_out])
+
+        # Only burning cells have their timers touched
+        cells[self.burning[burnt_out]] = self.EMPTY
+        timer[self.burning[~burnt_out]] -= 1
+        cells[growth] = self.TREE
+        cells[ignited] = self.BURNING
+        timer[ignited] = self.BURN_DURATION
+        self.burning = np.concatenate([self.burning[~burnt_out], ignited])
+        self.profiler.lap('apply')
 
     def tree_neighbor_count(self, row, col):
         count = 0
@@ -53,6 +151,12 @@ class ForestSimulation:
                     count += 1
         return count
 
+    def catches_fire(self, row, col, spread_prob):
+        # Without a landscape any burning neighbour sets a tree alight
+        if spread_prob is None:
+            return self.is_burning_neighbor(row, col)
+        return spread_prob[row, col] > 0 and self.rng.random() < spread_prob[row, col]
+
     def is_burning_neighbor(self, row, col):
         for i in range(max(row-1, 0), min(row+2, self.rows)):
             for j in range(max(col-1, 0), min(col+2, self.cols)):
@@ -64,18 +168,11 @@ class ForestSimulation:
         return self.tree_neighbor_count(row, col) > 0
 
     def animate(self, steps, interval=100):
-        fig, ax = plt.subplots()
-        img = ax.imshow(self.grid, cmap='Greens', interpolation='nearest')
-
-        def update_frame(*args):
-            self.update()
-            img.set_data(self.grid)
-            return img,
-
-        ani = FuncAnimation(fig, update_frame, frames=steps, interval=interval, blit=True)
-        plt.show()
+        # Steps in a background thread while the window shows the newest grid
+        from render import watch
+        watch(self, interval, steps=steps, cmap='Greens', vmin=self.EMPTY, vmax=self.BURNING)
 
 # Initialize and run the forest simulation
-forest_sim = ForestSimulation(50, 50, growth_prob=0.02, fire_prob=0.001, fire_jump_prob=0.0005)
-forest_sim.animate(200)
-
+if __name__ == '__main__':
+    forest_sim = ForestSimulation(50, 50, growth_prob=0.02, fire_prob=0.001, fire_jump_prob=0.0005)
+    forest_sim.animate(200)
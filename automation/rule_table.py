@@ -0,0 +1,150 @@
+import itertools
+
+import numpy as np
+
+# Neighbour list lengths seen by CellularAutomaton.get_neighbors: 3 in a
+# corner, 5 along an edge and 8 everywhere else (the clipped boundary).
+CLIPPED_SIZES = (3, 5, 8)
+# The toroidal boundary always hands the rule all eight neighbours.
+WRAPPED_SIZES = (8,)
+
+
+# Most neighbour patterns compile_rule will try per (state, list length);
+# rules with more states or longer lists than this are left to the loop
+MAX_PATTERNS = 1 << 16
+
+
+def compile_rule(rule_func, num_states=2, neighborhood_sizes=CLIPPED_SIZES):
+    """
+    Probes rule_func with every neighbour list it can be given and returns
+    the results as a lookup table, or None if the rule is not totalistic.
+    The check is exact: any rule whose answer depends on more than the
+    neighbour sum is caught.
+    :param rule_func: A function that defines the rule of the automaton
+    :param num_states: Number of cell states (0 .. num_states-1)
+    :param neighborhood_sizes: Neighbour list lengths the rule will be given
+    :return: An int array indexed as table[state, neighbour_sum], or None
+             (also when there are more than MAX_PATTERNS lists to try)
+    """
+    if any(num_states ** length > MAX_PATTERNS for length in neighborhood_sizes):
+        return None
+    max_sum = max(neighborhood_sizes) * (num_states - 1)
+    table = np.full((num_states, max_sum + 1), -1, dtype=int)
+    for state in range(num_states):
+        for length in neighborhood_sizes:
+            for pattern in itertools.product(range(num_states), repeat=length):
+                neighbors = np.array(pattern, dtype=int)
+                total = sum(pattern)
+                try:
+                    result = rule_func(state, neighbors)
+                    value = int(result)
+                except Exception:
+                    return None
+                # The rule has to produce one of the known states
+                if value != result or not 0 <= value < num_states:
+                    return None
+                if table[state, total] == -1:
+                    table[state, total] = value
+                elif table[state, total] != value:
+                    # Same sum, different answer: not totalistic
+                    return None
+    return table
+
+
+def table_applies(table, grid):
+    """
+    Checks whether the grid can be stepped with the lookup table
+    :param table: Table returned by compile_rule (may be None)
+    :param grid: The current grid
+    :return: True if every cell holds a state the table knows about
+    """
+    if table is None:
+        return False
+    if not (np.issubdtype(grid.dtype, np.integer) or grid.dtype == bool):
+        return False
+    return grid.size == 0 or (grid.min() >= 0 and grid.max() < table.shape[0])
+
+
+def _box_sums(cells):
+    """
+    Returns the sum of every clipped 3x3 window, centre cell included
+    :param cells: The grid as an integer array
+    """
+    rows, cols = cells.shape
+    padded = np.pad(cells, 1)
+    box = np.zeros_like(cells)
+    for dr in range(3):
+        for dc in range(3):
+            box += padded[dr:dr + rows, dc:dc + cols]
+    return box
+
+
+def clipped_neighbor_counts(grid):
+    """
+    Returns the neighbour sum of every cell exactly as the per-cell loop sees
+    it through get_neighbors: the window is clipped at the edges and the
+    element in the middle of the flattened window is dropped, which is the
+    cell itself everywhere except on the border
+    :param grid: The current grid
+    :return: An int array of neighbour sums
+    """
+    cells = grid.astype(np.intp)
+    rows, cols = cells.shape
+    counts = _box_sums(cells)
+    counts -= cells
+    if rows == 0 or cols == 0:
+        return counts
+
+    # Only border cells drop something other than themselves, so only
+    # those need fixing up.
+    all_rows, all_cols = np.arange(rows), np.arange(cols)
+    ii = np.concatenate([np.zeros(cols, dtype=int), np.full(cols, rows - 1),
+                         all_rows, all_rows])
+    jj = np.concatenate([all_cols, all_cols,
+                         np.zeros(rows, dtype=int), np.full(rows, cols - 1)])
+    r0 = np.maximum(ii - 1, 0)
+    c0 = np.maximum(jj - 1, 0)
+    height = np.minimum(ii + 2, rows) - r0
+    width = np.minimum(jj + 2, cols) - c0
+    middle = (height * width) // 2
+    dropped = cells[r0 + middle // width, c0 + middle % width]
+    counts[ii, jj] = counts[ii, jj] + cells[ii, jj] - dropped
+    return counts
+
+
+def wrapped_neighbor_counts(grid):
+    """
+    Returns the neighbour sum of every cell on a toroidal grid
+    :param grid: The current grid
+    :return: An int array of neighbour sums
+    """
+    cells = grid.astype(np.intp)
+    counts = np.zeros_like(cells)
+    for dr in (-1, 0, 1):
+        rolled = np.roll(cells, dr, axis=0)
+        for dc in (-1, 0, 1):
+            if dr == 0 and dc == 0:
+                continue
+            counts += np.roll(rolled, dc, axis=1)
+    return counts
+
+
+def apply_table(table, grid, counts, moves=None):
+    """
+    Computes the next generation with a single table lookup
+    :param table: Table returned by compile_rule
+    :param grid: The current grid
+    :param counts: Neighbour sums for every cell
+    :param moves: Optional square int array; moves[a, b] is increased by the
+                  number of cells going from state a to state b, counted from
+                  the lookup keys rather than by comparing grids
+    :return: The next grid, with the same dtype as the current one
+    """
+    keys = grid.astype(np.intp) * table.shape[1]
+    keys += counts
+    if moves is not None:
+        # Cells per (state, neighbour sum), each of which the table sends
+        # to one new state
+        seen = np.bincount(keys.reshape(-1), minlength=table.size).reshape(table.shape)
+        np.add.at(moves, (np.arange(table.shape[0])[:, None], table), seen)
+    return table.reshape(-1).take(keys).astype(grid.dtype, copy=False)
@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 def simple_rule(state, neighbors):
     # Simple rule: A cell becomes 1 if exactly one of its neighbors is 1
@@ -19,18 +18,19 @@ class SimpleCellularAutomaton:
         self.grid = new_grid
 
     def animate(self, steps):
+        import matplotlib.pyplot as plt
         plt.figure()
-        for step in range(steps):
-            if step == 0:
-                plt.imshow([self.grid], cmap='binary', aspect='auto')
-            else:
-                self.update()
-                plt.imshow([self.grid], cmap='binary', aspect='auto', extent=[0, self.size, step, step+1])
+        history = [self.grid.copy()]
+        for _ in range(1, steps):
+            self.update()
+            history.append(self.grid.copy())
+        plt.imshow(history, cmap='binary', aspect='auto')
         plt.xlabel("Cell Index")
         plt.ylabel("Time Step")
         plt.title("Simple 1D Cellular Automaton")
         plt.show()
 
 # Initialize and run the simple cellular automaton
-automaton = SimpleCellularAutomaton(50, simple_rule)
-automaton.animate(30)
+if __name__ == '__main__':
+    automaton = SimpleCellularAutomaton(50, simple_rule)
+    automaton.animate(30)
@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 def advanced_rule(state, neighbors):
     # A more complex rule: A cell toggles its state if exactly one neighbor is in state 1
@@ -22,13 +21,13 @@ class AdvancedCellularAutomaton:
         self.grid = new_grid
 
     def animate(self, steps):
+        import matplotlib.pyplot as plt
         plt.figure()
-        for step in range(steps):
-            if step == 0:
-                plt.imshow([self.grid], cmap='binary', aspect='auto')
-            else:
-                self.update()
-                plt.imshow([self.grid], cmap='binary', aspect='auto', extent=[0, self.size, step, step+1])
+        history = [self.grid.copy()]
+        for _ in range(1, steps):
+            self.update()
+            history.append(self.grid.copy())
+        plt.imshow(history, cmap='binary', aspect='auto')
         plt.xlabel("Cell Index")
         plt.ylabel("Time Step")
         plt.title("Advanced 1D Cellular Automaton")
@@ -40,5 +39,6 @@ initial_state = [0, 1, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0, 1, 1, 0, 0, 1, 0, 1, 0,
                  1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0]
 
 # Initialize and run the advanced cellular automaton
-automaton = AdvancedCellularAutomaton(50, advanced_rule, initial_state=initial_state)
-automaton.animate(30)  # Visualize for 30 steps
+if __name__ == '__main__':
+    automaton = AdvancedCellularAutomaton(50, advanced_rule, initial_state=initial_state)
+    automaton.animate(30)  # Visualize for 30 steps
@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 def dynamic_rule(state, neighbors):
     # A dynamic rule based on the number of active neighbors
@@ -28,6 +27,7 @@ class DynamicCellularAutomaton:
         self.grid = new_grid
 
     def animate(self, steps):
+        import matplotlib.pyplot as plt
         plt.figure()
         history = [self.grid.copy()]
         for _ in range(steps):
@@ -43,5 +43,6 @@ class DynamicCellularAutomaton:
 initial_state = [0] * 25 + [1] + [0] * 24  # Single active cell in the middle
 
 # Initialize and run the dynamic cellular automaton
-automaton = DynamicCellularAutomaton(50, dynamic_rule, initial_state=initial_state)
-automaton.animate(50)  # Visualize for 50 steps
+if __name__ == '__main__':
+    automaton = DynamicCellularAutomaton(50, dynamic_rule, initial_state=initial_state)
+    automaton.animate(50)  # Visualize for 50 steps
@@ -1,8 +1,11 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from .rule_table import compile_rule, table_applies, apply_table, clipped_neighbor_counts, CLIPPED_SIZES
+from .hooks import Hooks
+
+class CellularAutomaton(Hooks):
+    TRANSITIONS = {'births': (0, 1), 'deaths': (1, 0)}
+    TOTALS = {'alive': (1, 'births', 'deaths')}
 
-class CellularAutomaton:
     def __init__(self, rows, cols, rule_func, initial_state=None):
         """
         Initializes the cellular automaton
@@ -18,18 +21,32 @@ class CellularAutomaton:
         else:
             self.grid = np.array(initial_state)
         self.rule_func = rule_func
+        self.rule_table = compile_rule(rule_func, neighborhood_sizes=CLIPPED_SIZES)
 
     def update(self):
         """
         Updates the grid based on the rule function
         """
-        new_grid = self.grid.copy()
-        for i in range(self.rows):
-            for j in range(self.cols):
-                state = self.grid[i, j]
-                neighbors = self.get_neighbors(i, j)
-                new_grid[i, j] = self.rule_func(state, neighbors)
-        self.grid = new_grid
+        self.profiler.begin()
+        old_grid, moves = self.grid, None
+        if table_applies(self.rule_table, self.grid):
+            # Totalistic rule: one neighbour count plus one table lookup
+            counts = clipped_neighbor_counts(self.grid)
+            self.profiler.lap('neighbours')
+            moves = self.new_moves(len(self.rule_table))
+            self.grid = apply_table(self.rule_table, self.grid, counts, moves)
+            self.profiler.lap('rule')
+        else:
+            new_grid = self.grid.copy()
+            for i in range(self.rows):
+                for j in range(self.cols):
+                    state = self.grid[i, j]
+                    neighbors = self.get_neighbors(i, j)
+                    new_grid[i, j] = self.rule_func(state, neighbors)
+            self.grid = new_grid
+            self.profiler.lap('cells')
+        self.report_grids(old_grid, self.grid, moves)
+        self.finish_step()
 
     def get_neighbors(self, row, col):
         """
@@ -45,20 +62,13 @@ class CellularAutomaton:
 
     def animate(self, steps, interval=100):
         """
-        Animates the evolution of the cellular automaton
+        Animates the evolution of the cellular automaton, stepping it in a
+        background thread while the window shows the newest grid
         :param steps: Number of steps to animate
         :param interval: Time interval between frames in milliseconds
         """
-        fig, ax = plt.subplots()
-        img = ax.imshow(self.grid, interpolation='nearest', cmap='viridis')
-
-        def update_frame(*args):
-            self.update()
-            img.set_data(self.grid)
-            return img,
-
-        ani = FuncAnimation(fig, update_frame, frames=steps, interval=interval, blit=True)
-        plt.show()
+        from render import watch
+        watch(self, interval, steps=steps, cmap='viridis', vmin=0, vmax=1)
 
 # Example rule function for Conway's Game of Life
 def conways_rule(state, neighbors):
@@ -73,5 +83,6 @@ def conways_rule(state, neighbors):
         return state
 
 # Initialize and run the cellular automaton
-automaton = CellularAutomaton(50, 50, conways_rule)
-automaton.animate(100)
+if __name__ == '__main__':
+    automaton = CellularAutomaton(50, 50, conways_rule)
+    automaton.animate(100)
@@ -1,7 +1,6 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Slider, Button
-from matplotlib.animation import FuncAnimation
+from .rule_table import compile_rule, table_applies, apply_table, clipped_neighbor_counts, CLIPPED_SIZES
+from .hooks import Hooks
 
 def conways_rule(state, neighbors):
     alive_neighbors = sum(neighbors)
@@ -14,22 +13,39 @@ def conways_rule(state, neighbors):
     else:
         return state
 
-class CellularAutomaton:
+class CellularAutomaton(Hooks):
+    TRANSITIONS = {'births': (0, 1), 'deaths': (1, 0)}
+    TOTALS = {'alive': (1, 'births', 'deaths')}
+
     def __init__(self, rows, cols, rule_func, initial_state=None, cmap='viridis'):
         self.rows = rows
         self.cols = cols
         self.grid = np.random.choice([0, 1], size=(rows, cols)) if initial_state is None else np.array(initial_state)
         self.rule_func = rule_func
+        self.rule_table = compile_rule(rule_func, neighborhood_sizes=CLIPPED_SIZES)
         self.cmap = cmap
 
     def update(self):
-        new_grid = np.copy(self.grid)
-        for i in range(self.rows):
-            for j in range(self.cols):
-                state = self.grid[i, j]
-                neighbors = self.get_neighbors(i, j)
-                new_grid[i, j] = self.rule_func(state, neighbors)
-        self.grid = new_grid
+        self.profiler.begin()
+        old_grid, moves = self.grid, None
+        if table_applies(self.rule_table, self.grid):
+            # Totalistic rule: one neighbour count plus one table lookup
+            counts = clipped_neighbor_counts(self.grid)
+            self.profiler.lap('neighbours')
+            moves = self.new_moves(len(self.rule_table))
+            self.grid = apply_table(self.rule_table, self.grid, counts, moves)
+            self.profiler.lap('rule')
+        else:
+            new_grid = np.copy(self.grid)
+            for i in range(self.rows):
+                for j in range(self.cols):
+                    state = self.grid[i, j]
+                    neighbors = self.get_neighbors(i, j)
+                    new_grid[i, j] = self.rule_func(state, neighbors)
+            self.grid = new_grid
+            self.profiler.lap('cells')
+        self.report_grids(old_grid, self.grid, moves)
+        self.finish_step()
 
     def get_neighbors(self, row, col):
         neighbors = self.grid[max(row-1, 0):min(row+2, self.rows),
@@ -37,9 +53,11 @@ class CellularAutomaton:
         return np.delete(neighbors, len(neighbors)//2)
 
     def animate(self, steps, interval=100):
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Slider, Button
+        from render import attach
         fig, ax = plt.subplots()
         plt.subplots_adjust(left=0.1, bottom=0.35)
-        img = ax.imshow(self.grid, interpolation='nearest', cmap=self.cmap)
 
         ax_scale = plt.axes([0.1, 0.2, 0.65, 0.03], facecolor='lightgoldenrodyellow')
         scale_slider = Slider(ax_scale, 'Scale', 1, 10, valinit=1, valstep=1)
@@ -47,20 +65,27 @@ class CellularAutomaton:
         ax_button = plt.axes([0.8, 0.2, 0.1, 0.04])
         scale_button = Button(ax_button, 'Apply Scale')
 
-        def update_frame(*args):
-            self.update()
-            img.set_data(self.grid)
-            return img,
+        # Stepped in a background thread; the window shows the newest grid
+        live = {}
+
+        def start():
+            live['ani'], live['worker'] = attach(self, fig, ax, steps, interval, cmap=self.cmap, vmin=0, vmax=1)
 
         def apply_scale(event):
+            # The grid changes shape, so stop the running simulation before
+            # resizing it and start drawing the new one from scratch
+            live['ani'].event_source.stop()
+            live['worker'].stop()
             scale_factor = int(scale_slider.val)
             self.reset(scale_factor * 10, scale_factor * 10)  # Adjust base size as needed
-            img.set_data(self.grid)
+            ax.clear()
+            start()
             fig.canvas.draw_idle()
 
         scale_button.on_clicked(apply_scale)
-        ani = FuncAnimation(fig, update_frame, frames=steps, interval=interval, blit=True)
+        start()
         plt.show()
+        live['worker'].stop()
 
     def reset(self, new_rows, new_cols):
         self.rows = new_rows
@@ -68,5 +93,6 @@ class CellularAutomaton:
         self.grid = np.random.choice([0, 1], size=(new_rows, new_cols))
 
 # Initialize and run the cellular automaton
-automaton = CellularAutomaton(50, 50, conways_rule, cmap='plasma')
-automaton.animate(100)
+if __name__ == '__main__':
+    automaton = CellularAutomaton(50, 50, conways_rule, cmap='plasma')
+    automaton.animate(100)
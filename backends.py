@@ -0,0 +1,232 @@
+import importlib.util
+import time
+
+import numpy as np
+
+from fire import EMPTY, TREE, FIRE
+
+# Largest grid in cells the cell-by-cell Python backend is calibrated on;
+# beyond this one step takes seconds
+LOOP_CELLS = 250000
+
+# Every backend advances the iterate_with_wind model by one generation with
+# the same signature, step(X, growth_draws, lightning_draws, p, f, wind_speed),
+# taking its random numbers ready drawn so all of them agree given the same
+# stream. name: step function
+BACKENDS = {}
+_chosen = {}  # Grid shape to the calibrated backend name
+
+
+def register(name):
+    """
+    Decorator adding a step function to BACKENDS under name
+    """
+    def add(step):
+        BACKENDS[name] = step
+        return step
+    return add
+
+
+def draw(shape, rng=np.random):
+    # The growth and lightning draws, in iterate_with_wind's order
+    return rng.random(shape), rng.random(shape)
+
+
+def _cell_step(X, growth_draws, lightning_draws, p, f, wind_speed):
+    # One cell at a time, written so Numba can compile it unchanged
+    rows, cols = X.shape
+    X1 = X.copy()
+    for i in range(rows):
+        for j in range(cols):
+            state = X[i, j]
+            if state == FIRE:
+                X1[i, j] = EMPTY
+            elif state == EMPTY:
+                if growth_draws[i, j] < p:
+                    X1[i, j] = TREE
+            elif state == TREE:
+                catch = lightning_draws[i, j] < f
+                # The wind wraps round the grid, as np.roll does
+                if wind_speed > 0 and X[i, (j + wind_speed) % cols] == FIRE:
+                    catch = True
+                for di in range(-1, 2):
+                    for dj in range(-1, 2):
+                        r, c = i + di, j + dj
+                        if (di != 0 or dj != 0) and 0 <= r < rows and 0 <= c < cols and X[r, c] == FIRE:
+                            catch = True
+                if catch:
+                    X1[i, j] = FIRE
+    return X1
+
+
+register('python')(_cell_step)
+
+_jitted = None
+
+# Numba is found without importing it, so only using the backend pays for it
+if importlib.util.find_spec('numba') is not None:
+    @register('numba')
+    def _numba_step(X, growth_draws, lightning_draws, p, f, wind_speed):
+        global _jitted
+        if _jitted is None:
+            import numba
+            _jitted = numba.njit(cache=True)(_cell_step)
+        return _jitted(X, growth_draws, lightning_draws, p, f, wind_speed)
+
+
+@register('numpy')
+def _numpy_step(X, growth_draws, lightning_draws, p, f, wind_speed):
+    rows, cols = X.shape
+    fire = X == FIRE
+    # Any burning neighbour, with cells beyond the edge empty
+    padded = np.pad(fire, 1)
+    exposed = np.zeros(X.shape, dtype=bool)
+    for dr in range(3):
+        for dc in range(3):
+            if (dr, dc) != (1, 1):
+                exposed |= padded[dr:dr + rows, dc:dc + cols]
+    if wind_speed > 0:
+        exposed |= np.roll(fire, -wind_speed, axis=1)
+
+    X1 = X.copy()
+    X1[(X == EMPTY) & (growth_draws < p)] = TREE
+    X1[(X == TREE) & (exposed | (lightning_draws < f))] = FIRE
+    X1[fire] = EMPTY
+    return X1
+
+
+class _Replay:
+    # Stands in for an rng, handing back draws made beforehand
+    def __init__(self, *draws):
+        self._draws = list(draws)
+
+    def random(self, shape):
+        return self._draws.pop(0)
+
+
+@register('scipy')
+def _scipy_step(X, growth_draws, lightning_draws, p, f, wind_speed):
+    # fire.iterate_with_wind itself, convolving with SciPy
+    from fire import iterate_with_wind
+    return iterate_with_wind(X, p, f, wind_speed, _Replay(growth_draws, lightning_draws))
+
+
+def _test_grid(shape, rng):
+    # Half trees with a few fires, so every branch of the rules is taken
+    X = np.where(rng.random(shape) < 0.5, TREE, EMPTY)
+    X[rng.random(shape) < 0.02] = FIRE
+    return X
+
+
+def calibrate(shape, p=0.05, f=0.0001, wind_speed=1, repeats=3, seed=0, backends=None):
+    """
+    Times each backend on a grid of the given shape and remembers the fastest
+    for it, which step then uses
+    :param shape: Grid shape
+    :param p: Tree growth probability
+    :param f: Lightning probability
+    :param wind_speed: Wind speed
+    :param repeats: Steps timed per backend; the quickest counts
+    :param seed: Seed for the test grid and draws
+    :param backends: Names to try (all registered if None, leaving out
+                     'python' on grids over LOOP_CELLS)
+    :return: (fastest name, dict of name to seconds per step)
+    """
+    rng = np.random.default_rng(seed)
+    X = _test_grid(shape, rng)
+    growth_draws, lightning_draws = draw(shape, rng)
+    timings = {}
+    for name in BACKENDS if backends is None else backends:
+        # The loop is only skipped when it was not asked for by name
+        if name == 'python' and backends is None and X.size > LOOP_CELLS:
+            continue
+        step = BACKENDS[name]
+        # Untimed first call, which compiles the Numba backend
+        step(X, growth_draws, lightning_draws, p, f, wind_speed)
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            step(X, growth_draws, lightning_draws, p, f, wind_speed)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    if not timings:
+        raise ValueError("no backends to calibrate")
+    fastest = min(timings, key=timings.get)
+    _chosen[tuple(shape)] = fastest
+    return fastest, timings
+
+
+def choose(shape):
+    # The calibrated backend for this grid shape, calibrating on first use
+    shape = tuple(shape)
+    if shape not in _chosen:
+        calibrate(shape)
+    return _chosen[shape]
+
+
+def step(X, p, f, wind_speed, rng=np.random, backend=None):
+    """
+    iterate_with_wind on the fastest backend for the grid's shape
+    :param X: Current grid
+    :param p: Tree growth probability
+    :param f: Lightning probability
+    :param wind_speed: Wind speed
+    :param rng: np.random, a RandomState or a Generator
+    :param backend: Name of the backend to use instead of the calibrated one
+    :return: New grid
+    """
+    growth_draws, lightning_draws = draw(X.shape, rng)
+    return BACKENDS[backend or choose(X.shape)](X, growth_draws, lightning_draws, p, f, wind_speed)
+
+
+def check_conformance(shape=(40, 60), steps=30, seed=0, p=0.05, f=0.001, wind_speeds=(0, 1, 3), backends=None):
+    """
+    Runs every backend from the same grid on the same random stream and
+    compares their grids after every step against the reference 'python'
+    backend
+    :param shape: Grid shape
+    :param steps: Steps per wind speed
+    :param seed: Seed for the grid and the random stream
+    :param p: Tree growth probability
+    :param f: Lightning probability
+    :param wind_speeds: Wind speeds to check
+    :param backends: Names to check (all registered if None)
+    :return: List of (name, wind speed, step, differing cells) for each
+             mismatch; empty if all agree
+    """
+    names = [name for name in backends or BACKENDS if name != 'python']
+    mismatches = []
+    for wind_speed in wind_speeds:
+        rng = np.random.default_rng(seed)
+        reference = _test_grid(shape, rng)
+        grids = dict.fromkeys(names, reference)
+        for i in range(1, steps + 1):
+            growth_draws, lightning_draws = draw(shape, rng)
+            reference = _cell_step(reference, growth_draws, lightning_draws, p, f, wind_speed)
+            for name in names:
+                grids[name] = BACKENDS[name](grids[name], growth_draws, lightning_draws, p, f, wind_speed)
+                differing = int(np.count_nonzero(grids[name] != reference))
+                if differing:
+                    mismatches.append((name, wind_speed, i, differing))
+                    # Carry on from the reference so one slip is counted once
+                    grids[name] = reference
+    return mismatches
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Check and calibrate the iterate_with_wind backends')
+    parser.add_argument('--size', type=int, default=500, help='grid side length to calibrate on')
+    args = parser.parse_args()
+
+    print('backends:', ', '.join(BACKENDS))
+    mismatches = check_conformance()
+    for name, wind_speed, i, differing in mismatches:
+        print(f'{name} differs from python at wind {wind_speed}, step {i}: {differing} cells')
+    if not mismatches:
+        print('all backends agree')
+    fastest, timings = calibrate((args.size, args.size))
+    for name, seconds in sorted(timings.items(), key=lambda item: item[1]):
+        print(f'{name:8s} {seconds * 1e3:10.3f} ms/step')
+    print('fastest:', fastest)
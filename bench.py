@@ -0,0 +1,274 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from backends import LOOP_CELLS
+from fire import EMPTY, TREE, iterate_with_wind
+from lean import LeanForest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HISTORY = os.path.join(HERE, 'bench_history.jsonl')
+
+SIZES = (50, 100, 500, 1000, 2000, 5000, 10000)
+DENSITIES = (0.2, 0.5, 0.8)
+# Forest parameters: growth, lightning and wind speed
+P, F, WIND = 0.05, 0.0001, 1
+
+_scripts = {}
+
+
+def load_script(name):
+    """
+    Loads one of the automation modules
+    :param name: File name in automation/
+    :return: The module's namespace
+    """
+    if name not in _scripts:
+        _scripts[name] = vars(importlib.import_module('automation.' + os.path.splitext(name)[0]))
+    return _scripts[name]
+
+
+def random_forest(size, density, rng):
+    # Trees at the given density inside an empty border, as initialize_grid
+    X = np.zeros((size, size), dtype=int)
+    X[1:-1, 1:-1] = np.where(rng.random((size - 2, size - 2)) < density, TREE, EMPTY)
+    return X
+
+
+# Each engine is set up by a function of (size, density, rng) returning a
+# step function that advances it by one generation
+
+def _fire(size, density, rng):
+    state = {'X': random_forest(size, density, rng)}
+
+    def step():
+        state['X'] = iterate_with_wind(state['X'], P, F, WIND, rng)
+    return step
+
+
+def _lean(size, density, rng):
+    forest = LeanForest(random_forest(size, density, rng), rng)
+    return lambda: forest.update(P, F, WIND)
+
+
+def _test(size, density, rng):
+    iterate = load_script('test.py')['iterate']
+    state = {'X': random_forest(size, density, rng).astype(float)}
+
+    def step():
+        state['X'] = iterate(state['X'], P, F, rng)
+    return step
+
+
+def _forest(script, sparse):
+    def setup(size, density, rng):
+        ForestSimulation = load_script(script)['ForestSimulation']
+        args = (P, F, 0.0005) if script == 'improvedforest.py' else (P, F)
+        # Build a 1x1 forest and swap in the grid, skipping the per-cell
+        # initialisation loop
+        sim = ForestSimulation(1, 1, *args, sparse=sparse, rng=rng)
+        sim.set_grid(random_forest(size, density, rng).astype(np.uint8))
+        return sim.update
+    return setup
+
+
+def _life(script):
+    def setup(size, density, rng):
+        ns = load_script(script)
+        automaton = ns['CellularAutomaton'](size, size, ns['conways_rule'])
+        automaton.grid = (rng.random((size, size)) < density).astype(int)
+        return automaton.update
+    return setup
+
+
+def _bitlife(size, density, rng):
+    BitPackedLife = load_script('bitlife.py')['BitPackedLife']
+    automaton = BitPackedLife(size, size, rng.random((size, size)) < density)
+    return automaton.update
+
+
+# name: (setup, largest grid in cells or None)
+ENGINES = {
+    'fire.iterate_with_wind': (_fire, None),
+    'lean.LeanForest': (_lean, None),
+    'test.iterate': (_test, LOOP_CELLS),
+    'forest.ForestSimulation': (_forest('forest.py', False), LOOP_CELLS),
+    'forest.ForestSimulation[sparse]': (_forest('forest.py', True), None),
+    'improvedforest.ForestSimulation': (_forest('improvedforest.py', False), LOOP_CELLS),
+    'improvedforest.ForestSimulation[sparse]': (_forest('improvedforest.py', True), None),
+    'upscaling.CellularAutomaton': (_life('upscaling.py'), None),
+    'upscsalingimproved.CellularAutomaton': (_life('upscsalingimproved.py'), None),
+    'cellular iteration1.CellularAutomaton': (_life('cellular iteration1.py'), None),
+    'cellular iteration 2.CellularAutomaton': (_life('cellular iteration 2.py'), None),
+    'bitlife.BitPackedLife': (_bitlife, None),
+}
+
+
+def measure(setup, size, density, seed=0, min_steps=5, min_time=1.0, max_steps=1000, memory_steps=2):
+    """
+    Benchmarks one engine on one grid
+    :param setup: Engine setup function from ENGINES
+    :param size: Grid side length
+    :param density: Initial tree (or live cell) density
+    :param seed: Seed for the grid and the engine's draws
+    :param min_steps: Steps to time at the least
+    :param min_time: Seconds to keep timing for, once min_steps are done
+    :param max_steps: Steps to time at the most
+    :param memory_steps: Steps run under tracemalloc for the memory figures
+    :return: Dict of results
+    """
+    # Step a tiny copy first, so modules an engine imports on its first step
+    # (SciPy for iterate_with_wind) are not counted as its memory
+    setup(8, density, np.random.default_rng(seed))()
+    rng = np.random.default_rng(seed)
+    # Memory is traced in a separate pass, since tracing slows stepping down
+    tracemalloc.start()
+    step = setup(size, density, rng)
+    state_bytes = tracemalloc.get_traced_memory()[0]
+    for _ in range(memory_steps):
+        step()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < max_steps and (len(latencies) < min_steps or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        step()
+        latencies.append(time.perf_counter() - t0)
+    latencies = np.array(latencies)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {'rows': size, 'cols': size, 'density': density, 'steps': len(latencies),
+            'cells_per_sec': size * size * len(latencies) / latencies.sum(),
+            'latency_ms': {'mean': 1e3 * latencies.mean(), 'p50': 1e3 * p50, 'p90': 1e3 * p90,
+                           'p99': 1e3 * p99, 'max': 1e3 * latencies.max()},
+            'state_bytes': state_bytes, 'peak_bytes': peak_bytes}
+
+
+def cold_start(module, repeats=5, heavy=('matplotlib', 'scipy')):
+    """
+    Times importing a module in fresh interpreters, as a pool worker starts
+    :param module: Module name, importable from this directory
+    :param repeats: Interpreters to start; the quickest counts
+    :param heavy: Packages to report as loaded by the import
+    :return: Dict with the import and whole-process seconds and the heavy
+             packages the import pulled in
+    """
+    code = ("import sys, time; t = time.perf_counter(); import %s; t = time.perf_counter() - t; "
+            "print(t, *[m for m in %r if m in sys.modules])" % (module, tuple(heavy)))
+    best_import = best_process = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', code], cwd=HERE, capture_output=True, text=True,
+                             check=True).stdout.split()
+        best_process = min(best_process, time.perf_counter() - start)
+        best_import = min(best_import, float(out[0]))
+    return {'module': module, 'import_seconds': best_import, 'process_seconds': best_process,
+            'loaded': out[1:]}
+
+
+def environment():
+    """
+    Describes the code and machine a benchmark ran on
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=HERE,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {'commit': commit, 'dirty': dirty, 'host': platform.node(), 'machine': platform.machine(),
+            'python': platform.python_version(), 'numpy': np.__version__, 'cpus': os.cpu_count()}
+
+
+def run_benchmarks(engines=None, sizes=SIZES, densities=DENSITIES, history=HISTORY, **measure_kwargs):
+    """
+    Benchmarks every engine at every size and density, appending each result
+    to the history file as one JSON line and yielding it. Sizes beyond an
+    engine's limit are skipped.
+    """
+    env = environment()
+    stamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+    for name in ENGINES if engines is None else engines:
+        setup, max_cells = ENGINES[name]
+        for size in sizes:
+            if max_cells is not None and size * size > max_cells:
+                continue
+            for density in densities:
+                result = {'engine': name, 'time': stamp}
+                result.update(measure(setup, size, density, **measure_kwargs))
+                result.update(env)
+                if history is not None:
+                    with open(history, 'a') as out:
+                        out.write(json.dumps(result) + '\n')
+                yield result
+
+
+def load_history(path=HISTORY):
+    """
+    Reads every benchmark result recorded so far, oldest first
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def find_regressions(results, threshold=0.9):
+    """
+    Compares the newest result for each engine, grid and machine with the
+    newest one from an earlier commit
+    :param results: Results from load_history
+    :param threshold: Report throughput below this fraction of the earlier one
+    :return: List of (newest, earlier, ratio)
+    """
+    by_key = {}
+    for result in results:
+        key = (result['engine'], result['rows'], result['cols'], result['density'], result['host'])
+        by_key.setdefault(key, []).append(result)
+    regressions = []
+    for runs in by_key.values():
+        newest = runs[-1]
+        earlier = [r for r in runs if r['commit'] != newest['commit']]
+        if earlier:
+            ratio = newest['cells_per_sec'] / earlier[-1]['cells_per_sec']
+            if ratio < threshold:
+                regressions.append((newest, earlier[-1], ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark every simulation engine")
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), help="engines to run (default all)")
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES, help="grid side lengths")
+    parser.add_argument('--densities', nargs='+', type=float, default=DENSITIES, help="initial densities")
+    parser.add_argument('--min-time', type=float, default=1.0, help="seconds to time each case for")
+    parser.add_argument('--history', default=HISTORY, help="JSON lines file to append results to")
+    parser.add_argument('--cold-start', nargs='+', metavar='MODULE',
+                        help="only time importing these modules in fresh interpreters")
+    args = parser.parse_args()
+
+    if args.cold_start:
+        for module in args.cold_start:
+            r = cold_start(module)
+            print("%-20s import %7.1f ms  process %7.1f ms  loaded: %s" % (
+                module, 1e3 * r['import_seconds'], 1e3 * r['process_seconds'], ', '.join(r['loaded']) or '-'))
+        sys.exit(0)
+
+    print("%-42s %6s %5s %14s %9s %9s %10s" % ('engine', 'size', 'dens', 'cells/s', 'p50 ms', 'p99 ms', 'peak MB'))
+    for r in run_benchmarks(args.engines, args.sizes, args.densities, args.history, min_time=args.min_time):
+        print("%-42s %6d %5.2f %14.4g %9.3f %9.3f %10.1f" % (
+            r['engine'], r['rows'], r['density'], r['cells_per_sec'], r['latency_ms']['p50'],
+            r['latency_ms']['p99'], r['peak_bytes'] / 2 ** 20))
+    for newest, earlier, ratio in find_regressions(load_history(args.history)):
+        print("REGRESSION %s %dx%d density %g: %.0f%% of %s" % (
+            newest['engine'], newest['rows'], newest['cols'], newest['density'], 100 * ratio, earlier['commit']))
@@ -0,0 +1,191 @@
+import io
+import json
+import os
+import threading
+
+import numpy as np
+
+from fire import iterate_with_wind
+
+
+def _to_json(value):
+    # Random states hold numpy arrays (MT19937's key) and numpy ints
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return {'__ndarray__': value.tolist(), 'dtype': value.dtype.str}
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict):
+        if '__ndarray__' in value:
+            return np.array(value['__ndarray__'], dtype=value['dtype'])
+        return {k: _from_json(v) for k, v in value.items()}
+    return value
+
+
+def get_rng_state(rng):
+    """
+    Returns the full state of a Generator, a RandomState or np.random itself
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng.bit_generator.state
+    return rng.get_state(legacy=False)
+
+
+def set_rng_state(rng, state):
+    """
+    Puts a state from get_rng_state back, so the stream carries on exactly
+    where it was saved
+    """
+    if isinstance(rng, np.random.Generator):
+        rng.bit_generator.state = state
+    else:
+        rng.set_state(state)
+
+
+def save_checkpoint(path, step, arrays, params, rng_state):
+    """
+    Writes a checkpoint atomically: the data goes to a temporary file that
+    replaces path only once it is complete and synced, so path always holds
+    either the old checkpoint or the new one
+    :param path: Checkpoint file
+    :param step: Step counter
+    :param arrays: Dict of named arrays (grid, burn_timer, ...)
+    :param params: Dict of model parameters
+    :param rng_state: State from get_rng_state
+    """
+    meta = json.dumps({'step': step, 'params': params, 'rng': _to_json(rng_state)})
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, _meta=np.frombuffer(meta.encode(), dtype=np.uint8), **arrays)
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as fh:
+            fh.write(buffer.getvalue())
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        # Leave no half-written file behind; path still holds the old checkpoint
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def load_checkpoint(path):
+    """
+    Reads a checkpoint written by save_checkpoint
+    :return: Dict with step, arrays, params and rng_state
+    """
+    with np.load(path) as data:
+        meta = json.loads(data['_meta'].tobytes().decode())
+        arrays = {name: data[name] for name in data.files if name != '_meta'}
+    return {'step': meta['step'], 'arrays': arrays, 'params': meta['params'],
+            'rng_state': _from_json(meta['rng'])}
+
+
+class Checkpointer:
+    def __init__(self, path, every=100):
+        """
+        Takes a checkpoint every few steps without holding up the stepping
+        loop: the arrays are snapshotted in memory and compressed and written
+        by a background thread. A write that fails is raised from the next
+        save() or wait(), so a run never carries on believing it is saved.
+        :param path: Checkpoint file
+        :param every: Steps between checkpoints
+        """
+        self.path = path
+        self.every = every
+        self._thread = None
+        self._error = None  # Exception from the last background write
+
+    def step(self, step, arrays, params, rng, copy=True):
+        """
+        Call once per step; checkpoints when step is a multiple of every
+        :param copy: Set to False for arrays the engine never modifies again
+                     (iterate_with_wind returns a new grid every step), so
+                     the snapshot can share them instead of copying
+        """
+        if step % self.every == 0:
+            self.save(step, arrays, params, rng, copy)
+
+    def save(self, step, arrays, params, rng, copy=True):
+        snapshot = {name: np.array(a, copy=True) if copy else a for name, a in arrays.items()}
+        state = get_rng_state(rng)
+        # Only one write in flight; a new one waits for the last to finish
+        self.wait()
+        self._thread = threading.Thread(target=self._write,
+                                        args=(self.path, step, snapshot, dict(params), state))
+        self._thread.start()
+
+    def _write(self, *args):
+        # Runs on the writer thread; the error is kept for wait() to raise
+        try:
+            save_checkpoint(*args)
+        except BaseException as error:
+            self._error = error
+
+    def wait(self):
+        """
+        Blocks until the last checkpoint is on disk, raising the error that
+        stopped it from getting there
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+
+# Run the iterate_with_wind model from step start to step stop, checkpointing
+# along the way. Pass the grid and Generator from a restored checkpoint (with
+# its step as start) to carry on exactly as if the run had never stopped.
+def run_with_wind(X, p, f, wind_speed, rng, start, stop, checkpointer=None):
+    params = {'p': p, 'f': f, 'wind_speed': wind_speed}
+    for step in range(start, stop):
+        X = iterate_with_wind(X, p, f, wind_speed, rng)
+        if checkpointer is not None:
+            checkpointer.step(step + 1, {'grid': X}, params, rng, copy=False)
+    if checkpointer is not None:
+        checkpointer.wait()
+    return X
+
+
+def forest_arrays(sim):
+    """
+    Collects the state of a ForestSimulation (either version) for a checkpoint
+    :return: (arrays, params)
+    """
+    arrays = {'grid': sim.grid}
+    if hasattr(sim, 'burn_timer'):
+        arrays['burn_timer'] = sim.burn_timer
+    params = {name: getattr(sim, name) for name in ('growth_prob', 'fire_prob', 'fire_jump_prob')
+              if hasattr(sim, name)}
+    return arrays, params
+
+
+def checkpoint_forest(checkpointer, sim):
+    """
+    Hands a ForestSimulation to a Checkpointer after each update
+    """
+    arrays, params = forest_arrays(sim)
+    checkpointer.step(sim.generation, arrays, params, sim.rng)
+
+
+def restore_forest(sim, checkpoint):
+    """
+    Loads a checkpoint into a ForestSimulation of the same size, including
+    its random state, so its next update matches the original run exactly
+    """
+    for name, value in checkpoint['params'].items():
+        setattr(sim, name, value)
+    sim.grid = checkpoint['arrays']['grid'].copy()
+    if 'burn_timer' in checkpoint['arrays']:
+        sim.burn_timer = checkpoint['arrays']['burn_timer'].copy()
+    sim.invalidate()
+    sim.generation = checkpoint['step']
+    set_rng_state(sim.rng, checkpoint['rng_state'])
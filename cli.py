@@ -0,0 +1,87 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from fire import EMPTY, TREE, FIRE
+import backends
+
+
+def run(rows, cols, p, f, wind_speed, steps, forest_fraction=0.2, seed=None, backend='numpy', every=0):
+    """
+    Runs the iterate_with_wind model without any plotting
+    :param rows: Grid rows
+    :param cols: Grid columns
+    :param p: Tree growth probability
+    :param f: Lightning probability
+    :param wind_speed: Wind speed
+    :param steps: Steps to run
+    :param forest_fraction: Initial tree density inside the empty border
+    :param seed: Seed for the grid and every draw
+    :param backend: Name from backends.BACKENDS, or 'auto' for the fastest
+    :param every: Keep a copy of the grid every this many steps (0 for none)
+    :return: (final grid, list of per-step metric dicts, list of kept grids
+             starting with the initial one)
+    """
+    rng = np.random.default_rng(seed)
+    X = np.zeros((rows, cols), dtype=int)
+    X[1:-1, 1:-1] = np.where(rng.random((rows - 2, cols - 2)) < forest_fraction, TREE, EMPTY)
+    name = backends.choose(X.shape) if backend == 'auto' else backend
+    metrics, frames = [], [X]
+    for step in range(1, steps + 1):
+        X = backends.step(X, p, f, wind_speed, rng, name)
+        trees, fires = int(np.count_nonzero(X == TREE)), int(np.count_nonzero(X == FIRE))
+        metrics.append({'step': step, 'trees': trees, 'fires': fires, 'tree_density': trees / X.size})
+        if every and step % every == 0:
+            frames.append(X)
+    return X, metrics, frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the forest fire model headless")
+    parser.add_argument('--size', type=int, default=100, help="grid side length")
+    parser.add_argument('--rows', type=int, help="grid rows (default --size)")
+    parser.add_argument('--cols', type=int, help="grid columns (default --size)")
+    parser.add_argument('--p', type=float, default=0.05, help="tree growth probability")
+    parser.add_argument('--f', type=float, default=0.0001, help="lightning probability")
+    parser.add_argument('--wind', type=int, default=0, help="wind speed in cells")
+    parser.add_argument('--forest-fraction', type=float, default=0.2, help="initial tree density")
+    parser.add_argument('--steps', type=int, default=100, help="steps to run")
+    parser.add_argument('--seed', type=int, help="random seed")
+    parser.add_argument('--backend', default='numpy', choices=sorted(backends.BACKENDS) + ['auto'],
+                        help="stepping backend; auto calibrates and picks the fastest")
+    parser.add_argument('--out', help="write the final grid to a .npy file, or every kept grid to a .npz file")
+    parser.add_argument('--every', type=int, default=0, help="keep the grid every this many steps for --out .npz")
+    parser.add_argument('--metrics', help="write per-step metrics as JSON lines to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    rows, cols = args.rows or args.size, args.cols or args.size
+    start = time.perf_counter()
+    X, metrics, frames = run(rows, cols, args.p, args.f, args.wind, args.steps, args.forest_fraction,
+                             args.seed, args.backend, args.every)
+    seconds = time.perf_counter() - start
+
+    if args.out is not None:
+        if args.out.endswith('.npz'):
+            np.savez_compressed(args.out, frames=np.stack(frames).astype(np.uint8), final=X.astype(np.uint8))
+        else:
+            np.save(args.out, X.astype(np.uint8))
+    if args.metrics is not None:
+        out = sys.stdout if args.metrics == '-' else open(args.metrics, 'w')
+        try:
+            for m in metrics:
+                out.write(json.dumps(m) + '\n')
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    summary = {'rows': rows, 'cols': cols, 'steps': args.steps, 'seed': args.seed,
+               'trees': int(np.count_nonzero(X == TREE)), 'fires': int(np.count_nonzero(X == FIRE)),
+               'seconds': seconds, 'cells_per_sec': rows * cols * args.steps / seconds if seconds else None}
+    print(json.dumps(summary), file=sys.stderr if args.metrics == '-' else sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import numpy as np
+
+from automation.frontier import NEIGHBOURHOOD
+
+
+class SizeHistogram:
+    def __init__(self):
+        """
+        Streaming histogram of fire sizes in powers of two: bin k counts the
+        fires that burned between 2**k and 2**(k+1) - 1 cells
+        """
+        self.counts = np.zeros(1, dtype=np.int64)
+        self.fires = 0
+        self.cells = 0
+        self.largest = 0
+
+    def add(self, sizes):
+        sizes = np.asarray(sizes, dtype=np.int64)
+        if len(sizes) == 0:
+            return
+        # frexp gives floor(log2(n)) + 1 exactly for integers
+        bins = np.frexp(sizes.astype(np.float64))[1] - 1
+        if bins.max() >= len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(bins.max() + 1 - len(self.counts), dtype=np.int64)])
+        np.add.at(self.counts, bins, 1)
+        self.fires += len(sizes)
+        self.cells += int(sizes.sum())
+        self.largest = max(self.largest, int(sizes.max()))
+
+    def edges(self):
+        """
+        Bin edges: bin k covers edges[k] <= size < edges[k+1]
+        """
+        return 2 ** np.arange(len(self.counts) + 1, dtype=np.int64)
+
+    def density(self):
+        """
+        Fraction of fires per unit size in each bin, whose log-log slope is
+        the power-law exponent of the size distribution
+        """
+        widths = np.diff(self.edges())
+        return self.counts / (max(self.fires, 1) * widths)
+
+    def as_dict(self):
+        return {'fires': self.fires, 'cells': self.cells, 'largest': self.largest,
+                'edges': self.edges().tolist(), 'counts': self.counts.tolist()}
+
+
+class FireTracker:
+    def __init__(self, shape, histogram=None, on_extinguished=None, burning=None):
+        """
+        Follows every fire from ignition to extinction with union-find over
+        fire ids. Each step only the cells that ignited or burned out are
+        visited, so the cost grows with the fire front, not the grid. A cell
+        that catches fire next to (or downwind of) a burning cell joins that
+        fire, and fires that spread into the same cell merge; any other
+        ignition, by lightning or a jump, starts a new fire.
+        :param shape: (rows, cols) of the grid
+        :param histogram: SizeHistogram fed with the size of every finished
+                          fire (a new one if None)
+        :param on_extinguished: Optional callback given a dict for every
+                                finished fire: its id, size (cells burned),
+                                and the steps it started and ended on
+        :param burning: Cells already burning when tracking starts, as a
+                        boolean grid or flat indices. Each connected group of
+                        them is taken as one fire started on step 0; without
+                        them, fires burning at the start are not followed.
+        """
+        self.rows, self.cols = shape
+        self.histogram = SizeHistogram() if histogram is None else histogram
+        self.on_extinguished = on_extinguished
+        self.step = 0
+        # Fire id of every burning cell, 0 elsewhere
+        self.label = np.zeros(self.rows * self.cols, dtype=np.int64)
+        # Per fire id: union-find parent, cells burned, cells burning now and
+        # the step it started on; id 0 is a sentinel for "no fire"
+        self._parent = np.zeros(1024, dtype=np.int64)
+        self._size = np.zeros(1024, dtype=np.int64)
+        self._active = np.zeros(1024, dtype=np.int64)
+        self._started = np.zeros(1024, dtype=np.int64)
+        self._next_id = 1
+        self.burning_fires = 0
+        if burning is not None:
+            self._seed(burning)
+
+    def _seed(self, burning):
+        # One fire per 8-connected group of burning cells, found by labelling
+        # the grid once
+        from scipy.ndimage import label
+        mask = np.zeros(self.rows * self.cols, dtype=bool)
+        mask[np.flatnonzero(burning) if np.ndim(burning) == 2 else np.asarray(burning, dtype=np.int64)] = True
+        groups, n = label(mask.reshape(self.rows, self.cols), structure=np.ones((3, 3), dtype=int))
+        cells = np.flatnonzero(mask)
+        self._reserve(n)
+        ids = np.arange(self._next_id, self._next_id + n)
+        self._next_id += n
+        self._parent[ids] = ids
+        self._size[ids] = self._active[ids] = np.bincount(groups.reshape(-1)[cells], minlength=n + 1)[1:]
+        self.label[cells] = ids[groups.reshape(-1)[cells] - 1]
+        self.burning_fires += n
+
+    def _reserve(self, n):
+        if self._next_id + n <= len(self._parent):
+            return
+        capacity = max(2 * len(self._parent), self._next_id + n)
+        for name in ('_parent', '_size', '_active', '_started'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=np.int64)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _find(self, ids):
+        # Vectorised find with path compression
+        ids = np.asarray(ids, dtype=np.int64)
+        roots = ids.copy()
+        while True:
+            up = self._parent[roots]
+            if (up == roots).all():
+                break
+            roots = up
+        self._parent[ids] = roots
+        return roots
+
+    def _union(self, a, b):
+        a, b = self._find([a, b])
+        if a == b:
+            return a
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size[b]
+        self._active[a] += self._active[b]
+        self._started[a] = min(self._started[a], self._started[b])
+        self.burning_fires -= 1
+        return a
+
+    def _sources(self, cells, wind_speed):
+        # Fire ids of the burning cells each ignited cell could have caught
+        # from: its in-bounds neighbours and, with wind, the cell wind_speed
+        # columns to the east (wrapping round, like np.roll)
+        r, c = np.divmod(cells, self.cols)
+        found = np.zeros((len(cells), len(NEIGHBOURHOOD) + 1), dtype=np.int64)
+        for k, (dr, dc) in enumerate(NEIGHBOURHOOD):
+            nr, nc = r + dr, c + dc
+            ok = (nr >= 0) & (nr < self.rows) & (nc >= 0) & (nc < self.cols)
+            found[ok, k] = self.label[nr[ok] * self.cols + nc[ok]]
+        if wind_speed > 0:
+            found[:, -1] = self.label[r * self.cols + (c + wind_speed) % self.cols]
+        return found
+
+    def update(self, ignited, burnt_out, wind_speed=0):
+        """
+        Advances the tracker by one step
+        :param ignited: Flat indices of the cells that caught fire this step
+        :param burnt_out: Flat indices of the cells that stopped burning
+        :param wind_speed: Eastward wind reach, for the iterate_with_wind model
+        :return: Sizes of the fires that went out this step
+        """
+        ignited = np.asarray(ignited, dtype=np.int64)
+        burnt_out = np.asarray(burnt_out, dtype=np.int64)
+        self.step += 1
+        # Sources are the cells burning at the start of the step
+        sources = self._find(self._sources(ignited, wind_speed))
+
+        ended_roots = self._find(self.label[burnt_out])
+        np.subtract.at(self._active, ended_roots, 1)
+        self.label[burnt_out] = 0
+
+        # Ignitions with no burning source start new fires
+        caught = (sources > 0).any(axis=1)
+        new_cells = ignited[~caught]
+        self._reserve(len(new_cells))
+        ids = np.arange(self._next_id, self._next_id + len(new_cells))
+        self._next_id += len(new_cells)
+        self._parent[ids] = ids
+        self._size[ids] = 1
+        self._active[ids] = 1
+        self._started[ids] = self.step
+        self.label[new_cells] = ids
+        self.burning_fires += len(new_cells)
+
+        # The rest join their source fire, merging fires where they meet
+        sources = sources[caught]
+        roots = sources.max(axis=1)
+        for row in np.flatnonzero(((sources > 0) & (sources != roots[:, None])).any(axis=1)):
+            for other in np.unique(sources[row][sources[row] > 0]):
+                self._union(roots[row], other)
+        roots = self._find(roots)
+        self.label[ignited[caught]] = roots
+        np.add.at(self._size, roots, 1)
+        np.add.at(self._active, roots, 1)
+
+        # A fire is out once it has no burning cells left
+        candidates = np.unique(self._find(ended_roots))
+        ended = candidates[self._active[candidates] == 0]
+        sizes = self._size[ended]
+        self.burning_fires -= len(ended)
+        self.histogram.add(sizes)
+        if self.on_extinguished is not None:
+            for fire, size, started in zip(ended, sizes, self._started[ended]):
+                self.on_extinguished({'fire': int(fire), 'size': int(size),
+                                      'started': int(started), 'ended': self.step})
+        return sizes
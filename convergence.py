@@ -0,0 +1,114 @@
+import collections
+import hashlib
+
+import numpy as np
+
+FIXED, CYCLE, EXTINCT = 'fixed', 'cycle', 'extinct'
+
+
+def grid_hash(grid):
+    """
+    64-bit hash of a grid's contents, shape and dtype
+    """
+    grid = np.ascontiguousarray(grid)
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(str((grid.shape, grid.dtype.str)).encode())
+    digest.update(grid.view(np.uint8).reshape(-1))
+    return int.from_bytes(digest.digest(), 'little')
+
+
+class ConvergenceDetector:
+    def __init__(self, window=64, extinct=None, deterministic=True):
+        """
+        Watches a run for the point after which nothing new can happen. It
+        keeps the hashes of the last window grids, so memory stays bounded
+        however long the run.
+        :param window: Longest cycle period that can be found
+        :param extinct: Optional predicate on the grid that is true once the
+                        run can never change again (see life_extinct and
+                        forest_extinct)
+        :param deterministic: Whether the same grid always leads to the same
+                              next grid; set to False for random models,
+                              where only extinct is trusted
+        """
+        self.window = window
+        self.extinct = extinct
+        self.deterministic = deterministic
+        self.step = 0
+        self.result = None
+        self._recent = collections.deque()
+        self._seen = {}  # Hash to the last step it was seen on
+
+    def observe(self, grid):
+        """
+        Call with the initial grid and again after every step
+        :return: None while the run is live, then a dict with the kind
+                 (FIXED, CYCLE or EXTINCT), its period in steps and the step
+                 it was found on
+        """
+        if self.result is not None:
+            return self.result
+        if self.extinct is not None and self.extinct(grid):
+            self.result = {'kind': EXTINCT, 'period': 1, 'step': self.step}
+        elif self.deterministic:
+            h = grid_hash(grid)
+            seen = self._seen.get(h)
+            if seen is not None:
+                period = self.step - seen
+                self.result = {'kind': FIXED if period == 1 else CYCLE, 'period': period, 'step': self.step}
+            self._recent.append((self.step, h))
+            self._seen[h] = self.step
+            if len(self._recent) > self.window:
+                old_step, old_h = self._recent.popleft()
+                if self._seen.get(old_h) == old_step:
+                    del self._seen[old_h]
+        self.step += 1
+        return self.result
+
+
+def life_extinct(grid):
+    # A Game of Life grid with no live cells stays empty
+    return not np.any(grid)
+
+
+def forest_extinct(growth_prob, fire_probs, tree, burning):
+    """
+    Predicate for a forest that can never change again: nothing is burning,
+    nothing can grow, and either no trees are left or nothing can ignite them
+    :param growth_prob: Tree growth probability
+    :param fire_probs: Every probability of a tree igniting by itself
+                       (lightning, fire jumps)
+    :param tree: Value of a tree in the grid
+    :param burning: Value of a burning cell in the grid
+    """
+    def extinct(grid):
+        if growth_prob > 0 or np.any(grid == burning):
+            return False
+        return not any(f > 0 for f in fire_probs) or not np.any(grid == tree)
+    return extinct
+
+
+def run_until_converged(step, grid, steps, detector, jump=True):
+    """
+    Runs up to steps generations, stopping as soon as the detector reports
+    convergence
+    :param step: Function advancing the run by one generation
+    :param grid: Function returning the current grid
+    :param steps: Generations to run at most
+    :param detector: ConvergenceDetector, fresh for this run
+    :param jump: For a cycle, skip whole periods and step only the rest, so
+                 the run ends on the grid the full steps would give (fixed
+                 points and extinct runs already have it)
+    :return: (generations actually run, detector result or None)
+    """
+    done = 0
+    result = detector.observe(grid())
+    while result is None and done < steps:
+        step()
+        done += 1
+        result = detector.observe(grid())
+    if result is not None and jump and result['kind'] == CYCLE:
+        for _ in range((steps - done) % result['period']):
+            step()
+            done += 1
+    return done, result
@@ -0,0 +1,66 @@
+import numpy as np
+
+from fire import EMPTY, TREE, FIRE, initialize_grid
+
+
+def _per_replica(value, n):
+    # Broadcast a scalar or per-replica parameter to shape (n, 1, 1)
+    value = np.asarray(value)
+    if value.ndim == 0:
+        value = np.full(n, value)
+    if value.shape != (n,):
+        raise ValueError("expected a scalar or one value per replica (%d)" % n)
+    return value.reshape(n, 1, 1)
+
+
+# Function to initialize a stack of forest grids
+def initialize_ensemble(n, nx, ny, forest_fraction):
+    fractions = np.broadcast_to(forest_fraction, (n,))
+    return np.stack([initialize_grid(nx, ny, ff) for ff in fractions])
+
+
+# Batched version of iterate_with_wind: X has shape (n, ny, nx) and p, f and
+# wind_speed can be scalars or hold one value per replica. rng can be
+# np.random (the default), a RandomState or a Generator.
+def iterate_ensemble(X, p, f, wind_speed, rng=np.random):
+    n, ny, nx = X.shape
+    p, f = _per_replica(p, n), _per_replica(f, n)
+    wind_speed = _per_replica(wind_speed, n).astype(int)
+
+    is_fire = X == FIRE
+    is_tree = X == TREE
+
+    # Any burning cell in the 3x3 block, with empty cells beyond the edge
+    # (the same as convolve2d with boundary='fill'). The block includes the
+    # cell itself, which is harmless since only trees can catch fire.
+    padded = np.zeros((n, ny + 2, nx + 2), dtype=bool)
+    padded[:, 1:-1, 1:-1] = is_fire
+    across = padded[:, :, :-2] | padded[:, :, 1:-1] | padded[:, :, 2:]
+    fire_nearby = across[:, :-2] | across[:, 1:-1] | across[:, 2:]
+
+    grow_trees = (X == EMPTY) & (rng.random((n, ny, nx)) < p)
+    catch_fire = is_tree & (fire_nearby | (rng.random((n, ny, nx)) < f))
+
+    # Eastward wind: each replica rolls its fire by its own wind speed, the
+    # same as np.roll(X == FIRE, -wind_speed, axis=1). A speed of 0 rolls the
+    # fire onto itself, which can never also be a tree.
+    columns = (np.arange(nx).reshape(1, 1, nx) + wind_speed) % nx
+    catch_fire |= np.take_along_axis(is_fire, columns, axis=2) & is_tree
+
+    X1 = X.copy()
+    X1[grow_trees] = TREE
+    X1[catch_fire] = FIRE
+    X1[is_fire] = EMPTY
+    return X1
+
+
+# Run every replica for a number of steps, recording per-replica tree and
+# fire counts after each step, drawing from rng
+def run_ensemble(X, p, f, wind_speed, steps, rng=np.random):
+    trees = np.zeros((steps, X.shape[0]), dtype=int)
+    fires = np.zeros((steps, X.shape[0]), dtype=int)
+    for step in range(steps):
+        X = iterate_ensemble(X, p, f, wind_speed, rng)
+        trees[step] = (X == TREE).sum(axis=(1, 2))
+        fires[step] = (X == FIRE).sum(axis=(1, 2))
+    return X, {'trees': trees, 'fires': fires}
@@ -0,0 +1,73 @@
+import numpy as np
+
+from fire import EMPTY, TREE, FIRE, iterate_with_wind
+
+
+def skip_quiet(X, p, f, max_steps, rng=np.random):
+    """
+    Advances a grid with no fire on it straight to the step of the next
+    lightning strike, with the same distribution as stepping it. Without
+    fire a cell's future is independent of its neighbours: an empty cell
+    regrows at a geometric time G (so it is a tree after k steps with
+    probability 1 - (1-p)^k) and a tree is struck a further geometric(f)
+    number of steps later. The next ignition is the earliest strike, so one
+    draw per cell replaces one per cell per quiet step.
+    :param X: Grid with no burning cells
+    :param p: Tree growth probability
+    :param f: Lightning probability
+    :param max_steps: Steps to advance at most
+    :param rng: np.random, a RandomState or a Generator
+    :return: (new grid, steps advanced); the new grid is on fire unless
+             max_steps passed without a strike
+    """
+    flat = X.reshape(-1)
+    trees = np.flatnonzero(flat == TREE)
+    empty = np.flatnonzero(flat == EMPTY)
+    never = max_steps + 1
+    grown = rng.geometric(p, len(empty)) if p > 0 else np.full(len(empty), never)
+    if f > 0:
+        struck = rng.geometric(f, len(trees))
+        struck_after_growth = grown + rng.geometric(f, len(empty))
+    else:
+        struck = np.full(len(trees), never)
+        struck_after_growth = np.full(len(empty), never)
+    k = int(min(struck.min(initial=never), struck_after_growth.min(initial=never), max_steps))
+
+    X1 = X.copy()
+    flat = X1.reshape(-1)
+    flat[empty[grown <= k]] = TREE
+    flat[trees[struck == k]] = FIRE
+    flat[empty[struck_after_growth == k]] = FIRE
+    return X1, k
+
+
+def run_event_driven(X, p, f, wind_speed, steps, rng=np.random, on_step=None):
+    """
+    Runs the iterate_with_wind model for a number of steps, stepping cell by
+    cell only while something is burning and jumping over the quiet spells
+    in between with skip_quiet
+    :param X: Initial grid
+    :param p: Tree growth probability
+    :param f: Lightning probability
+    :param wind_speed: Wind speed for iterate_with_wind
+    :param steps: Steps to run
+    :param rng: np.random, a RandomState or a Generator
+    :param on_step: Optional callback(step, X) for every grid computed; the
+                    steps skipped over are not seen
+    :return: (final grid, dict with the number of steps stepped and skipped)
+    """
+    step = 0
+    stepped = skipped = 0
+    while step < steps:
+        if (X == FIRE).any():
+            X = iterate_with_wind(X, p, f, wind_speed, rng)
+            step += 1
+            stepped += 1
+        else:
+            X, k = skip_quiet(X, p, f, steps - step, rng)
+            step += k
+            skipped += k - 1
+            stepped += 1
+        if on_step is not None:
+            on_step(step, X)
+    return X, {'stepped': stepped, 'skipped': skipped}
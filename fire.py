@@ -1,9 +1,6 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Slider, Button
-from matplotlib import animation
-from matplotlib import colors
-from scipy.signal import convolve2d
+
+from profiling import NULL_PROFILER
 
 # Constants for the cell states
 EMPTY, TREE, FIRE = 0, 1, 2
@@ -14,63 +11,109 @@ def initialize_grid(nx, ny, forest_fraction):
     X[1:ny-1, 1:nx-1] = np.random.choice([EMPTY, TREE], size=(ny-2, nx-2), p=[1-forest_fraction, forest_fraction])
     return X
 
-# Optimized iteration function using convolution for neighbor counting
-def iterate_with_wind(X, p, f, wind_speed):
-    kernel = np.ones((3, 3), dtype=int)
-    kernel[1, 1] = 0
+# Optimized iteration function using convolution for neighbor counting.
+# rng can be np.random (the default), a RandomState or a Generator. With a
+# profiling.Profiler the step's phases are timed and its growth, ignitions
+# and burn-outs counted, and a clusters.FireTracker is told which cells
+# ignited and burned out. With a landscape.Landscape, fire spreads from each
+# burning neighbour with the chance its terrain, fuel, moisture and the wind
+# give, instead of always. SciPy is only imported once a step convolves, so
+# importing this module stays cheap for batch workers.
+def iterate_with_wind(X, p, f, wind_speed, rng=np.random, profiler=NULL_PROFILER, tracker=None, landscape=None):
+    profiler.begin()
+    burning = X == FIRE
+    if landscape is None:
+        from scipy.signal import convolve2d
+        kernel = np.ones((3, 3), dtype=int)
+        kernel[1, 1] = 0
+
+        tree_neighbors = convolve2d(X == TREE, kernel, mode='same', boundary='fill', fillvalue=EMPTY)
+        fire_neighbors = convolve2d(burning, kernel, mode='same', boundary='fill', fillvalue=EMPTY)
+    else:
+        landscape.set_wind(wind_speed)
+        spread_prob = landscape.ignition_probability(burning)
+    profiler.lap('neighbours')
 
-    tree_neighbors = convolve2d(X == TREE, kernel, mode='same', boundary='fill', fillvalue=EMPTY)
-    fire_neighbors = convolve2d(X == FIRE, kernel, mode='same', boundary='fill', fillvalue=EMPTY)
+    growth_draws = rng.random(X.shape)
+    lightning_draws = rng.random(X.shape)
+    spread = fire_neighbors > 0 if landscape is None else rng.random(X.shape) < spread_prob
+    profiler.lap('random')
 
-    grow_trees = (X == EMPTY) & (np.random.rand(*X.shape) < p)
-    catch_fire = (X == TREE) & ((fire_neighbors > 0) | (np.random.rand(*X.shape) < f))
+    grow_trees = (X == EMPTY) & (growth_draws < p)
+    catch_fire = (X == TREE) & (spread | (lightning_draws < f))
 
     # Wind effect: Increase the chance of catching fire based on wind speed
     # This example assumes an eastward wind, modifying for other directions is similar
-    if wind_speed > 0:
-        east_wind_effect = np.roll(X == FIRE, -wind_speed, axis=1) & (X == TREE)
+    if wind_speed > 0 and landscape is None:
+        east_wind_effect = np.roll(burning, -wind_speed, axis=1) & (X == TREE)
         catch_fire |= east_wind_effect
+    profiler.lap('masks')
 
     X1 = X.copy()
     X1[grow_trees] = TREE
     X1[catch_fire] = FIRE
-    X1[X == FIRE] = EMPTY
+    X1[burning] = EMPTY
 
+    profiler.lap('apply')
+    if tracker is not None:
+        tracker.update(np.flatnonzero(catch_fire), np.flatnonzero(burning),
+                       wind_speed if landscape is None else 0)
+        profiler.lap('clusters')
+    if profiler.enabled:
+        grown, ignitions = np.count_nonzero(grow_trees), np.count_nonzero(catch_fire)
+        # Every burning cell burns out after one step
+        burn_outs = np.count_nonzero(burning)
+        profiler.change('trees', grown - ignitions, lambda: np.count_nonzero(X == TREE))
+        profiler.change('fires', ignitions - burn_outs, lambda: burn_outs)
+        profiler.count(growth=grown, ignitions=ignitions, burn_outs=burn_outs)
+        profiler.lap('counters')
+    profiler.end()
     return X1
 
-# Visualization setup
-fig, ax = plt.subplots()
-plt.subplots_adjust(left=0.25, bottom=0.4)
-
-colors_list = [(0.2, 0, 0), (0, 0.5, 0), (1, 0, 0), 'orange']
-cmap = colors.ListedColormap(colors_list)
-norm = colors.BoundaryNorm([0, 1, 2, 3], cmap.N)
-
-# Sliders for adjusting probabilities and wind speed
-axcolor = 'lightgoldenrodyellow'
-ax_p = plt.axes([0.25, 0.1, 0.65, 0.03], facecolor=axcolor)
-ax_f = plt.axes([0.25, 0.15, 0.65, 0.03], facecolor=axcolor)
-ax_wind = plt.axes([0.25, 0.2, 0.65, 0.03], facecolor=axcolor)
-
-p_slider = Slider(ax_p, 'Growth Prob', 0.01, 0.1, valinit=0.05)
-f_slider = Slider(ax_f, 'Fire Prob', 0.0001, 0.001, valinit=0.0001)
-wind_slider = Slider(ax_wind, 'Wind Speed', 0, 5, valinit=0, valstep=1)
-
-# Prompt for grid size initialization
-scale_factor = float(input("Enter scale factor (e.g., 1 for 100x100, 2 for 200x200): "))
-nx, ny = int(100 * scale_factor), int(100 * scale_factor)
-forest_fraction = 0.2
-forest = initialize_grid(nx, ny, forest_fraction)
-im = ax.imshow(forest, cmap=cmap, norm=norm)
-
-# Update function for the animation
-def update(frame):
-    global forest, p, f, wind_speed
-    p, f = p_slider.val, f_slider.val
-    wind_speed = int(wind_slider.val)
-    forest = iterate_with_wind(forest, p, f, wind_speed)
-    im.set_array(forest)
-    return [im]
-
-ani = animation.FuncAnimation(fig, update, frames=200, blit=True, interval=100)
-plt.show()
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import Slider
+    from matplotlib import colors
+    from render import animate_live
+    from profiling import Profiler
+
+    # Visualization setup
+    fig, ax = plt.subplots()
+    plt.subplots_adjust(left=0.25, bottom=0.4)
+
+    colors_list = [(0.2, 0, 0), (0, 0.5, 0), (1, 0, 0), 'orange']
+    cmap = colors.ListedColormap(colors_list)
+    norm = colors.BoundaryNorm([0, 1, 2, 3], cmap.N)
+
+    # Sliders for adjusting probabilities and wind speed
+    axcolor = 'lightgoldenrodyellow'
+    ax_p = plt.axes([0.25, 0.1, 0.65, 0.03], facecolor=axcolor)
+    ax_f = plt.axes([0.25, 0.15, 0.65, 0.03], facecolor=axcolor)
+    ax_wind = plt.axes([0.25, 0.2, 0.65, 0.03], facecolor=axcolor)
+
+    p_slider = Slider(ax_p, 'Growth Prob', 0.01, 0.1, valinit=0.05)
+    f_slider = Slider(ax_f, 'Fire Prob', 0.0001, 0.001, valinit=0.0001)
+    wind_slider = Slider(ax_wind, 'Wind Speed', 0, 5, valinit=0, valstep=1)
+
+    # Prompt for grid size initialization
+    scale_factor = float(input("Enter scale factor (e.g., 1 for 100x100, 2 for 200x200): "))
+    nx, ny = int(100 * scale_factor), int(100 * scale_factor)
+    forest_fraction = 0.2
+    forest = initialize_grid(nx, ny, forest_fraction)
+
+    # Step function for the simulation thread; the sliders are read live.
+    # A summary of the phase timings and counters is printed every 500 steps.
+    profiler = Profiler(summary_every=500)
+
+    def step():
+        global forest, p, f, wind_speed
+        p, f = p_slider.val, f_slider.val
+        wind_speed = int(wind_slider.val)
+        forest = iterate_with_wind(forest, p, f, wind_speed, profiler=profiler)
+        return forest
+
+    # The simulation runs in the background and the display shows the newest
+    # frame, pooled down to screen size, on every redraw
+    ani, worker = animate_live(fig, ax, step, forest, interval=100, cmap=cmap, norm=norm)
+    plt.show()
+    worker.stop()
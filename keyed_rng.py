@@ -0,0 +1,92 @@
+import numpy as np
+
+# Independent random streams used by the forest model: one draw per cell on
+# every step, which decides growth for an empty cell and lightning for a tree
+# (a cell is never both), and planting when a grid is first filled with trees
+EVENTS, PLANTING = 0, 1
+
+# Philox4x32-10 constants (Salmon et al., "Parallel random numbers: as easy
+# as 1, 2, 3", 2011)
+_M0, _M1 = 0xD2511F53, 0xCD9E8D57
+_W0, _W1 = 0x9E3779B9, 0xBB67AE85
+_MASK = 0xFFFFFFFF
+_ROUNDS = 10
+# Each Philox call gives four 32-bit words, one for each of four cells in a row
+_CELLS_PER_CALL = 4
+
+
+def philox4x32(c0, c1, c2, c3, key):
+    """
+    Philox4x32-10 on arrays of counters
+    :param c0, c1, c2, c3: uint64 arrays holding the four 32-bit counter words
+    :param key: 64-bit key
+    :return: The four 32-bit output words, as uint64 arrays
+    """
+    k0, k1 = np.uint64(key & _MASK), np.uint64((key >> 32) & _MASK)
+    mask = np.uint64(_MASK)
+    for _ in range(_ROUNDS):
+        p0 = c0 * np.uint64(_M0)
+        p1 = c2 * np.uint64(_M1)
+        c0, c1, c2, c3 = (p1 >> np.uint64(32)) ^ c1 ^ k0, p1 & mask, (p0 >> np.uint64(32)) ^ c3 ^ k1, p0 & mask
+        k0 = np.uint64((int(k0) + _W0) & _MASK)
+        k1 = np.uint64((int(k1) + _W1) & _MASK)
+    return c0, c1, c2, c3
+
+
+# 32 random bits for each given cell, keyed by (seed, step, stream, row, col).
+# A cell's bits never depend on which other cells are drawn, so any tiling or
+# thread count sees the same values, and cells that need no draw cost nothing.
+def cell_bits(seed, step, stream, rows, cols):
+    rows = np.asarray(rows, dtype=np.uint64)
+    cols = np.asarray(cols, dtype=np.uint64)
+    shape = np.broadcast(rows, cols).shape
+    rows, cols = np.broadcast_to(rows, shape), np.broadcast_to(cols, shape)
+    words = philox4x32(cols // np.uint64(_CELLS_PER_CALL), rows.copy(),
+                       np.full(shape, step & _MASK, dtype=np.uint64),
+                       np.full(shape, stream, dtype=np.uint64), seed)
+    return np.choose((cols % np.uint64(_CELLS_PER_CALL)).astype(np.intp), words)
+
+
+# 32 random bits for every cell of the block rows r0..r1-1, columns c0..c1-1,
+# the same values cell_bits gives but with one Philox call per four cells
+def block_bits(seed, step, stream, r0, r1, c0, c1):
+    g0, g1 = c0 // _CELLS_PER_CALL, -(-c1 // _CELLS_PER_CALL)
+    groups = np.arange(g0, g1, dtype=np.uint64)[None, :]
+    rows = np.arange(r0, r1, dtype=np.uint64)[:, None]
+    shape = (r1 - r0, g1 - g0)
+    words = philox4x32(np.broadcast_to(groups, shape), np.broadcast_to(rows, shape),
+                       np.full(shape, step & _MASK, dtype=np.uint64),
+                       np.full(shape, stream, dtype=np.uint64), seed)
+    bits = np.stack(words, axis=-1).reshape(r1 - r0, -1)
+    start = c0 - g0 * _CELLS_PER_CALL
+    return bits[:, start:start + c1 - c0]
+
+
+# Integer threshold such that bits < threshold(prob) happens with probability prob
+def threshold(prob):
+    return np.uint64(min(max(int(round(prob * 2.0 ** 32)), 0), 2 ** 32))
+
+
+# Uniform float32 draws in [0, 1) for the given cells
+def cell_uniform(seed, step, stream, rows, cols):
+    bits = cell_bits(seed, step, stream, rows, cols) >> np.uint64(8)
+    return bits.astype(np.float32) * np.float32(2.0 ** -24)
+
+
+# True with probability prob for each given cell, by comparing the raw bits
+# with an integer threshold instead of converting to floats
+def cell_bernoulli(seed, step, stream, rows, cols, prob):
+    return cell_bits(seed, step, stream, rows, cols) < threshold(prob)
+
+
+# Random bits for the cells where mask is set, in the block whose top-left
+# cell is (r0, c0); cells outside the mask are left at 0 and must be masked
+# out by the caller. Sparse masks draw cell by cell; dense ones draw the
+# whole block four cells per call, which is cheaper than gathering.
+def masked_bits(seed, step, stream, mask, r0, c0):
+    ys, xs = np.nonzero(mask)
+    if len(ys) * _CELLS_PER_CALL < mask.size:
+        bits = np.zeros(mask.shape, dtype=np.uint64)
+        bits[ys, xs] = cell_bits(seed, step, stream, ys + r0, xs + c0)
+        return bits
+    return block_bits(seed, step, stream, r0, r0 + mask.shape[0], c0, c0 + mask.shape[1])
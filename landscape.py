@@ -0,0 +1,123 @@
+import numpy as np
+
+from automation.frontier import NEIGHBOURHOOD
+
+# Spread factors after Alexandridis et al., "A cellular automata model for
+# forest fire spread prediction", 2008: p = p_h (1 + p_veg) p_w p_s, with
+# p_s = exp(a * slope angle in degrees) and
+# p_w = exp(c1 V) exp(c2 V (cos(angle to wind) - 1))
+SLOPE_COEFFICIENT = 0.078
+WIND_C1, WIND_C2 = 0.045, 0.131
+# 1 + p_veg for each fuel type: none, grass, shrubs, forest
+FUEL_FACTORS = np.array([0.0, 0.7, 1.0, 1.4], dtype=np.float32)
+
+
+def _shifted(shape, dr, dc):
+    # Slices pairing each target cell with its neighbour at (dr, dc), for the
+    # targets whose neighbour is on the grid
+    rows, cols = shape
+    target = (slice(max(0, -dr), rows - max(0, dr)), slice(max(0, -dc), cols - max(0, dc)))
+    source = (slice(max(0, dr), rows + min(0, dr)), slice(max(0, dc), cols + min(0, dc)))
+    return target, source
+
+
+class Landscape:
+    def __init__(self, shape, elevation=None, fuel=None, moisture=None, cell_size=1.0,
+                 base_prob=0.58, extinction_moisture=30):
+        """
+        Per-cell terrain layers folded into the chance of fire spreading to a
+        tree from each of its eight neighbours. The layers are stored compact
+        (elevation as float16, fuel type and moisture as uint8) and combined
+        once into a static map per direction; only the wind's share is
+        redone, when the wind changes.
+        :param shape: Grid shape
+        :param elevation: Height of each cell in the units of cell_size (flat if None)
+        :param fuel: Fuel type index into FUEL_FACTORS for each cell (all forest if None)
+        :param moisture: Fuel moisture in percent (dry if None)
+        :param cell_size: Distance between neighbouring cell centres
+        :param base_prob: Chance of spread on flat dry forest with no wind
+        :param extinction_moisture: Moisture in percent at which fuel stops burning
+        """
+        self.shape = tuple(shape)
+        self.elevation = np.zeros(shape, np.float16) if elevation is None else np.asarray(elevation, np.float16)
+        self.fuel = np.full(shape, 3, np.uint8) if fuel is None else np.asarray(fuel, np.uint8)
+        self.moisture = np.zeros(shape, np.uint8) if moisture is None else np.asarray(moisture, np.uint8)
+        self.wind_speed = None
+        self.wind_direction = 180.0
+
+        # What the target cell brings: its fuel and how dry it is
+        dryness = np.clip(1.0 - self.moisture.astype(np.float32) / extinction_moisture, 0.0, 1.0)
+        target = base_prob * FUEL_FACTORS[self.fuel] * dryness
+        height = self.elevation.astype(np.float32)
+        self._static = []
+        for dr, dc in NEIGHBOURHOOD:
+            # Fire runs faster uphill: from the neighbour up to this cell
+            slope = np.zeros(self.shape, np.float32)
+            t, s = _shifted(self.shape, dr, dc)
+            slope[t] = np.degrees(np.arctan((height[t] - height[s]) / (cell_size * np.hypot(dr, dc))))
+            self._static.append((target * np.exp(SLOPE_COEFFICIENT * slope)).astype(np.float16))
+        self._hazard = None
+
+    def set_wind(self, speed, direction=None):
+        """
+        Rebuilds the per-direction maps for a new wind, a no-op if it has not
+        changed. direction is where the wind carries fire, in degrees
+        anticlockwise from east; iterate_with_wind's wind is 180 (west).
+        """
+        direction = self.wind_direction if direction is None else float(direction)
+        if self._hazard is not None and (speed, direction) == (self.wind_speed, self.wind_direction):
+            return
+        self.wind_speed, self.wind_direction = speed, direction
+        angle = np.radians(direction)
+        wind = np.array([-np.sin(angle), np.cos(angle)])
+        self._hazard = []
+        for (dr, dc), static in zip(NEIGHBOURHOOD, self._static):
+            # The fire travels from the neighbour at (dr, dc) towards us
+            travel = -np.array([dr, dc]) / np.hypot(dr, dc)
+            factor = np.exp(WIND_C1 * speed) * np.exp(WIND_C2 * speed * (travel @ wind - 1.0))
+            prob = np.clip(static.astype(np.float32) * np.float32(factor), 0.0, 1.0)
+            # Store -log(1 - p) so independent sources just add up
+            with np.errstate(divide='ignore'):
+                self._hazard.append(-np.log1p(-prob))
+
+    def ignition_probability(self, burning):
+        """
+        Chance of each cell catching fire from its burning neighbours
+        :param burning: Bool grid of the burning cells
+        :return: float32 grid
+        """
+        if self._hazard is None:
+            self.set_wind(0)
+        hazard = np.zeros(self.shape, np.float32)
+        for (dr, dc), h in zip(NEIGHBOURHOOD, self._hazard):
+            t, s = _shifted(self.shape, dr, dc)
+            hazard[t] += np.where(burning[s], h[t], np.float32(0))
+        return -np.expm1(-hazard)
+
+    def ignition_probability_at(self, grid, cells, burning_state):
+        """
+        ignition_probability for a few cells only, for the sparse updates
+        :param grid: The grid
+        :param cells: Flat indices of the cells
+        :param burning_state: Value of a burning cell in grid
+        :return: float32 array, one probability per cell
+        """
+        if self._hazard is None:
+            self.set_wind(0)
+        rows, cols = self.shape
+        flat = grid.reshape(-1)
+        r, c = np.divmod(np.asarray(cells), cols)
+        hazard = np.zeros(len(r), np.float32)
+        for (dr, dc), h in zip(NEIGHBOURHOOD, self._hazard):
+            nr, nc = r + dr, c + dc
+            ok = (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+            ok[ok] = flat[nr[ok] * cols + nc[ok]] == burning_state
+            hazard[ok] += h[r[ok], c[ok]]
+        return -np.expm1(-hazard)
+
+    def nbytes(self):
+        """
+        Memory held by the layers and maps
+        """
+        maps = self._static + (self._hazard or [])
+        return self.elevation.nbytes + self.fuel.nbytes + self.moisture.nbytes + sum(m.nbytes for m in maps)
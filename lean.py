@@ -0,0 +1,97 @@
+import numpy as np
+
+from fire import EMPTY, TREE, FIRE
+
+
+class LeanForest:
+    def __init__(self, X, rng=None, band_rows=256):
+        """
+        The iterate_with_wind model with uint8 cells, two preallocated grids
+        swapped on alternate steps and scratch buffers reused through out=,
+        so stepping makes no large allocations after the first step
+        :param X: Initial forest grid
+        :param rng: np.random.Generator to draw from (a fresh one if None)
+        :param band_rows: Rows handled at a time for the random draws
+        """
+        X = np.asarray(X)
+        ny, nx = X.shape
+        self.rng = np.random.default_rng() if rng is None else rng
+        self._grids = [X.astype(np.uint8), np.empty((ny, nx), dtype=np.uint8)]
+        self.current = 0
+
+        # Burning cells with a one-cell empty border, like convolve2d's fill
+        self._fire = np.zeros((ny + 2, nx + 2), dtype=bool)
+        # Everything else is only needed one band of rows at a time
+        band = max(1, min(band_rows, ny))
+        self._bands = [(r, min(r + band, ny)) for r in range(0, ny, band)]
+        self._across = np.empty((band + 2, nx), dtype=bool)
+        self._catch = np.empty((band, nx), dtype=bool)
+        self._state = np.empty((band, nx), dtype=bool)
+        self._mask = np.empty((band, nx), dtype=bool)
+        self._rand = np.empty((band, nx), dtype=np.float32)
+
+    @property
+    def grid(self):
+        return self._grids[self.current]
+
+    def nbytes(self):
+        """
+        Memory held by the grids and scratch buffers
+        """
+        arrays = self._grids + [self._fire, self._across, self._catch,
+                                self._state, self._mask, self._rand]
+        return sum(a.nbytes for a in arrays)
+
+    def update(self, p, f, wind_speed):
+        """
+        Advances the forest by one step
+        """
+        X = self._grids[self.current]
+        X1 = self._grids[1 - self.current]
+        ny, nx = X.shape
+        fire = self._fire[1:-1, 1:-1]
+        np.equal(X, FIRE, out=fire)
+        wind = int(wind_speed) % nx if wind_speed > 0 else 0
+        np.copyto(X1, X)
+
+        for r0, r1 in self._bands:
+            n = r1 - r0
+            across = self._across[:n + 2]
+            catch, state = self._catch[:n], self._state[:n]
+            mask, rand = self._mask[:n], self._rand[:n]
+            band = X[r0:r1]
+
+            # Fire anywhere in the 3x3 block; the cell itself never matters
+            # because only trees can catch fire
+            rows = self._fire[r0:r1 + 2]
+            np.logical_or(rows[:, :-2], rows[:, 1:-1], out=across)
+            np.logical_or(across, rows[:, 2:], out=across)
+            np.logical_or(across[:-2], across[1:-1], out=catch)
+            np.logical_or(catch, across[2:], out=catch)
+
+            # Lightning
+            self.rng.random(out=rand, dtype=np.float32)
+            np.less(rand, f, out=mask)
+            np.logical_or(catch, mask, out=catch)
+
+            # Eastward wind, np.roll(X == FIRE, -wind_speed, axis=1) done as
+            # two slices so nothing is allocated
+            if wind_speed > 0:
+                np.logical_or(catch[:, :nx - wind], fire[r0:r1, wind:], out=catch[:, :nx - wind])
+                np.logical_or(catch[:, nx - wind:], fire[r0:r1, :wind], out=catch[:, nx - wind:])
+
+            np.equal(band, TREE, out=state)
+            np.logical_and(catch, state, out=catch)
+
+            # Growth
+            self.rng.random(out=rand, dtype=np.float32)
+            np.less(rand, p, out=mask)
+            np.equal(band, EMPTY, out=state)
+            np.logical_and(mask, state, out=mask)
+
+            out = X1[r0:r1]
+            np.copyto(out, TREE, where=mask)
+            np.copyto(out, FIRE, where=catch)
+            np.copyto(out, EMPTY, where=fire[r0:r1])
+
+        self.current = 1 - self.current
@@ -0,0 +1,163 @@
+import os
+import struct
+
+import numpy as np
+
+from fire import EMPTY, TREE
+from keyed_rng import PLANTING, block_bits, threshold
+from tiled import step_tile
+
+MAGIC = b'FOREST2B'
+# magic, ny, nx, seed, step, current buffer, p, f, wind_speed
+HEADER = struct.Struct('<8sQQQQQddq')
+DATA_OFFSET = 4096
+CELLS_PER_BYTE = 4  # EMPTY/TREE/FIRE fit in 2 bits
+# Working memory allowed for one band of rows, and about what planting or
+# stepping a band takes per cell, as measured with tracemalloc
+BAND_BYTES = 64 * 2 ** 20
+BYTES_PER_CELL = 64
+
+
+def band_rows_for(nx, band_bytes=BAND_BYTES):
+    # Rows per band that keep a band's working memory within band_bytes
+    return max(1, band_bytes // (BYTES_PER_CELL * nx))
+
+
+def pack_2bit(rows):
+    """
+    Packs cell states (0-3) four to a byte
+    :param rows: 2D array of cell states
+    :return: (n, ceil(nx/4)) uint8 array; cell c sits in bits 2*(c%4) of byte c//4
+    """
+    n, nx = rows.shape
+    padded = np.zeros((n, -(-nx // CELLS_PER_BYTE) * CELLS_PER_BYTE), dtype=np.uint8)
+    padded[:, :nx] = rows
+    quads = padded.reshape(n, -1, CELLS_PER_BYTE)
+    return quads[..., 0] | (quads[..., 1] << 2) | (quads[..., 2] << 4) | (quads[..., 3] << 6)
+
+
+def unpack_2bit(packed, nx):
+    """
+    Unpacks rows written by pack_2bit
+    :param packed: Packed rows
+    :param nx: Number of cells per row
+    :return: (n, nx) uint8 array of cell states
+    """
+    shifts = np.array([0, 2, 4, 6], dtype=np.uint8)
+    cells = (packed[..., None] >> shifts) & 3
+    return cells.reshape(packed.shape[0], -1)[:, :nx]
+
+
+class MemmapForest:
+    def __init__(self, path, band_rows=None):
+        """
+        Opens a forest grid stored on disk, at the step it was last saved
+        :param path: File written by MemmapForest.create or from_array
+        :param band_rows: Number of rows held in memory at a time (default:
+                          as many as fit in BAND_BYTES of working memory)
+        """
+        self.path = path
+        with open(path, 'rb') as fh:
+            fields = HEADER.unpack(fh.read(HEADER.size))
+        if fields[0] != MAGIC:
+            raise ValueError("%s is not a memmap forest file" % path)
+        (_, self.ny, self.nx, self.seed, self.step, self.current,
+         self.p, self.f, self.wind_speed) = fields
+        self.band_rows = band_rows_for(self.nx) if band_rows is None else band_rows
+        self.row_bytes = -(-self.nx // CELLS_PER_BYTE)
+        # Two packed grids: the current one and the one being written
+        self.buffers = np.memmap(path, dtype=np.uint8, mode='r+', offset=DATA_OFFSET,
+                                 shape=(2, self.ny, self.row_bytes))
+
+    @staticmethod
+    def _allocate(path, nx, ny, seed):
+        row_bytes = -(-nx // CELLS_PER_BYTE)
+        with open(path, 'wb') as fh:
+            fh.write(HEADER.pack(MAGIC, ny, nx, seed, 0, 0, 0.0, 0.0, 0))
+            fh.truncate(DATA_OFFSET + 2 * ny * row_bytes)
+
+    @classmethod
+    def from_array(cls, path, X, seed=0, band_rows=None):
+        """
+        Writes an in-memory grid to a new file and opens it
+        """
+        X = np.asarray(X)
+        ny, nx = X.shape
+        cls._allocate(path, nx, ny, seed)
+        forest = cls(path, band_rows)
+        for r0 in range(0, ny, forest.band_rows):
+            r1 = min(r0 + forest.band_rows, ny)
+            forest.buffers[0, r0:r1] = pack_2bit(X[r0:r1])
+        forest.buffers.flush()
+        return forest
+
+    @classmethod
+    def create(cls, path, nx, ny, forest_fraction, seed=0, band_rows=None):
+        """
+        Creates a new file holding a random forest like initialize_grid, with
+        an empty border, built one band at a time so it never has to fit in RAM
+        """
+        cls._allocate(path, nx, ny, seed)
+        forest = cls(path, band_rows)
+        for r0 in range(0, ny, forest.band_rows):
+            r1 = min(r0 + forest.band_rows, ny)
+            band = np.full((r1 - r0, nx), EMPTY, dtype=np.uint8)
+            # The same draws as cell_bernoulli, four cells per Philox call
+            planted = block_bits(seed, 0, PLANTING, r0, r1, 0, nx) < threshold(forest_fraction)
+            band[planted] = TREE
+            band[:, [0, -1]] = EMPTY
+            if r0 == 0:
+                band[0] = EMPTY
+            if r1 == ny:
+                band[-1] = EMPTY
+            forest.buffers[0, r0:r1] = pack_2bit(band)
+        forest.buffers.flush()
+        return forest
+
+    def read_rows(self, r0, r1):
+        """
+        Returns rows r0..r1-1 of the current grid, unpacked
+        """
+        return unpack_2bit(self.buffers[self.current, r0:r1], self.nx)
+
+    @property
+    def grid(self):
+        return self.read_rows(0, self.ny)
+
+    def _save_header(self):
+        with open(self.path, 'r+b') as fh:
+            fh.write(HEADER.pack(MAGIC, self.ny, self.nx, self.seed, self.step, self.current,
+                                 self.p, self.f, self.wind_speed))
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def update(self, p=None, f=None, wind_speed=None):
+        """
+        Advances the forest by one step, one band of rows at a time. Parameters
+        left as None keep the values saved with the file. The step only counts
+        once the new grid is flushed and the header points at it, so a run
+        stopped at any moment restarts from the last complete step.
+        """
+        if p is not None:
+            self.p = p
+        if f is not None:
+            self.f = f
+        if wind_speed is not None:
+            self.wind_speed = int(wind_speed)
+        src, dst = self.buffers[self.current], self.buffers[1 - self.current]
+
+        for b0 in range(0, self.ny, self.band_rows):
+            b1 = min(b0 + self.band_rows, self.ny)
+            # One row of overlap above and below for the neighbour stencil;
+            # bands span the full width, so the eastward wind never leaves them
+            h0, h1 = max(b0 - 1, 0), min(b1 + 1, self.ny)
+            band = unpack_2bit(src[h0:h1], self.nx)
+            out = np.empty_like(band)
+            step_tile(band, out, b0 - h0, b1 - h0, 0, self.nx, self.p, self.f,
+                      self.wind_speed, self.seed, self.step, row_offset=h0)
+            dst[b0:b1] = pack_2bit(out[b0 - h0:b1 - h0])
+
+        self.buffers.flush()
+        self.current = 1 - self.current
+        self.step += 1
+        self._save_header()
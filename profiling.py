@@ -0,0 +1,160 @@
+import json
+import sys
+import time
+
+
+class Profiler:
+    enabled = True  # Worth counting events for
+
+    def __init__(self, summary_every=0, out=None):
+        """
+        Per-phase step timers and running counters, cheap enough to leave on:
+        a phase costs one clock read and the counters are updated from what
+        each step changed rather than by scanning the grid.
+
+        An engine calls begin() at the start of a step, lap(name) at the end
+        of each phase, count() for the step's events, change() for running
+        totals such as trees and fires, and end() when the step is done.
+        :param summary_every: Print a summary every this many steps (0 for never)
+        :param out: File the summaries go to (sys.stdout if None)
+        """
+        self.summary_every = summary_every
+        self.out = out
+        self.steps = 0
+        self.phase_totals = {}  # Seconds spent in each phase over the run
+        self.event_totals = {}  # Events of each kind over the run
+        self.totals = {}  # Running totals, such as trees and fires
+        self.callbacks = []
+        self._phases = {}
+        self._events = {}
+        self._clock = None
+        self._started = None
+
+    def add_callback(self, callback):
+        """
+        Calls callback(record) at the end of every step, with a dict holding
+        the step number, its phase times in seconds, its events and the
+        running totals
+        """
+        self.callbacks.append(callback)
+
+    def begin(self):
+        self._clock = time.perf_counter()
+        if self._started is None:
+            self._started = self._clock
+        self._phases = {}
+        self._events = {}
+
+    def lap(self, name):
+        """
+        Charges the time since the last lap (or begin) to phase name
+        """
+        now = time.perf_counter()
+        self._phases[name] = self._phases.get(name, 0.0) + now - self._clock
+        self._clock = now
+
+    def count(self, **events):
+        """
+        Adds to this step's event counts
+        """
+        for name, n in events.items():
+            self._events[name] = self._events.get(name, 0) + int(n)
+
+    def change(self, name, delta, initial):
+        """
+        Adds delta to the running total name. The first time, initial() is
+        called for its value before this step, which is the only scan needed.
+        """
+        if name not in self.totals:
+            self.totals[name] = int(initial())
+        self.totals[name] += int(delta)
+
+    def end(self):
+        self.steps += 1
+        for name, seconds in self._phases.items():
+            self.phase_totals[name] = self.phase_totals.get(name, 0.0) + seconds
+        for name, n in self._events.items():
+            self.event_totals[name] = self.event_totals.get(name, 0) + n
+        if self.callbacks:
+            record = {'step': self.steps, 'phases': dict(self._phases),
+                      'events': dict(self._events), 'totals': dict(self.totals)}
+            for callback in self.callbacks:
+                callback(record)
+        if self.summary_every and self.steps % self.summary_every == 0:
+            self.dump()
+
+    def summary(self):
+        """
+        Totals so far: mean milliseconds and share of step time per phase,
+        event totals and the running totals
+        """
+        spent = sum(self.phase_totals.values())
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        return {'steps': self.steps,
+                'steps_per_sec': self.steps / elapsed if elapsed > 0 else 0.0,
+                'phases': {name: {'mean_ms': 1e3 * seconds / max(self.steps, 1),
+                                  'share': seconds / spent if spent > 0 else 0.0}
+                           for name, seconds in self.phase_totals.items()},
+                'events': dict(self.event_totals), 'totals': dict(self.totals)}
+
+    def dump(self, out=None):
+        """
+        Prints the summary as a short table
+        """
+        out = out or self.out or sys.stdout
+        s = self.summary()
+        out.write("step %d (%.1f steps/s)\n" % (s['steps'], s['steps_per_sec']))
+        for name, phase in sorted(s['phases'].items(), key=lambda item: -item[1]['share']):
+            out.write("  %-12s %9.3f ms %6.1f%%\n" % (name, phase['mean_ms'], 100 * phase['share']))
+        counters = sorted(s['events'].items()) + sorted(s['totals'].items())
+        if counters:
+            out.write("  " + "  ".join("%s=%d" % item for item in counters) + "\n")
+        out.flush()
+
+
+class NullProfiler:
+    """
+    Stands in for a Profiler when nothing is being measured, so an engine
+    can call it on every step without checking; each call does nothing.
+    Work done only to feed the counters can be skipped when enabled is False.
+    """
+    enabled = False
+
+    def begin(self):
+        pass
+
+    def lap(self, name):
+        pass
+
+    def count(self, **events):
+        pass
+
+    def change(self, name, delta, initial):
+        pass
+
+    def end(self):
+        pass
+
+
+# Shared default for engines and functions taking a profiler
+NULL_PROFILER = NullProfiler()
+
+
+class JsonLinesExporter:
+    def __init__(self, path):
+        """
+        Profiler callback writing every step's record to a file as one JSON line
+        """
+        self._file = open(path, 'a')
+
+    def __call__(self, record):
+        self._file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
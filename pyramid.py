@@ -0,0 +1,188 @@
+import numpy as np
+
+from fire import EMPTY, TREE, FIRE
+
+
+def _count_dtype(level):
+    # Smallest unsigned type that holds the cell count of a block
+    cells = 4 ** level
+    return np.uint8 if cells <= 0xff else np.uint16 if cells <= 0xffff else np.uint32
+
+
+def _block_cells(n, size):
+    # Cells in each block along one axis, the last one possibly short
+    cells = np.full(-(-n // size), size)
+    cells[-1] = n - size * (len(cells) - 1)
+    return cells
+
+
+def _pool2(a, dtype):
+    # Sums each 2x2 block, with a missing last row or column counting as 0
+    rows, cols = a.shape
+    if rows % 2 or cols % 2:
+        padded = np.zeros((rows + rows % 2, cols + cols % 2), dtype=a.dtype)
+        padded[:rows, :cols] = a
+        a = padded
+    out = a[0::2, 0::2].astype(dtype)
+    out += a[1::2, 0::2]
+    out += a[0::2, 1::2]
+    out += a[1::2, 1::2]
+    return out
+
+
+def _dominant(trees, fires, cells):
+    # Most common state; ties go to fire, then trees, so fires stay visible
+    empty = cells - trees - fires
+    return np.where((fires >= trees) & (fires >= empty), FIRE,
+                    np.where(trees >= empty, TREE, EMPTY)).astype(np.uint8)
+
+
+class SummaryPyramid:
+    def __init__(self, grid, levels=None):
+        """
+        Per-block summaries of a forest grid at every power-of-two zoom: level
+        k, from 1 up, holds the tree count, fire count and dominant state of each 2**k by
+        2**k block. Counts use the smallest integer type that fits a block,
+        so all levels together take about one byte per cell. After a step
+        only the blocks containing changed cells are updated, at every level.
+        :param grid: Initial grid of EMPTY, TREE and FIRE
+        :param levels: Number of levels (default: up to a single block)
+        """
+        self.shape = grid.shape
+        if levels is None:
+            levels = max(1, int(np.ceil(np.log2(max(self.shape)))))
+        self.levels = levels
+        # Cells per block along each axis, per level
+        self._row_cells = [_block_cells(self.shape[0], 2 ** k) for k in range(1, levels + 1)]
+        self._col_cells = [_block_cells(self.shape[1], 2 ** k) for k in range(1, levels + 1)]
+        self.rebuild(grid)
+
+    def _check(self, level):
+        # Level 0 is the grid itself, which the pyramid does not keep
+        if not 1 <= level <= self.levels:
+            raise ValueError("level must be from 1 to %d, not %r; level 0 is the grid itself"
+                             % (self.levels, level))
+
+    def rebuild(self, grid):
+        """
+        Recomputes every level from a whole grid
+        """
+        self.trees, self.fires, self.dominant = [], [], []
+        trees, fires = (grid == TREE).astype(np.uint8), (grid == FIRE).astype(np.uint8)
+        for k in range(1, self.levels + 1):
+            trees, fires = _pool2(trees, _count_dtype(k)), _pool2(fires, _count_dtype(k))
+            self.trees.append(trees)
+            self.fires.append(fires)
+            self.dominant.append(_dominant(trees, fires, self.cells(k)))
+
+    def cells(self, level):
+        """
+        Number of grid cells in each block of a level (smaller at the edges)
+        """
+        self._check(level)
+        return np.outer(self._row_cells[level - 1], self._col_cells[level - 1])
+
+    def update(self, cells, old, new):
+        """
+        Applies a step's changes, touching only the blocks that contain them
+        :param cells: Flat indices of the changed cells
+        :param old: Their states before the step
+        :param new: Their states after it
+        """
+        cells = np.asarray(cells)
+        dt = (np.asarray(new) == TREE).astype(np.int64) - (np.asarray(old) == TREE)
+        df = (np.asarray(new) == FIRE).astype(np.int64) - (np.asarray(old) == FIRE)
+        moved = (dt != 0) | (df != 0)
+        rows, cols = np.divmod(cells[moved], self.shape[1])
+        dt, df = dt[moved], df[moved]
+        for k in range(1, self.levels + 1):
+            if len(rows) == 0:
+                return
+            trees, fires = self.trees[k - 1], self.fires[k - 1]
+            block_cols = trees.shape[1]
+            # Sum the changes per block; each level has fewer blocks to touch
+            blocks, index = np.unique((rows >> 1) * block_cols + (cols >> 1), return_inverse=True)
+            dt = np.bincount(index, dt, len(blocks)).astype(np.int64)
+            df = np.bincount(index, df, len(blocks)).astype(np.int64)
+            # Negative changes wrap round in the unsigned counts and come out right
+            trees.reshape(-1)[blocks] += dt.astype(trees.dtype)
+            fires.reshape(-1)[blocks] += df.astype(fires.dtype)
+            rows, cols = np.divmod(blocks, block_cols)
+            cells_here = self._row_cells[k - 1][rows] * self._col_cells[k - 1][cols]
+            self.dominant[k - 1].reshape(-1)[blocks] = _dominant(
+                trees.reshape(-1)[blocks].astype(np.int64), fires.reshape(-1)[blocks].astype(np.int64), cells_here)
+
+    def update_from(self, old_grid, new_grid):
+        """
+        update for engines that do not report their changed cells: finds them
+        by comparing the grids before and after a step
+        """
+        changed = np.flatnonzero(old_grid != new_grid)
+        self.update(changed, old_grid.reshape(-1)[changed], new_grid.reshape(-1)[changed])
+
+    def level_for(self, screen):
+        """
+        Coarsest detail needed for a screen: the lowest level whose blocks
+        fit in (height, width) pixels, 0 meaning the full grid fits
+        """
+        for k in range(self.levels + 1):
+            if -(-self.shape[0] // 2 ** k) <= screen[0] and -(-self.shape[1] // 2 ** k) <= screen[1]:
+                return k
+        return self.levels
+
+    def image(self, level, how='max'):
+        """
+        One value per block of a level, for display. Levels start at 1; for
+        level 0 callers use the grid itself.
+        :param how: 'max' for the highest state present, as render.pool_blocks
+                    gives, or 'dominant' for the most common one
+        """
+        self._check(level)
+        if how == 'dominant':
+            return self.dominant[level - 1].copy()
+        if how == 'max':
+            trees, fires = self.trees[level - 1], self.fires[level - 1]
+            return np.where(fires > 0, FIRE, np.where(trees > 0, TREE, EMPTY)).astype(np.uint8)
+        raise ValueError("how must be 'max' or 'dominant', not %r" % how)
+
+    def density(self, level):
+        """
+        Fraction of each block of a level covered by trees (level 1 or more)
+        """
+        self._check(level)
+        return self.trees[level - 1] / self.cells(level)
+
+    def totals(self):
+        """
+        (trees, fires) over the whole grid, read from the top level
+        """
+        return int(self.trees[-1].sum(dtype=np.int64)), int(self.fires[-1].sum(dtype=np.int64))
+
+    def nbytes(self):
+        """
+        Memory held by all levels
+        """
+        return sum(a.nbytes for a in self.trees + self.fires + self.dominant)
+
+
+def coarse_step(step, first, pyramid, level, how='max'):
+    """
+    Wraps a step function for render.animate_live so the simulation thread
+    keeps a pyramid up to date and publishes only one of its levels, 4**level
+    times smaller than the grid
+    :param step: Function that advances the simulation and returns its grid
+    :param first: Initial grid, which pyramid was built from
+    :param pyramid: SummaryPyramid of first
+    :param level: Level to publish (see SummaryPyramid.level_for)
+    :param how: Passed on to SummaryPyramid.image
+    :return: Step function returning the level's image
+    """
+    # Our own copy of the last grid, since engines may update theirs in place
+    last = np.array(first)
+
+    def coarse():
+        grid = step()
+        pyramid.update_from(last, grid)
+        np.copyto(last, grid)
+        return grid if level == 0 else pyramid.image(level, how)
+    return coarse
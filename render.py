@@ -0,0 +1,219 @@
+import threading
+
+import numpy as np
+
+from profiling import NULL_PROFILER
+
+
+def pool_blocks(grid, factor, how='max', num_states=None):
+    """
+    Shrinks a grid by an integer factor in each direction, one output pixel
+    per block of cells
+    :param grid: 2D integer grid of states
+    :param factor: (rows, cols) block size
+    :param how: 'max' keeps the highest state in each block, so a single
+                burning cell stays visible; 'mode' keeps the most common one
+    :param num_states: Number of states for 'mode' (found from the grid if None)
+    :return: The pooled grid (grid itself if factor is (1, 1))
+    """
+    fy, fx = factor
+    if fy == 1 and fx == 1:
+        return grid
+    rows, cols = grid.shape
+    out_rows, out_cols = -(-rows // fy), -(-cols // fx)
+    if out_rows * fy != rows or out_cols * fx != cols:
+        # Pad the last blocks with state 0, which never wins a max
+        padded = np.zeros((out_rows * fy, out_cols * fx), dtype=grid.dtype)
+        padded[:rows, :cols] = grid
+        grid = padded
+    blocks = grid.reshape(out_rows, fy, out_cols, fx)
+    if how == 'max':
+        return blocks.max(axis=(1, 3))
+    if how == 'mode':
+        n = int(grid.max()) + 1 if num_states is None else num_states
+        counts = np.stack([(blocks == s).sum(axis=(1, 3)) for s in range(n)])
+        return counts.argmax(axis=0).astype(grid.dtype)
+    raise ValueError("how must be 'max' or 'mode', not %r" % how)
+
+
+def fit_factor(shape, screen):
+    """
+    Smallest block size that brings a grid down to at most the given
+    number of screen pixels
+    :param shape: (rows, cols) of the grid
+    :param screen: (height, width) in pixels
+    """
+    return (max(1, -(-shape[0] // max(1, int(screen[0])))),
+            max(1, -(-shape[1] // max(1, int(screen[1])))))
+
+
+class FrameRing:
+    def __init__(self, shape, dtype, capacity=3):
+        """
+        Bounded buffer between a simulation and a viewer. Publishing never
+        blocks and never allocates: it overwrites the oldest frame, so a
+        viewer that falls behind skips straight to the newest one. With
+        three slots there is always one free to write while one holds the
+        latest frame and one is being read.
+        :param shape: Shape of a frame
+        :param dtype: dtype of a frame
+        :param capacity: Number of slots (at least 3)
+        """
+        if capacity < 3:
+            raise ValueError("a frame ring needs at least 3 slots")
+        self._slots = np.zeros((capacity,) + tuple(shape), dtype=dtype)
+        self._lock = threading.Lock()
+        self._latest = None  # Slot holding the newest frame
+        self._reading = None  # Slot the viewer is reading
+        self.published = 0  # Frames published so far
+        self.shown = 0  # Frames handed to the viewer
+        self._seen = 0  # Value of published at the last read
+
+    @property
+    def dropped(self):
+        """
+        Frames published but never read
+        """
+        return self.published - self.shown
+
+    def publish(self, frame):
+        """
+        Copies a frame in as the newest one
+        """
+        with self._lock:
+            slot = next(i for i in range(len(self._slots)) if i != self._latest and i != self._reading)
+        self._slots[slot] = frame
+        with self._lock:
+            self._latest = slot
+            self.published += 1
+
+    def latest(self, transform=np.copy):
+        """
+        Returns transform(newest frame), or None if nothing new was published
+        since the last call. The slot is held while transform runs, so it can
+        read the frame without copying it first.
+        """
+        with self._lock:
+            if self._latest is None or self.published == self._seen:
+                return None
+            self._reading = self._latest
+            self._seen = self.published
+            self.shown += 1
+        try:
+            return transform(self._slots[self._reading])
+        finally:
+            with self._lock:
+                self._reading = None
+
+
+class SimulationThread(threading.Thread):
+    def __init__(self, step, ring, steps=None, until=None):
+        """
+        Runs a simulation as fast as it can go in the background, publishing
+        every frame to a FrameRing
+        :param step: Function that advances the simulation and returns its grid
+        :param ring: FrameRing to publish to
+        :param steps: Stop after this many steps (None to run until stopped)
+        :param until: Optional function called after each step; True stops
+        """
+        super().__init__(daemon=True)
+        self.step = step
+        self.ring = ring
+        self.limit = steps
+        self.until = until
+        self.steps = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.ring.publish(self.step())
+            self.steps += 1
+            if self.steps == self.limit or (self.until is not None and self.until()):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()
+
+
+def animate_live(fig, ax, step, first, interval=50, how='max', num_states=None, profiler=NULL_PROFILER,
+                 steps=None, until=None, **imshow_kwargs):
+    """
+    Shows a simulation that runs in a background thread. Every redraw takes
+    the newest frame (older ones are dropped), pools it down to the axes'
+    size in pixels and hands that to imshow, so drawing costs the same for
+    any grid size and never slows the simulation down.
+    :param fig: Figure holding ax
+    :param ax: Axes to draw in
+    :param step: Function that advances the simulation and returns its grid
+    :param first: Initial grid
+    :param interval: Milliseconds between redraws
+    :param how: Pooling for grids larger than the axes, 'max' or 'mode'
+    :param num_states: Number of states, for 'mode' pooling
+    :param profiler: Optional profiling.Profiler timing each redraw's pooling
+                     and drawing (use a different one from the simulation's)
+    :param steps: Stop the simulation after this many steps (None for never)
+    :param until: Optional function called after each step; True stops the
+                  simulation, leaving its last frame on show
+    :param imshow_kwargs: Passed on to imshow (cmap, norm, ...)
+    :return: (animation, thread); keep a reference to the animation
+    """
+    from matplotlib.animation import FuncAnimation
+
+    rows, cols = first.shape
+    ring = FrameRing(first.shape, first.dtype)
+    ring.publish(first)
+
+    def pooled(frame):
+        size = ax.get_window_extent().size
+        return pool_blocks(frame, fit_factor(frame.shape, (size[1], size[0])), how, num_states).copy()
+
+    # Fix the extent to the grid so a pooled image covers the same area
+    imshow_kwargs.setdefault('interpolation', 'nearest')
+    im = ax.imshow(ring.latest(pooled), extent=(-0.5, cols - 0.5, rows - 0.5, -0.5), **imshow_kwargs)
+    worker = SimulationThread(step, ring, steps, until)
+
+    def update(frame):
+        profiler.begin()
+        image = ring.latest(pooled)
+        profiler.lap('pool')
+        if image is not None:
+            im.set_data(image)
+        profiler.lap('draw')
+        profiler.end()
+        return [im]
+
+    ani = FuncAnimation(fig, update, interval=interval, blit=True, cache_frame_data=False)
+    fig.canvas.mpl_connect('close_event', lambda event: worker.stop())
+    worker.start()
+    return ani, worker
+
+
+def attach(sim, fig, ax, steps=None, interval=50, how='max', num_states=None, **imshow_kwargs):
+    """
+    animate_live for a ForestSimulation or CellularAutomaton (anything with
+    update() and grid) in an existing figure. The simulation stops after
+    steps updates, or as soon as its settled() says so if it has one.
+    :return: (animation, thread); keep a reference to the animation
+    """
+    def step():
+        sim.update()
+        return sim.grid
+
+    return animate_live(fig, ax, step, np.array(sim.grid), interval, how, num_states,
+                        steps=steps, until=getattr(sim, 'settled', None), **imshow_kwargs)
+
+
+def watch(sim, interval=50, how='max', num_states=None, steps=None, **imshow_kwargs):
+    """
+    attach in a window of its own, returning once the window is closed
+    :return: The simulation thread, already stopped
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ani, worker = attach(sim, fig, ax, steps, interval, how, num_states, **imshow_kwargs)
+    plt.show()
+    worker.stop()
+    return worker
@@ -0,0 +1,501 @@
+import asyncio
+import itertools
+import json
+import logging
+import math
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from fire import EMPTY, TREE, FIRE, iterate_with_wind
+
+HOST, PORT = '127.0.0.1', 8765
+ENGINES = ('fire', 'forest')
+# Parameters a client may change while the shared simulation runs
+LIVE_PARAMS = ('p', 'f', 'wind')
+# A delta touching more than this fraction of the grid is sent whole instead
+KEYFRAME_FRACTION = 0.2
+# Seconds to wait before retrying a simulation chunk that failed
+RETRY_DELAY = 1.0
+
+log = logging.getLogger(__name__)
+
+# Every message is one JSON line, followed by 'size' bytes of binary payload
+# when it has one. Frames carry the grid as uint8: a 'key' frame is the whole
+# grid, zlib-compressed; a 'delta' frame is the changed cells' flat indices
+# (uint32) then their new states (uint8), zlib-compressed together.
+
+
+def _forest_class():
+    from automation.forest import ForestSimulation
+    return ForestSimulation
+
+
+def check_params(message, current=None):
+    """
+    Converts and range-checks the live parameters in a message
+    :param message: Dict that may hold p, f and wind
+    :param current: Values for those it leaves out
+    :return: New dict of p, f and wind
+    :raises ValueError: If any is missing, not a number or out of range
+    """
+    params = dict(current or {})
+    for name in LIVE_PARAMS:
+        if name not in message:
+            continue
+        value = message[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError('%s must be a number, not %r' % (name, value))
+        if name == 'wind':
+            if value != int(value) or value < 0:
+                raise ValueError('wind must be a whole number of cells >= 0, not %r' % value)
+            value = int(value)
+        elif not 0 <= value <= 1:
+            raise ValueError('%s must be a probability between 0 and 1, not %r' % (name, value))
+        params[name] = value
+    missing = set(LIVE_PARAMS) - set(params)
+    if missing:
+        raise ValueError('missing parameters %s' % sorted(missing))
+    return params
+
+
+def new_state(engine, rows, cols, p, f, forest_fraction=0.2, seed=None):
+    """
+    Builds a simulation to hand to advance
+    :param engine: 'fire' for iterate_with_wind, 'forest' for ForestSimulation
+    :return: The engine's state, picklable so it can cross to a worker process
+    """
+    rng = np.random.default_rng(seed)
+    if engine == 'fire':
+        X = np.zeros((rows, cols), dtype=np.uint8)
+        X[1:-1, 1:-1] = np.where(rng.random((rows - 2, cols - 2)) < forest_fraction, TREE, EMPTY)
+        return {'X': X, 'rng': rng}
+    if engine == 'forest':
+        return _forest_class()(rows, cols, p, f, sparse=True, rng=rng)
+    raise ValueError("engine must be one of %s, not %r" % (', '.join(ENGINES), engine))
+
+
+def advance(engine, state, params, steps):
+    """
+    Runs a simulation for a number of steps; called in a worker process
+    :param engine: 'fire' or 'forest'
+    :param state: State from new_state or an earlier advance
+    :param params: Dict with p, f and wind
+    :param steps: Steps to run
+    :return: (new state, uint8 grid)
+    """
+    if engine == 'fire':
+        X, rng = state['X'], state['rng']
+        for _ in range(steps):
+            X = iterate_with_wind(X, params['p'], params['f'], params['wind'], rng)
+        return {'X': X, 'rng': rng}, X.astype(np.uint8)
+    state.growth_prob, state.fire_prob = params['p'], params['f']
+    for _ in range(steps):
+        state.update()
+    return state, state.grid.astype(np.uint8)
+
+
+def run_job(job):
+    """
+    Runs a batch job to the end in a worker process
+    :param job: Dict with engine, rows, cols, p, f, wind, steps and
+                optionally forest_fraction and seed
+    :return: Dict of per-step tree and fire counts
+    """
+    state = new_state(job.get('engine', 'fire'), job['rows'], job['cols'], job['p'], job['f'],
+                      job.get('forest_fraction', 0.2), job.get('seed'))
+    params = {'p': job['p'], 'f': job['f'], 'wind': job.get('wind', 0)}
+    trees, fires = [], []
+    for _ in range(job['steps']):
+        state, grid = advance(job.get('engine', 'fire'), state, params, 1)
+        trees.append(int(np.count_nonzero(grid == TREE)))
+        fires.append(int(np.count_nonzero(grid == FIRE)))
+    return {'trees': trees, 'fires': fires}
+
+
+def _frame_payload(grid, last):
+    # The header fields and compressed payload of grid as a delta from last,
+    # or as a key frame when last is None, another shape or too different
+    changed = None
+    if last is not None and last.shape == grid.shape:
+        changed = np.flatnonzero(last != grid)
+        if len(changed) > KEYFRAME_FRACTION * grid.size:
+            changed = None
+    if changed is None:
+        return {'kind': 'key'}, zlib.compress(np.ascontiguousarray(grid).tobytes(), 1)
+    payload = zlib.compress(changed.astype(np.uint32).tobytes() + grid.reshape(-1)[changed].tobytes(), 1)
+    return {'kind': 'delta', 'cells': len(changed)}, payload
+
+
+def encode_frame(step, grid, last, skipped=0):
+    """
+    Encodes a frame as a delta from the last grid the subscriber was sent
+    :param step: Step of grid
+    :param grid: uint8 grid
+    :param last: Grid the subscriber has, or None for a key frame
+    :param skipped: Frames dropped for this subscriber since the last one
+    :return: Message bytes
+    """
+    fields, payload = _frame_payload(grid, last)
+    return encode(dict({'op': 'frame', 'step': step, 'shape': grid.shape, 'skipped': skipped}, **fields), payload)
+
+
+def apply_frame(header, payload, grid):
+    """
+    Decodes a frame onto the grid a client holds
+    :return: The new grid (a new array for key frames, grid updated in place
+             for deltas)
+    """
+    data = zlib.decompress(payload)
+    if header['kind'] == 'key':
+        return np.frombuffer(data, dtype=np.uint8).reshape(header['shape']).copy()
+    n = header['cells']
+    cells = np.frombuffer(data, dtype=np.uint32, count=n)
+    grid.reshape(-1)[cells] = np.frombuffer(data, dtype=np.uint8, offset=4 * n)
+    return grid
+
+
+def encode(header, payload=b''):
+    header = dict(header, size=len(payload))
+    return json.dumps(header).encode() + b'\n' + payload
+
+
+async def read_message(reader):
+    """
+    Reads one message
+    :return: (header dict, payload bytes), or (None, b'') at end of stream
+    """
+    line = await reader.readline()
+    if not line:
+        return None, b''
+    header = json.loads(line)
+    payload = await reader.readexactly(header['size']) if header.get('size') else b''
+    return header, payload
+
+
+class _Frame:
+    def __init__(self, step, grid, previous):
+        # A published grid, compressed at most once as a delta from the grid
+        # published before it and once whole, however many subscribers it
+        # goes to
+        self.step = step
+        self.grid = grid
+        self.previous = previous
+        self._payloads = {}
+
+    def encode(self, last, skipped):
+        # Subscribers that were sent the previous grid share the delta; the
+        # rest (new ones, and slow ones that skipped frames) get a key frame
+        kind = 'delta' if last is not None and last is self.previous else 'key'
+        if kind not in self._payloads:
+            self._payloads[kind] = _frame_payload(self.grid, last if kind == 'delta' else None)
+        fields, payload = self._payloads[kind]
+        header = {'op': 'frame', 'step': self.step, 'shape': self.grid.shape, 'skipped': skipped}
+        return encode(dict(header, **fields), payload)
+
+
+class _Subscriber:
+    def __init__(self, writer):
+        # Holds at most one unsent frame: a newer one replaces it, so a slow
+        # client skips frames instead of holding up the simulation
+        self.writer = writer
+        self.pending = None
+        self.ready = asyncio.Event()
+        self.last = None
+        self.sent = 0
+        self.skipped = 0
+        self._skipped_since = 0
+
+    def offer(self, frame):
+        if self.pending is not None:
+            self.skipped += 1
+            self._skipped_since += 1
+        self.pending = frame
+        self.ready.set()
+
+    async def run(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            frame = self.pending
+            self.pending = None
+            self.writer.write(frame.encode(self.last, self._skipped_since))
+            self.last, self._skipped_since = frame.grid, 0
+            self.sent += 1
+            await self.writer.drain()
+
+
+class SimulationService:
+    def __init__(self, engine='fire', rows=200, cols=200, p=0.05, f=0.0001, wind=0, seed=None,
+                 workers=2, queue_size=16, chunk=1):
+        """
+        Local service running one shared simulation, streaming its frames to
+        every subscriber, and running queued batch jobs. Simulation steps
+        and jobs run on a process pool; the event loop encodes each frame
+        once, whatever the number of subscribers, and sends it.
+        :param engine: 'fire' or 'forest' for the shared simulation
+        :param rows: Grid rows
+        :param cols: Grid columns
+        :param p: Tree growth probability
+        :param f: Lightning probability
+        :param wind: Wind speed (fire engine only)
+        :param seed: Seed for the shared simulation
+        :param workers: Batch jobs run at once
+        :param queue_size: Batch jobs that may wait; more are rejected
+        :param chunk: Steps per frame
+        """
+        self.engine = engine
+        self.params = check_params({'p': p, 'f': f, 'wind': wind})
+        self.chunk = chunk
+        self.step = 0
+        self.workers = workers
+        self.jobs = asyncio.Queue(maxsize=queue_size)
+        self._state = new_state(engine, rows, cols, p, f, seed=seed)
+        self._grid = None
+        self._frame = None
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self._pool = ProcessPoolExecutor(max_workers=workers + 1)
+        self._tasks = []
+        self._connections = {}  # Connection task: its writer
+        self._server = None
+
+    async def start(self, host=HOST, port=PORT):
+        """
+        Starts listening and simulating
+        :return: The (host, port) listened on, port 0 picking a free one
+        """
+        self._server = await asyncio.start_server(self._serve, host, port)
+        self._tasks.append(asyncio.ensure_future(self._simulate()))
+        self._tasks.extend(asyncio.ensure_future(self._work()) for _ in range(self.workers))
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+        for task in self._tasks:
+            task.cancel()
+        # Connections are ended by closing them, which their reads see as the
+        # end of the stream; asyncio complains about cancelled ones
+        connections = list(self._connections)
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._tasks, *connections, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        # Waiting for the workers to exit blocks, so it is done off the loop
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self._pool.shutdown(cancel_futures=True))
+
+    def stats(self):
+        return {'step': self.step, 'params': self.params, 'subscribers': len(self._subscribers),
+                'queued': self.jobs.qsize(),
+                'sent': sum(s.sent for s in self._subscribers),
+                'skipped': sum(s.skipped for s in self._subscribers)}
+
+    async def _simulate(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                self._state, self._grid = await loop.run_in_executor(
+                    self._pool, advance, self.engine, self._state, dict(self.params), self.chunk)
+            except BrokenProcessPool as e:
+                # Every later chunk would fail the same way, so the shared
+                # simulation stops here
+                log.exception('simulation stopped at step %d: worker pool broken', self.step)
+                self._broadcast({'op': 'error', 'message': 'simulation stopped at step %d: %s' % (self.step, e)})
+                return
+            except Exception as e:
+                # Keep the last good state and try again, rather than
+                # stopping the simulation for everyone
+                log.exception('simulation chunk after step %d failed', self.step)
+                self._broadcast({'op': 'error', 'message': 'simulation step %d failed: %s' % (self.step, e)})
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+            self.step += self.chunk
+            self._frame = _Frame(self.step, self._grid, None if self._frame is None else self._frame.grid)
+            for subscriber in self._subscribers:
+                subscriber.offer(self._frame)
+
+    def _broadcast(self, message):
+        data = encode(message)
+        for subscriber in self._subscribers:
+            if not subscriber.writer.is_closing():
+                subscriber.writer.write(data)
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, job, writer = await self.jobs.get()
+            try:
+                result = await loop.run_in_executor(self._pool, run_job, job)
+                reply = {'op': 'done', 'id': job_id, 'result': result}
+            except Exception as e:
+                reply = {'op': 'failed', 'id': job_id, 'error': str(e)}
+            finally:
+                self.jobs.task_done()
+            if not writer.is_closing():
+                writer.write(encode(reply))
+
+    async def _serve(self, reader, writer):
+        subscriber = None
+        sender = None
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                message, _ = await read_message(reader)
+                if message is None:
+                    break
+                op = message.get('op')
+                if op == 'subscribe' and subscriber is None:
+                    subscriber = _Subscriber(writer)
+                    self._subscribers.add(subscriber)
+                    sender = asyncio.ensure_future(subscriber.run())
+                    if self._frame is not None:
+                        subscriber.offer(self._frame)
+                elif op == 'set':
+                    unknown = set(message) - set(LIVE_PARAMS) - {'op', 'size'}
+                    if unknown:
+                        writer.write(encode({'op': 'error', 'message': 'unknown parameters %s' % sorted(unknown)}))
+                        continue
+                    try:
+                        self.params = check_params(message, self.params)
+                    except ValueError as e:
+                        writer.write(encode({'op': 'error', 'message': str(e)}))
+                        continue
+                    writer.write(encode({'op': 'params', 'params': self.params}))
+                elif op == 'submit':
+                    job = message.get('job')
+                    try:
+                        if not isinstance(job, dict):
+                            raise ValueError('job must be an object')
+                        check_params(job, {'wind': 0})
+                    except ValueError as e:
+                        writer.write(encode({'op': 'error', 'message': str(e)}))
+                        continue
+                    job_id = next(self._ids)
+                    try:
+                        self.jobs.put_nowait((job_id, job, writer))
+                        writer.write(encode({'op': 'queued', 'id': job_id}))
+                    except asyncio.QueueFull:
+                        writer.write(encode({'op': 'rejected', 'id': job_id, 'message': 'job queue is full'}))
+                elif op == 'stats':
+                    writer.write(encode(dict(self.stats(), op='stats')))
+                else:
+                    writer.write(encode({'op': 'error', 'message': 'unknown op %r' % op}))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            if subscriber is not None:
+                self._subscribers.discard(subscriber)
+                sender.cancel()
+            writer.close()
+
+
+class Client:
+    def __init__(self, reader, writer):
+        """
+        Connection to a SimulationService; use Client.connect
+        """
+        self.reader = reader
+        self.writer = writer
+        self.grid = None  # The shared simulation's grid, once subscribed
+        self.step = None
+
+    @classmethod
+    async def connect(cls, host=HOST, port=PORT):
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def send(self, **message):
+        self.writer.write(encode(message))
+        await self.writer.drain()
+
+    async def subscribe(self):
+        await self.send(op='subscribe')
+
+    async def set(self, **params):
+        await self.send(op='set', **params)
+
+    async def submit(self, **job):
+        await self.send(op='submit', job=job)
+
+    async def recv(self):
+        """
+        Reads the next message; frames are applied to self.grid
+        :return: The message's header, None when the service has gone
+        """
+        header, payload = await read_message(self.reader)
+        if header is not None and header['op'] == 'frame':
+            self.grid = apply_frame(header, payload, self.grid)
+            self.step = header['step']
+        return header
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def loopback(frames=50, **service_kwargs):
+    """
+    Starts a service on a free local port, subscribes to it, changes the
+    parameters, runs a batch job and checks every frame decodes to the grid
+    the service published
+    :return: The service's stats at the end
+    """
+    service = SimulationService(**service_kwargs)
+    host, port = await service.start(port=0)
+    client = await Client.connect(host, port)
+    try:
+        await client.subscribe()
+        await client.submit(engine='fire', rows=50, cols=50, p=0.05, f=0.001, wind=1, steps=20, seed=1)
+        seen, done = 0, None
+        while seen < frames or done is None:
+            message = await client.recv()
+            if message['op'] == 'frame':
+                seen += 1
+                if message['step'] == service.step and not np.array_equal(client.grid, service._grid):
+                    raise AssertionError('frame at step %d decoded wrongly' % message['step'])
+                if seen == frames // 2:
+                    await client.set(f=0.01, wind=2)
+            elif message['op'] == 'done':
+                done = message['result']
+            elif message['op'] in ('rejected', 'failed', 'error'):
+                raise AssertionError(message)
+        return service.stats()
+    finally:
+        await client.close()
+        await service.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a shared forest simulation on a local socket")
+    parser.add_argument('--engine', choices=ENGINES, default='fire')
+    parser.add_argument('--size', type=int, default=200, help="grid side length")
+    parser.add_argument('--p', type=float, default=0.05, help="tree growth probability")
+    parser.add_argument('--f', type=float, default=0.0001, help="lightning probability")
+    parser.add_argument('--wind', type=int, default=0, help="wind speed in cells")
+    parser.add_argument('--seed', type=int, help="random seed")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=2, help="batch jobs run at once")
+    parser.add_argument('--loopback', action='store_true', help="run a local client against a fresh service and exit")
+    args = parser.parse_args()
+
+    kwargs = dict(engine=args.engine, rows=args.size, cols=args.size, p=args.p, f=args.f, wind=args.wind,
+                  seed=args.seed, workers=args.workers)
+    if args.loopback:
+        print(json.dumps(asyncio.run(loopback(**kwargs))))
+    else:
+        async def serve():
+            service = SimulationService(**kwargs)
+            host, port = await service.start(port=args.port)
+            print("serving on %s:%d" % (host, port))
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await service.close()
+        asyncio.run(serve())
@@ -0,0 +1,104 @@
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from fire import TREE, FIRE, initialize_grid, iterate_with_wind
+
+
+# Build the list of runs for every combination of parameters. Each run gets
+# its own seed derived from base_seed and its position in the sweep, so the
+# same sweep always hands the same seed to the same run.
+def sweep_runs(p_values, f_values, wind_speeds, forest_fractions, sizes, repeats=1, base_seed=0):
+    runs = []
+    combos = itertools.product(p_values, f_values, wind_speeds, forest_fractions, sizes, range(repeats))
+    for index, (p, f, wind_speed, forest_fraction, size, repeat) in enumerate(combos):
+        nx, ny = (size, size) if np.isscalar(size) else size
+        seed = int(np.random.SeedSequence([base_seed, index]).generate_state(1)[0])
+        runs.append({'p': float(p), 'f': float(f), 'wind_speed': int(wind_speed),
+                     'forest_fraction': float(forest_fraction), 'nx': int(nx), 'ny': int(ny),
+                     'repeat': repeat, 'seed': seed})
+    return runs
+
+
+def run_key(run):
+    # Identifies a run in the results file, independent of sweep order
+    return json.dumps([run[k] for k in ('p', 'f', 'wind_speed', 'forest_fraction', 'nx', 'ny', 'seed')])
+
+
+# Simulate one run and summarise it. extinction_step is the first step at
+# which no cell is burning once a fire has started (None if that never happens).
+def simulate(run, steps):
+    np.random.seed(run['seed'])
+    X = initialize_grid(run['nx'], run['ny'], run['forest_fraction'])
+    burned = np.zeros(X.shape, dtype=bool)
+    density = []
+    extinction_step = None
+    fire_started = False
+    for step in range(steps):
+        X = iterate_with_wind(X, run['p'], run['f'], run['wind_speed'])
+        on_fire = X == FIRE
+        burned |= on_fire
+        density.append(float(np.mean(X == TREE)))
+        if on_fire.any():
+            fire_started = True
+        elif fire_started and extinction_step is None:
+            extinction_step = step + 1
+    result = dict(run)
+    result.update({'steps': steps, 'tree_density': density,
+                   'burned_fraction': float(burned.mean()),
+                   'extinction_step': extinction_step})
+    return result
+
+
+def load_results(path):
+    """
+    Reads the finished runs from a results file, ignoring a last line that
+    was cut off by a crash
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path) as fh:
+        for line in fh:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            results[run_key(result)] = result
+    return results
+
+
+# Run a sweep on a process pool, yielding each result as soon as its worker
+# finishes. Results are appended to out_path one JSON line at a time, and
+# runs already in that file are skipped, so a crashed sweep can be resumed
+# by calling this again with the same arguments.
+def run_sweep(runs, steps, out_path, workers=None):
+    done = load_results(out_path)
+    pending = [run for run in runs
+               if run_key(run) not in done or done[run_key(run)]['steps'] != steps]
+    if not pending:
+        return
+    with open(out_path, 'a+') as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        # Start on a fresh line if a crash left the last one unfinished
+        if out.tell() > 0:
+            out.seek(out.tell() - 1)
+            if out.read(1) != '\n':
+                out.write('\n')
+        futures = [pool.submit(simulate, run, steps) for run in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            os.fsync(out.fileno())
+            yield result
+
+
+if __name__ == '__main__':
+    runs = sweep_runs(p_values=[0.01, 0.05, 0.1], f_values=[0.0001, 0.001], wind_speeds=[0, 2],
+                      forest_fractions=[0.2, 0.6], sizes=[100], repeats=2)
+    for result in run_sweep(runs, steps=200, out_path='sweep_results.jsonl'):
+        print("p=%(p)g f=%(f)g wind=%(wind_speed)d forest=%(forest_fraction)g "
+              "burned=%(burned_fraction).3f extinction=%(extinction_step)s" % result)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import backends
+from fire import iterate_with_wind
+
+
+@pytest.mark.parametrize('name', [name for name in backends.BACKENDS if name != 'python'])
+def test_backend_matches_python_reference(name):
+    assert backends.check_conformance(shape=(23, 37), steps=15, backends=[name]) == []
+
+
+def test_step_matches_iterate_with_wind():
+    X = backends._test_grid((20, 30), np.random.default_rng(0))
+    for wind_speed in (0, 2):
+        expected = iterate_with_wind(X, 0.05, 0.01, wind_speed, np.random.default_rng(5))
+        for name in backends.BACKENDS:
+            got = backends.step(X, 0.05, 0.01, wind_speed, np.random.default_rng(5), backend=name)
+            np.testing.assert_array_equal(got, expected, err_msg=name)
+
+
+def test_calibrate_times_a_backend_asked_for_by_name(monkeypatch):
+    # Named backends are timed even on grids the loop is normally left out of
+    monkeypatch.setattr(backends, 'LOOP_CELLS', 100)
+    fastest, timings = backends.calibrate((20, 20), repeats=1, backends=['python'])
+    assert fastest == 'python' and list(timings) == ['python']
+    assert 'python' not in backends.calibrate((20, 20), repeats=1)[1]
+
+
+def test_calibrate_without_backends_raises():
+    with pytest.raises(ValueError):
+        backends.calibrate((8, 8), backends=[])
@@ -0,0 +1,31 @@
+import importlib
+
+import numpy as np
+import pytest
+
+from automation.bitlife import BitPackedLife
+
+wrapped = importlib.import_module('automation.cellular iteration1')
+clipped = importlib.import_module('automation.upscaling')
+
+
+def _reference(module, grid, loop):
+    ca = module.CellularAutomaton(*grid.shape, module.conways_rule)
+    ca.grid = grid.copy()
+    if loop:
+        # No table, so every cell goes through the rule function
+        ca.rule_table = None
+    return ca
+
+
+@pytest.mark.parametrize('wrap', [True, False])
+@pytest.mark.parametrize('loop', [True, False])
+@pytest.mark.parametrize('shape', [(12, 64), (9, 70), (5, 130)])
+def test_matches_cell_by_cell_life(wrap, loop, shape):
+    grid = np.random.default_rng(sum(shape)).integers(0, 2, size=shape)
+    reference = _reference(wrapped if wrap else clipped, grid, loop)
+    packed = BitPackedLife(*shape, initial_state=grid, wrap=wrap)
+    for _ in range(6):
+        reference.update()
+        packed.update()
+        np.testing.assert_array_equal(packed.grid, reference.grid)
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+import checkpoint
+from automation import forest, improvedforest
+from checkpoint import (Checkpointer, checkpoint_forest, load_checkpoint, restore_forest,
+                        run_with_wind)
+from fire import FIRE, initialize_grid
+
+
+def test_wind_run_resumes_exactly(tmp_path):
+    np.random.seed(1)
+    X = initialize_grid(30, 20, 0.6)
+    X[10, 15] = FIRE
+    expected = run_with_wind(X, 0.05, 0.01, 1, np.random.default_rng(7), 0, 20)
+
+    path = str(tmp_path / 'run.npz')
+    run_with_wind(X, 0.05, 0.01, 1, np.random.default_rng(7), 0, 10, Checkpointer(path, every=10))
+    saved = load_checkpoint(path)
+    rng = np.random.default_rng()
+    rng.bit_generator.state = saved['rng_state']
+    resumed = run_with_wind(saved['arrays']['grid'], 0.05, 0.01, 1, rng, saved['step'], 20)
+    np.testing.assert_array_equal(resumed, expected)
+
+
+def _forest(module, sparse, rng):
+    if module is improvedforest:
+        return module.ForestSimulation(25, 25, 0.05, 0.01, 0.001, sparse=sparse, rng=rng)
+    return module.ForestSimulation(25, 25, 0.05, 0.01, sparse=sparse, rng=rng)
+
+
+@pytest.mark.parametrize('module', [forest, improvedforest])
+@pytest.mark.parametrize('sparse', [False, True])
+def test_forest_resumes_exactly(module, sparse, tmp_path):
+    path = str(tmp_path / 'forest.npz')
+    original = _forest(module, sparse, np.random.default_rng(3))
+    checkpointer = Checkpointer(path, every=5)
+    for _ in range(5):
+        original.update()
+        checkpoint_forest(checkpointer, original)
+    checkpointer.wait()
+    for _ in range(10):
+        original.update()
+
+    restored = _forest(module, sparse, np.random.default_rng(99))
+    restore_forest(restored, load_checkpoint(path))
+    for _ in range(10):
+        restored.update()
+    assert restored.generation == original.generation
+    np.testing.assert_array_equal(restored.grid, original.grid)
+
+
+def _fail_replace(src, dst):
+    raise OSError(28, 'No space left on device')
+
+
+def test_failed_write_is_raised_and_cleaned_up(tmp_path, monkeypatch):
+    path = str(tmp_path / 'run.npz')
+    grid = np.zeros((4, 4), dtype=np.uint8)
+    checkpointer = Checkpointer(path, every=1)
+    checkpointer.save(1, {'grid': grid}, {}, np.random.default_rng(0))
+    checkpointer.wait()
+
+    monkeypatch.setattr(checkpoint.os, 'replace', _fail_replace)
+    checkpointer.save(2, {'grid': grid}, {}, np.random.default_rng(0))
+    with pytest.raises(OSError):
+        checkpointer.wait()
+    # The error is raised once, and the next failure surfaces from save()
+    checkpointer.wait()
+    checkpointer.save(3, {'grid': grid}, {}, np.random.default_rng(0))
+    with pytest.raises(OSError):
+        checkpointer.save(4, {'grid': grid}, {}, np.random.default_rng(0))
+
+    assert not os.path.exists(path + '.tmp')
+    assert load_checkpoint(path)['step'] == 1
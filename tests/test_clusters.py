@@ -0,0 +1,27 @@
+import numpy as np
+
+from clusters import FireTracker
+
+
+def test_fires_burning_when_attached_are_followed():
+    # Two separate fires are already burning; cells catching from them join
+    # them rather than starting new fires, and each ends with its full size
+    burning = np.zeros((5, 8), dtype=bool)
+    burning[1, 1:3] = True
+    burning[3, 6] = True
+    ended = []
+    tracker = FireTracker(burning.shape, on_extinguished=ended.append, burning=burning)
+    assert tracker.burning_fires == 2
+
+    tracker.update([2 * 8 + 2, 2 * 8 + 6], np.flatnonzero(burning))
+    assert tracker.burning_fires == 2 and ended == []
+    tracker.update([], [2 * 8 + 2, 2 * 8 + 6])
+    assert sorted((fire['size'], fire['started']) for fire in ended) == [(2, 0), (3, 0)]
+    assert tracker.burning_fires == 0
+    assert (tracker._active >= 0).all()
+
+
+def test_burning_cells_can_be_given_as_indices():
+    tracker = FireTracker((4, 4), burning=[0, 5, 15])
+    assert tracker.burning_fires == 2
+    assert tracker.label[0] == tracker.label[5] != tracker.label[15]
@@ -0,0 +1,59 @@
+import numpy as np
+
+from automation.bitlife import BitPackedLife
+from convergence import (CYCLE, EXTINCT, FIXED, ConvergenceDetector, life_extinct,
+                         run_until_converged)
+
+
+def life(cells, shape=(12, 12)):
+    grid = np.zeros(shape, dtype=np.uint8)
+    for r, c in cells:
+        grid[r, c] = 1
+    return BitPackedLife(*shape, initial_state=grid)
+
+
+BLOCK = [(5, 5), (5, 6), (6, 5), (6, 6)]
+BLINKER = [(5, 4), (5, 5), (5, 6)]
+# Period 3, with room around it on a 19x19 grid
+_ARMS = [(r, c) for r in (0, 5, 7, 12) for c in (2, 3, 4, 8, 9, 10)]
+PULSAR = [(r + 3, c + 3) for r, c in _ARMS] + [(c + 3, r + 3) for r, c in _ARMS]
+
+
+def test_still_life_is_fixed():
+    ca = life(BLOCK)
+    done, result = run_until_converged(ca.update, lambda: ca.grid, 100, ConvergenceDetector())
+    assert result == {'kind': FIXED, 'period': 1, 'step': 1}
+    assert done == 1
+
+
+def test_oscillators_are_cycles_of_their_period():
+    for cells, shape, period in ((BLINKER, (12, 12), 2), (PULSAR, (19, 19), 3)):
+        ca = life(cells, shape)
+        done, result = run_until_converged(ca.update, lambda: ca.grid, 100, ConvergenceDetector(),
+                                           jump=False)
+        assert result == {'kind': CYCLE, 'period': period, 'step': period}
+        assert done == period
+
+
+def test_jumping_a_cycle_ends_on_the_grid_of_the_full_run():
+    for steps in (100, 101):
+        ca = life(BLINKER)
+        done, result = run_until_converged(ca.update, lambda: ca.grid, steps, ConvergenceDetector())
+        expected = life(BLINKER)
+        for _ in range(steps):
+            expected.update()
+        assert result['kind'] == CYCLE and done < steps
+        np.testing.assert_array_equal(ca.grid, expected.grid)
+
+
+def test_dying_pattern_is_extinct():
+    ca = life([(5, 5), (5, 6)])
+    done, result = run_until_converged(ca.update, lambda: ca.grid, 100,
+                                       ConvergenceDetector(extinct=life_extinct))
+    assert result == {'kind': EXTINCT, 'period': 1, 'step': 1}
+
+
+def test_cycle_longer_than_the_window_is_not_reported():
+    ca = life(PULSAR, (19, 19))
+    done, result = run_until_converged(ca.update, lambda: ca.grid, 20, ConvergenceDetector(window=2))
+    assert result is None and done == 20
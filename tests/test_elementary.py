@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from automation.elementary import BOUNDARIES, ElementaryCA, rule_table
+
+SIZES = (1, 2, 7, 64, 65, 130)
+
+
+def reference_step(row, rule, boundary):
+    # One cell at a time, straight from the rule number
+    size = len(row)
+    new = np.zeros(size, dtype=np.uint8)
+    for i in range(size):
+        if boundary == 'wrap':
+            left, right = row[(i - 1) % size], row[(i + 1) % size]
+        else:
+            left = row[i - 1] if i > 0 else 0
+            right = row[i + 1] if i < size - 1 else 0
+        new[i] = (rule >> (4 * left + 2 * row[i] + right)) & 1
+    if boundary == 'keep':
+        new[0], new[-1] = row[0], row[-1]
+    return new
+
+
+@pytest.mark.parametrize('boundary', BOUNDARIES)
+@pytest.mark.parametrize('size', SIZES)
+def test_every_rule_matches_the_per_cell_reference(boundary, size):
+    first = np.random.default_rng(size).integers(0, 2, size=size).astype(np.uint8)
+    for rule in range(256):
+        expected = [first]
+        for _ in range(4):
+            expected.append(reference_step(expected[-1], rule, boundary))
+        for packed in (False, True):
+            ca = ElementaryCA(size, rule, first, boundary=boundary, packed=packed)
+            for t in range(1, 5):
+                ca.update()
+                np.testing.assert_array_equal(ca.grid, expected[t],
+                                              err_msg='rule %d packed=%s step %d' % (rule, packed, t))
+
+
+@pytest.mark.parametrize('boundary', BOUNDARIES)
+@pytest.mark.parametrize('packed', [False, True])
+def test_run_matches_the_per_cell_reference(boundary, packed):
+    first = np.random.default_rng(1).integers(0, 2, size=97).astype(np.uint8)
+    for rule in (30, 90, 110, 184):
+        ca = ElementaryCA(len(first), rule, first, boundary=boundary, packed=packed)
+        spacetime = ca.run(20)
+        row = first
+        for t in range(21):
+            np.testing.assert_array_equal(spacetime[t], row, err_msg='rule %d step %d' % (rule, t))
+            row = reference_step(row, rule, boundary)
+
+
+def test_rule_func_gives_the_same_table_as_its_number():
+    def rule_90(state, neighbors):
+        return neighbors[0] ^ neighbors[1]
+    np.testing.assert_array_equal(rule_table(rule_90), rule_table(90))
@@ -0,0 +1,68 @@
+import numpy as np
+
+from event_driven import run_event_driven, skip_quiet
+from fire import EMPTY, TREE, FIRE, iterate_with_wind
+
+P, F = 0.1, 0.02
+TRIALS = 3000
+
+
+def quiet_grid():
+    # A few trees in an otherwise empty 8x8 forest
+    X = np.full((8, 8), EMPTY)
+    X[1:7:2, 1:7:3] = TREE
+    return X
+
+
+def first_strikes(advance, rng):
+    # Steps to the first ignition, and the trees and fires on that step,
+    # over many independent runs
+    steps, trees, fires = [], [], []
+    for _ in range(TRIALS):
+        X, k = advance(quiet_grid(), rng)
+        steps.append(k)
+        trees.append(np.count_nonzero(X == TREE))
+        fires.append(np.count_nonzero(X == FIRE))
+    return {'steps': np.array(steps), 'trees': np.array(trees), 'fires': np.array(fires)}
+
+
+def stepped(X, rng):
+    # The model itself, one step at a time until something burns
+    k = 0
+    while not (X == FIRE).any():
+        X = iterate_with_wind(X, P, F, 0, rng)
+        k += 1
+    return X, k
+
+
+def skipped(X, rng):
+    return skip_quiet(X, P, F, 10 ** 6, rng)
+
+
+def test_skip_quiet_matches_stepping_the_model():
+    reference = first_strikes(stepped, np.random.default_rng(0))
+    skipping = first_strikes(skipped, np.random.default_rng(1))
+    for name in ('steps', 'trees', 'fires'):
+        a, b = reference[name], skipping[name]
+        # Means agree to within five standard errors
+        error = np.sqrt((a.var() + b.var()) / TRIALS)
+        assert abs(a.mean() - b.mean()) < 5 * error, name
+    # And so does the shape of the waiting time distribution
+    for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+        a, b = np.quantile(reference['steps'], q), np.quantile(skipping['steps'], q)
+        assert abs(a - b) <= max(2, 0.15 * a), q
+    assert (skipping['fires'] >= 1).all()
+
+
+def test_skip_quiet_stops_at_max_steps_without_lightning():
+    X, k = skip_quiet(quiet_grid(), P, 0.0, 25, np.random.default_rng(2))
+    assert k == 25 and not (X == FIRE).any()
+
+
+def test_run_event_driven_counts_every_step():
+    seen = []
+    X, counts = run_event_driven(quiet_grid(), P, F, 1, 200, np.random.default_rng(3),
+                                 on_step=lambda step, X: seen.append(step))
+    assert seen[-1] == 200 and seen == sorted(seen)
+    assert counts['stepped'] + counts['skipped'] == 200
+    assert counts['skipped'] > 0
@@ -0,0 +1,53 @@
+import importlib
+
+import numpy as np
+import pytest
+
+FORESTS = {'forest': (), 'improvedforest': (0.0,)}
+
+
+def make_forest(module, rows, cols, growth_prob, fire_prob, **kwargs):
+    ForestSimulation = importlib.import_module('automation.' + module).ForestSimulation
+    return ForestSimulation(rows, cols, growth_prob, fire_prob, *FORESTS[module], **kwargs)
+
+
+@pytest.mark.parametrize('module', sorted(FORESTS))
+@pytest.mark.parametrize('sparse', [False, True])
+def test_set_grid_resizes_the_simulation(module, sparse):
+    sim = make_forest(module, 1, 1, 0.0, 0.0, sparse=sparse)
+    grid = np.zeros((6, 9), dtype=np.uint8)
+    grid[1:-1, 1:-1] = sim.TREE
+    grid[3, 1] = sim.BURNING
+    sim.set_grid(grid)
+    assert (sim.rows, sim.cols) == grid.shape
+    sim.update()
+    assert sim.grid.shape == grid.shape
+    assert sim.grid[3, 1] != sim.TREE and sim.grid[3, 2] == sim.BURNING
+
+
+def fixed_grid(shape, seed=0):
+    # Mostly trees, some empty cells and a few fires
+    draws = np.random.default_rng(seed).random(shape)
+    return np.where(draws < 0.03, 2, np.where(draws < 0.75, 1, 0)).astype(np.uint8)
+
+
+@pytest.mark.parametrize('module', sorted(FORESTS))
+@pytest.mark.parametrize('fire_prob', [0.0, 1.0])
+def test_sparse_and_dense_steps_agree(module, fire_prob):
+    # With no growth and lightning that never or always strikes, fire
+    # spreads deterministically and both update paths must give the same
+    # grids step after step
+    dense = make_forest(module, 1, 1, 0.0, fire_prob, rng=np.random.default_rng(1))
+    sparse = make_forest(module, 1, 1, 0.0, fire_prob, sparse=True, rng=np.random.default_rng(2))
+    grid = fixed_grid((17, 23))
+    dense.set_grid(grid.copy())
+    sparse.set_grid(grid.copy())
+    for step in range(12):
+        dense.update()
+        sparse.update()
+        np.testing.assert_array_equal(sparse.grid, dense.grid, err_msg='step %d' % step)
+        if hasattr(dense, 'burn_timer'):
+            burning = dense.grid == dense.BURNING
+            np.testing.assert_array_equal(sparse.burn_timer[burning], dense.burn_timer[burning])
+    # The fires did spread
+    assert np.count_nonzero(dense.grid == dense.TREE) < np.count_nonzero(grid == dense.TREE) - 20
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from automation.hashlife import HashLife
+
+
+def life_reference(grid, generations):
+    # Plain NumPy Life on a grid padded far enough that nothing can reach
+    # its edge in the given number of generations
+    pad = generations + 2
+    cells = np.pad(np.asarray(grid, dtype=int), pad)
+    rows, cols = cells.shape
+    for _ in range(generations):
+        padded = np.pad(cells, 1)
+        counts = sum(padded[dr:dr + rows, dc:dc + cols] for dr in range(3) for dc in range(3)) - cells
+        cells = ((counts == 3) | ((cells == 1) & (counts == 2))).astype(int)
+    return cells, pad
+
+
+@pytest.mark.parametrize('generations', [1, 2, 5, 16, 37, 100])
+def test_advance_matches_numpy_life(generations):
+    grid = np.random.default_rng(generations).integers(0, 2, size=(13, 19))
+    expected, pad = life_reference(grid, generations)
+    life = HashLife(grid)
+    life.advance(generations)
+    assert life.generation == generations
+    np.testing.assert_array_equal(life.get_region(-pad, -pad, *expected.shape), expected)
+    assert life.population == expected.sum()
+
+
+def test_small_caches_do_not_change_the_result():
+    # Evicting memoized results and collecting nodes mid-run must not
+    # change the pattern
+    grid = np.random.default_rng(7).integers(0, 2, size=(16, 16))
+    expected, pad = life_reference(grid, 60)
+    life = HashLife(grid, cache_size=50, max_nodes=200)
+    for _ in range(60):
+        life.update()
+    np.testing.assert_array_equal(life.get_region(-pad, -pad, *expected.shape), expected)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from keyed_rng import EVENTS, block_bits, cell_bits, masked_bits, philox4x32
+
+# Philox4x32-10 known-answer vectors from the Random123 distribution:
+# (counter words, 64-bit key with the second key word high), output words
+KNOWN_ANSWERS = [
+    ((0, 0, 0, 0), 0,
+     (0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8)),
+    ((0xffffffff, 0xffffffff, 0xffffffff, 0xffffffff), 0xffffffffffffffff,
+     (0x408f276d, 0x41c83b0e, 0xa20bc7c6, 0x6d5451fd)),
+    ((0x243f6a88, 0x85a308d3, 0x13198a2e, 0x03707344), 0x299f31d0a4093822,
+     (0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1)),
+]
+
+
+@pytest.mark.parametrize('counter, key, expected', KNOWN_ANSWERS)
+def test_philox_known_answers(counter, key, expected):
+    words = philox4x32(*(np.array([c], dtype=np.uint64) for c in counter), key)
+    assert tuple(int(w[0]) for w in words) == expected
+
+
+def test_block_and_masked_bits_match_cell_bits():
+    seed, step = 2 ** 60 + 7, 3
+    rows, cols = np.mgrid[5:14, 3:22]
+    expected = cell_bits(seed, step, EVENTS, rows, cols)
+    np.testing.assert_array_equal(block_bits(seed, step, EVENTS, 5, 14, 3, 22), expected)
+    # Sparse and dense masks take different paths to the same bits
+    for density in (0.1, 0.9):
+        mask = np.random.default_rng(0).random(rows.shape) < density
+        bits = masked_bits(seed, step, EVENTS, mask, 5, 3)
+        np.testing.assert_array_equal(bits[mask], expected[mask])
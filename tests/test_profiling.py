@@ -0,0 +1,46 @@
+import importlib
+
+import numpy as np
+import pytest
+
+from automation import forest
+from fire import FIRE, initialize_grid, iterate_with_wind
+from profiling import Profiler
+
+
+@pytest.mark.parametrize('name', ['automation.upscaling', 'automation.cellular iteration1'])
+@pytest.mark.parametrize('table', [True, False])
+def test_automaton_counts_match_grids(name, table):
+    module = importlib.import_module(name)
+    ca = module.CellularAutomaton(30, 30, module.conways_rule)
+    if not table:
+        ca.rule_table = None
+    ca.profiler = Profiler()
+    for _ in range(5):
+        old = ca.grid
+        ca.update()
+        assert ca.profiler._events['births'] == np.count_nonzero((old == 0) & (ca.grid == 1))
+        assert ca.profiler._events['deaths'] == np.count_nonzero((old == 1) & (ca.grid == 0))
+    assert ca.profiler.totals['alive'] == np.count_nonzero(ca.grid)
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_forest_totals_match_grid(sparse):
+    sim = forest.ForestSimulation(30, 30, 0.05, 0.01, sparse=sparse, rng=np.random.default_rng(0))
+    sim.profiler = Profiler()
+    for _ in range(10):
+        sim.update()
+    assert sim.profiler.totals == {'trees': np.count_nonzero(sim.grid == sim.TREE),
+                                   'fires': np.count_nonzero(sim.grid == sim.BURNING)}
+
+
+def test_fire_burn_outs_come_from_the_input_grid():
+    np.random.seed(0)
+    X = initialize_grid(40, 40, 0.6)
+    X[20, 20] = FIRE
+    profiler = Profiler()
+    X = iterate_with_wind(X, 0.05, 0.01, 1, np.random.default_rng(0), profiler=profiler)
+    # A step the profiler does not see must not throw off the next one's count
+    X = iterate_with_wind(X, 0.05, 0.01, 1, np.random.default_rng(1))
+    iterate_with_wind(X, 0.05, 0.01, 1, np.random.default_rng(2), profiler=profiler)
+    assert profiler._events['burn_outs'] == np.count_nonzero(X == FIRE)
@@ -0,0 +1,86 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from fire import FIRE, initialize_grid
+from memmap_forest import MemmapForest, band_rows_for
+from tiled import TiledForest, iterate_with_wind_keyed
+
+P, F = 0.05, 0.01
+# Seeds beyond 2**53 lose their low bits if they pass through a float
+SEEDS = [0, 12345, 2 ** 53 + 1, 2 ** 64 - 1]
+
+
+def _grid(seed):
+    np.random.seed(seed % 2 ** 32)
+    X = initialize_grid(37, 23, 0.6).astype(np.uint8)
+    X[11, 18] = FIRE
+    return X
+
+
+def _reference(X, wind_speed, seed, steps):
+    grids = []
+    for step in range(steps):
+        X = iterate_with_wind_keyed(X, P, F, wind_speed, seed, step)
+        grids.append(X)
+    return grids
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_tiled_matches_keyed_reference(seed):
+    X = _grid(seed)
+    expected = _reference(X, 2, seed, 8)
+    with TiledForest(X, tiles=(3, 2), seed=seed) as forest:
+        for grid in expected:
+            forest.update(P, F, 2)
+            np.testing.assert_array_equal(forest.grid, grid)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_memmap_matches_keyed_reference(seed, tmp_path):
+    X = _grid(seed)
+    expected = _reference(X, 2, seed, 8)
+    path = str(tmp_path / 'forest.bin')
+    forest = MemmapForest.from_array(path, X, seed=seed, band_rows=5)
+    for step, grid in enumerate(expected):
+        if step == 4:
+            # Reopening carries on from the saved step and seed
+            forest = MemmapForest(path, band_rows=7)
+        forest.update(P, F, 2)
+        np.testing.assert_array_equal(forest.grid, grid)
+
+
+def test_seeds_differing_below_float_precision_give_different_grids():
+    X = _grid(0)
+    a = iterate_with_wind_keyed(X, P, 0.5, 0, 2 ** 53, 0)
+    b = iterate_with_wind_keyed(X, P, 0.5, 0, 2 ** 53 + 1, 0)
+    assert (a != b).any()
+
+
+def test_memmap_bands_stay_within_their_memory_budget(tmp_path):
+    budget = 8 * 2 ** 20
+    nx, ny = 20000, 40
+    path = str(tmp_path / 'wide.bin')
+    MemmapForest.create(path, 64, 8, 0.5)
+    tracemalloc.start()
+    try:
+        forest = MemmapForest.create(path, nx, ny, 0.5, band_rows=band_rows_for(nx, budget))
+        forest.update(P, F, 2)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < budget
+
+
+def test_dead_worker_is_reported_not_waited_on_forever():
+    forest = TiledForest(_grid(0), tiles=(2, 1), timeout=2.0)
+    forest.update(P, F, 2)
+    victim = forest._workers[1]
+    victim.kill()
+    victim.join()
+    with pytest.raises(RuntimeError, match='worker 1 exited'):
+        forest.update(P, F, 2)
+    # The pool is shut down and closing again is harmless
+    assert forest._workers == []
+    forest.close()
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from trajectory import TrajectoryReader, TrajectoryWriter, decode_delta, encode_delta
+
+
+def evolving_frames(n, shape, dtype, seed=0):
+    # Frames that change a little at a time, including a step with no
+    # changes and changes touching the first and last cells
+    rng = np.random.default_rng(seed)
+    grid = rng.integers(0, 3, size=shape).astype(dtype)
+    frames = [grid.copy()]
+    for i in range(1, n):
+        if i != 3:
+            flat = grid.reshape(-1)
+            flat[rng.random(flat.size) < 0.05] = rng.integers(0, 3)
+            flat[[0, -1]] = i % 3
+        frames.append(grid.copy())
+    return frames
+
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.int64])
+@pytest.mark.parametrize('keyframe_interval', [1, 4, 100])
+def test_frames_read_back_exactly(tmp_path, dtype, keyframe_interval):
+    path = tmp_path / 'run.traj'
+    frames = evolving_frames(11, (9, 14), dtype)
+    with TrajectoryWriter(path, keyframe_interval=keyframe_interval) as writer:
+        for grid in frames:
+            writer.write(grid)
+
+    with TrajectoryReader(path) as reader:
+        assert len(reader) == len(frames)
+        assert reader.shape == frames[0].shape and reader.dtype == frames[0].dtype
+        for got, expected in zip(reader.frames(), frames):
+            np.testing.assert_array_equal(got, expected)
+        # Random access decodes from the keyframe before each generation
+        for generation in (7, 0, 10, 5):
+            np.testing.assert_array_equal(reader[generation], frames[generation])
+        np.testing.assert_array_equal(reader[-1], frames[-1])
+        assert [g.tolist() for g in reader.frames(6, 9)] == [g.tolist() for g in frames[6:9]]
+
+
+def test_delta_round_trip():
+    rng = np.random.default_rng(3)
+    for xor in (np.zeros(50, dtype=np.uint8), np.full(50, 7, dtype=np.uint8),
+                (rng.random(1000) < 0.1) * rng.integers(1, 256, size=1000).astype(np.uint8)):
+        np.testing.assert_array_equal(decode_delta(encode_delta(xor), len(xor)), xor)
+
+
+def test_truncated_file_reads_up_to_the_last_whole_frame(tmp_path):
+    path = tmp_path / 'run.traj'
+    frames = evolving_frames(6, (8, 8), np.uint8)
+    with TrajectoryWriter(path, keyframe_interval=4) as writer:
+        for grid in frames:
+            writer.write(grid)
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+    with TrajectoryReader(path) as reader:
+        assert len(reader) == len(frames) - 1
+        np.testing.assert_array_equal(reader[-1], frames[-2])
@@ -0,0 +1,197 @@
+import multiprocessing as mp
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from fire import EMPTY, TREE, FIRE
+from keyed_rng import EVENTS, masked_bits, threshold
+
+_KEY_MASK = 2 ** 64 - 1
+# Seconds the parent waits for every tile to finish a step before giving up
+STEP_TIMEOUT = 300.0
+
+
+# Advance one tile of the forest by a step, writing it into out. The tile
+# reads a one-cell halo around itself for the neighbour stencil (empty beyond
+# the grid edge, like convolve2d's fill) and a halo widened wind_speed cells
+# to the east, wrapping round the grid like np.roll, for the wind. X may hold
+# only a band of the grid's rows, starting at grid row row_offset. Random
+# numbers come from keyed_rng and are only drawn where they can matter:
+# growth for empty cells and lightning for trees not already catching fire.
+def step_tile(X, out, r0, r1, c0, c1, p, f, wind_speed, seed, step, row_offset=0):
+    ny, nx = X.shape
+    h0, h1 = max(r0 - 1, 0), min(r1 + 1, ny)
+    w0, w1 = max(c0 - 1, 0), min(c1 + 1, nx)
+    fire = np.zeros((r1 - r0 + 2, c1 - c0 + 2), dtype=bool)
+    fire[h0 - r0 + 1:h1 - r0 + 1, w0 - c0 + 1:w1 - c0 + 1] = X[h0:h1, w0:w1] == FIRE
+    # Fire anywhere in the 3x3 block; the cell itself never matters because
+    # only trees can catch fire
+    across = fire[:, :-2] | fire[:, 1:-1] | fire[:, 2:]
+    fire_nearby = across[:-2] | across[1:-1] | across[2:]
+
+    tile = X[r0:r1, c0:c1]
+    is_tree = tile == TREE
+    catch_fire = is_tree & fire_nearby
+    if wind_speed > 0:
+        east = (np.arange(c0, c1) + wind_speed) % nx
+        catch_fire |= (X[r0:r1, east] == FIRE) & is_tree
+
+    new = out[r0:r1, c0:c1]
+    new[...] = tile
+    is_empty = tile == EMPTY
+    exposed = is_tree & ~catch_fire
+    bits = masked_bits(seed, step, EVENTS, is_empty | exposed, r0 + row_offset, c0)
+    new[is_empty & (bits < threshold(p))] = TREE
+    catch_fire |= exposed & (bits < threshold(f))
+    new[catch_fire] = FIRE
+    new[tile == FIRE] = EMPTY
+
+
+# Single-process version of iterate_with_wind that draws its random numbers
+# from keyed_rng, so it gives the same grids as TiledForest for any tiling
+def iterate_with_wind_keyed(X, p, f, wind_speed, seed, step):
+    X1 = np.empty_like(X)
+    step_tile(X, X1, 0, X.shape[0], 0, X.shape[1], p, f, wind_speed, seed, step)
+    return X1
+
+
+def _split(n, parts):
+    edges = np.linspace(0, n, parts + 1).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _worker(names, shape, dtype, bounds, probs, control, start, done):
+    buffers = [shared_memory.SharedMemory(name=name) for name in names]
+    grids = [np.ndarray(shape, dtype=dtype, buffer=b.buf) for b in buffers]
+    r0, r1, c0, c1 = bounds
+    try:
+        while True:
+            start.wait()
+            p, f = probs[:]
+            wind_speed, seed, step, current, stop = control[:]
+            if stop:
+                break
+            try:
+                step_tile(grids[current], grids[1 - current], r0, r1, c0, c1,
+                          p, f, wind_speed, seed, step)
+            except BaseException:
+                # Wake the parent at once rather than at its timeout
+                done.abort()
+                raise
+            done.wait()
+    except threading.BrokenBarrierError:
+        # The parent gave up on the pool
+        pass
+    finally:
+        del grids
+        for b in buffers:
+            b.close()
+
+
+class TiledForest:
+    def __init__(self, X, tiles=(4, 1), seed=0, timeout=STEP_TIMEOUT):
+        """
+        Forest stepped by a pool of processes, each owning one tile of a grid
+        kept in shared memory
+        :param X: Initial forest grid
+        :param tiles: Number of tiles down and across the grid
+        :param seed: Seed for the keyed random streams
+        :param timeout: Seconds to wait for the tiles to finish a step; a
+                        worker that dies or hangs is reported after this
+        """
+        X = np.asarray(X)
+        self.shape = X.shape
+        self.dtype = np.uint8
+        self.seed = seed
+        self.timeout = timeout
+        self.step = 0
+        self.current = 0
+        # Two grids in shared memory, swapped on alternate steps
+        size = int(np.prod(self.shape))
+        self._buffers = [shared_memory.SharedMemory(create=True, size=max(size, 1)) for _ in range(2)]
+        self._grids = [np.ndarray(self.shape, dtype=self.dtype, buffer=b.buf) for b in self._buffers]
+        self._grids[0][...] = X
+
+        n_workers = tiles[0] * tiles[1]
+        # The probabilities, then the integers kept exact in an unsigned 64-bit
+        # block: wind speed, seed, step, current grid and the stop flag. The
+        # keyed streams only use the seed's low 64 bits.
+        self._probs = mp.Array('d', 2, lock=False)
+        self._control = mp.Array('Q', 5, lock=False)
+        self._start = mp.Barrier(n_workers + 1)
+        self._done = mp.Barrier(n_workers + 1)
+        names = [b.name for b in self._buffers]
+        self._workers = []
+        for r0, r1 in _split(self.shape[0], tiles[0]):
+            for c0, c1 in _split(self.shape[1], tiles[1]):
+                worker = mp.Process(target=_worker, daemon=True,
+                                    args=(names, self.shape, self.dtype, (r0, r1, c0, c1),
+                                          self._probs, self._control, self._start, self._done))
+                worker.start()
+                self._workers.append(worker)
+
+    @property
+    def grid(self):
+        return self._grids[self.current].copy()
+
+    def update(self, p, f, wind_speed):
+        """
+        Advances every tile by one step
+        """
+        if not self._workers:
+            raise RuntimeError("TiledForest is closed")
+        self._probs[:] = [p, f]
+        self._control[:] = [int(wind_speed), self.seed & _KEY_MASK, self.step, self.current, 0]
+        try:
+            self._start.wait(self.timeout)
+            self._done.wait(self.timeout)
+        except threading.BrokenBarrierError:
+            self._fail()
+        self.current = 1 - self.current
+        self.step += 1
+
+    def _fail(self):
+        # A worker died, raised or hung: stop the pool and say which
+        self._start.abort()
+        self._done.abort()
+        # Healthy workers leave the aborted barriers and exit cleanly
+        for worker in self._workers:
+            worker.join(1.0)
+        failed = ["worker %d exited with code %s" % (i, w.exitcode)
+                  for i, w in enumerate(self._workers) if w.exitcode not in (None, 0)]
+        self.close()
+        raise RuntimeError("tiled step failed: " + ("; ".join(failed) or
+                           "no result within %g seconds" % self.timeout))
+
+    def close(self):
+        """
+        Stops the workers, killing any that do not stop by themselves, and
+        frees the shared grids
+        """
+        if self._workers:
+            self._control[4] = 1
+            if all(worker.is_alive() for worker in self._workers):
+                try:
+                    self._start.wait(self.timeout)
+                except threading.BrokenBarrierError:
+                    pass
+            # Anything still waiting on a barrier is let go
+            self._start.abort()
+            self._done.abort()
+            for worker in self._workers:
+                worker.join(self.timeout)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+            self._workers = []
+            self._grids = []
+            for b in self._buffers:
+                b.close()
+                b.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,192 @@
+import struct
+import zlib
+
+import numpy as np
+
+from fire import iterate_with_wind
+
+MAGIC = b'CATRAJ01'
+# kind (K for keyframe, D for delta), generation, payload length
+RECORD = struct.Struct('<cQQ')
+
+
+def encode_delta(xor):
+    """
+    Run-length encodes the changed bytes between two frames
+    :param xor: uint8 array, previous frame XOR current frame
+    :return: Bytes holding the run count, the gap before each run, each
+             run's length and the changed bytes themselves
+    """
+    changed = np.flatnonzero(xor)
+    if len(changed) == 0:
+        return np.zeros(1, dtype='<u8').tobytes()
+    breaks = np.flatnonzero(np.diff(changed) > 1)
+    starts = changed[np.r_[0, breaks + 1]]
+    ends = changed[np.r_[breaks, len(changed) - 1]] + 1
+    gaps = starts - np.r_[0, ends[:-1]]
+    header = np.r_[len(starts), gaps, ends - starts].astype('<u8')
+    return header.tobytes() + xor[changed].tobytes()
+
+
+def decode_delta(payload, size):
+    """
+    Rebuilds the XOR array written by encode_delta
+    :param payload: Bytes from encode_delta
+    :param size: Number of bytes in a frame
+    :return: uint8 array of length size
+    """
+    n_runs = int(np.frombuffer(payload, dtype='<u8', count=1)[0])
+    runs = np.frombuffer(payload, dtype='<u8', count=2 * n_runs, offset=8).astype(np.int64)
+    gaps, lengths = runs[:n_runs], runs[n_runs:]
+    xor = np.zeros(size, dtype=np.uint8)
+    if n_runs:
+        starts = np.cumsum(gaps + np.r_[0, lengths[:-1]])
+        # Index of every changed byte: each run's start plus 0..length-1
+        within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        xor[np.repeat(starts, lengths) + within] = np.frombuffer(payload, dtype=np.uint8,
+                                                                 offset=8 * (1 + 2 * n_runs))
+    return xor
+
+
+class TrajectoryWriter:
+    def __init__(self, path, keyframe_interval=100, level=6):
+        """
+        Streams the frames of a run to disk as they are produced: a full
+        keyframe every keyframe_interval frames and zlib-compressed changed-byte
+        runs in between. Write the initial grid first so that frame 0 is
+        generation 0.
+        :param path: Output file
+        :param keyframe_interval: Frames between keyframes
+        :param level: zlib compression level
+        """
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self.generation = 0
+        self._file = open(path, 'wb')
+        self._previous = None
+
+    def write(self, grid):
+        """
+        Appends the next frame
+        """
+        grid = np.ascontiguousarray(grid)
+        raw = grid.view(np.uint8).reshape(-1)
+        if self._previous is None:
+            dtype = grid.dtype.str.encode()
+            self._file.write(MAGIC + struct.pack('<QB', self.keyframe_interval, len(dtype)) + dtype +
+                             struct.pack('<B', grid.ndim) + struct.pack('<%dQ' % grid.ndim, *grid.shape))
+            self.shape, self.dtype = grid.shape, grid.dtype
+        elif grid.shape != self.shape or grid.dtype != self.dtype:
+            raise ValueError("every frame must have the same shape and dtype")
+
+        if self.generation % self.keyframe_interval == 0:
+            kind, payload = b'K', raw.tobytes()
+        else:
+            kind, payload = b'D', encode_delta(raw ^ self._previous)
+        payload = zlib.compress(payload, self.level)
+        self._file.write(RECORD.pack(kind, self.generation, len(payload)) + payload)
+        self._previous = raw.copy()
+        self.generation += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    def __init__(self, path):
+        """
+        Random-access reader for files written by TrajectoryWriter. A file cut
+        short by a crash is read up to its last complete frame.
+        :param path: Trajectory file
+        """
+        self._file = open(path, 'rb')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a trajectory file" % path)
+        self.keyframe_interval, dtype_len = struct.unpack('<QB', self._file.read(9))
+        self.dtype = np.dtype(self._file.read(dtype_len).decode())
+        ndim = struct.unpack('<B', self._file.read(1))[0]
+        self.shape = struct.unpack('<%dQ' % ndim, self._file.read(8 * ndim))
+        self._size = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        # Index every record by skipping over the payloads
+        start = self._file.tell()
+        end = self._file.seek(0, 2)
+        self._file.seek(start)
+        self._records = []
+        while True:
+            head = self._file.read(RECORD.size)
+            if len(head) < RECORD.size:
+                break
+            kind, generation, length = RECORD.unpack(head)
+            offset = self._file.tell()
+            if offset + length > end:
+                break
+            self._records.append((kind, offset, length))
+            self._file.seek(length, 1)
+
+    def __len__(self):
+        return len(self._records)
+
+    def _payload(self, index):
+        kind, offset, length = self._records[index]
+        self._file.seek(offset)
+        return kind, zlib.decompress(self._file.read(length))
+
+    def _to_grid(self, raw):
+        return raw.view(self.dtype).reshape(self.shape).copy()
+
+    def __getitem__(self, generation):
+        """
+        Returns the grid at any generation, decoding forward from the
+        nearest keyframe before it
+        """
+        if generation < 0:
+            generation += len(self)
+        if not 0 <= generation < len(self):
+            raise IndexError("generation %d not recorded" % generation)
+        return next(self.frames(generation, generation + 1))
+
+    def frames(self, start=0, stop=None):
+        """
+        Lazily yields the grids for generations start..stop-1
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        key = start
+        while self._records[key][0] != b'K':
+            key -= 1
+        raw = None
+        for index in range(key, stop):
+            kind, payload = self._payload(index)
+            if kind == b'K':
+                raw = np.frombuffer(payload, dtype=np.uint8).copy()
+            else:
+                raw ^= decode_delta(payload, self._size)
+            if index >= start:
+                yield self._to_grid(raw)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Run the iterate_with_wind model for a number of steps, recording the
+# initial grid and every step after it
+def record_with_wind(X, p, f, wind_speed, steps, writer):
+    writer.write(X)
+    for _ in range(steps):
+        X = iterate_with_wind(X, p, f, wind_speed)
+        writer.write(X)
+    return X